@@ -14,7 +14,8 @@ import os
 from pathlib import Path
 import dj_database_url
 from datetime import timedelta
-from decouple import config
+from importlib.util import find_spec
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'drf_yasg',
@@ -110,6 +112,8 @@ UNFOLD = {
 REST_AUTH = {
     'USE_JWT': True,
     'USER_DETAILS_SERIALIZER': 'users.serializers.CustomUserDetailsSerializer',
+    # Cookie HttpOnly com o access token, gravado no login; é como o EventSource do navegador se autentica
+    'JWT_AUTH_COOKIE': config('JWT_AUTH_COOKIE', default='condomineo-auth'),
 }
 
 SIMPLE_JWT = {
@@ -159,7 +163,104 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     # Schema/openapi via drf-spectacular
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON com orjson; o MessagePack é acrescentado abaixo quando o pacote msgpack está instalado
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Respostas e corpos em MessagePack (application/msgpack), pela negociação de conteúdo do DRF
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'core.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(1, 'core.renderers.MessagePackParser')
+
+# Cache padrão: memória local do processo (desenvolvimento e testes) ou, em produção, um backend compartilhado
+# pelos workers, ex.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
 }
+# Na memória local cada worker tem o próprio cache e não vê as invalidações gravadas pelos outros
+CACHE_PER_PROCESS = CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+# Quantidade de registros lidos por vez do cursor do banco nas exportações CSV
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Quantidade de linhas validadas e gravadas por lote nas importações CSV
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=500, cast=int)
+# Tempo (segundos) que o check-in da portaria mantém em cache o id de condomínios e apartamentos
+GATE_LOOKUP_CACHE_TIMEOUT = config('GATE_LOOKUP_CACHE_TIMEOUT', default=3600, cast=int)
+# Tempo (segundos) que o contador de visitantes presentes fica em cache antes de ser recalculado
+PRESENCE_CACHE_TIMEOUT = config('PRESENCE_CACHE_TIMEOUT', default=300, cast=int)
+# Tempo (segundos) que a lista de placas de cada condomínio fica em memória para a busca aproximada
+PLATE_INDEX_CACHE_TIMEOUT = config('PLATE_INDEX_CACHE_TIMEOUT', default=600, cast=int)
+# Versões reduzidas das imagens enviadas (assinaturas, comprovantes e anexos de avisos)
+IMAGE_PIPELINE_ASYNC = config('IMAGE_PIPELINE_ASYNC', default=True, cast=bool)
+IMAGE_PIPELINE_WORKERS = config('IMAGE_PIPELINE_WORKERS', default=2, cast=int)
+IMAGE_THUMBNAIL_SIZE = config('IMAGE_THUMBNAIL_SIZE', default=320, cast=int)
+IMAGE_DISPLAY_SIZE = config('IMAGE_DISPLAY_SIZE', default=1600, cast=int)
+IMAGE_RENDITION_FORMAT = config('IMAGE_RENDITION_FORMAT', default='WEBP')
+IMAGE_RENDITION_QUALITY = config('IMAGE_RENDITION_QUALITY', default=80, cast=int)
+# Tempo (segundos) que um documento sem referências é mantido antes de ser apagado pela coleta de órfãos
+BLOB_GC_GRACE_SECONDS = config('BLOB_GC_GRACE_SECONDS', default=86400, cast=int)
+# Entrega dos arquivos protegidos: 'django' (Range/ETag pelo próprio Django), 'x-accel' (nginx) ou 'x-sendfile' (Apache)
+MEDIA_DELIVERY_MODE = config('MEDIA_DELIVERY_MODE', default='django')
+# Location 'internal' do nginx que aponta para o MEDIA_ROOT, usada no modo 'x-accel'
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+# Sincronização incremental (/core/sync/): alterações por página e dias de histórico mantidos
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_RETENTION_DAYS = config('SYNC_RETENTION_DAYS', default=30, cast=int)
+# Segundos depois dos quais uma lacuna nos ids do ChangeLog é tida como transação desfeita, e não em andamento
+SYNC_GAP_TIMEOUT = config('SYNC_GAP_TIMEOUT', default=60, cast=int)
+# Eventos em tempo real (/core/events/): intervalo (segundos) da consulta ao ChangeLog feita por worker
+EVENTS_POLL_INTERVAL = config('EVENTS_POLL_INTERVAL', default=1.0, cast=float)
+# Segundos sem eventos até enviar um comentário de keep-alive na conexão
+EVENTS_HEARTBEAT_INTERVAL = config('EVENTS_HEARTBEAT_INTERVAL', default=15, cast=int)
+# Eventos pendentes por conexão antes de descartar (cliente lento)
+EVENTS_QUEUE_SIZE = config('EVENTS_QUEUE_SIZE', default=100, cast=int)
+# Tempo (ms) que o navegador espera antes de reconectar o EventSource
+EVENTS_RETRY_MS = config('EVENTS_RETRY_MS', default=3000, cast=int)
+# Busca textual (/core/search/): máximo de resultados e extração do texto dos anexos fora da requisição
+SEARCH_RESULTS_LIMIT = config('SEARCH_RESULTS_LIMIT', default=20, cast=int)
+SEARCH_INDEX_ASYNC = config('SEARCH_INDEX_ASYNC', default=True, cast=bool)
+# Autocompletar de nomes (/core/autocomplete/): máximo de resultados e segundos em cache
+AUTOCOMPLETE_RESULTS_LIMIT = config('AUTOCOMPLETE_RESULTS_LIMIT', default=10, cast=int)
+AUTOCOMPLETE_CACHE_SECONDS = config('AUTOCOMPLETE_CACHE_SECONDS', default=30, cast=int)
+# Instrumentação das requisições: cabeçalho Server-Timing e log estruturado 'core.metrics'
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+REQUEST_METRICS_HEADER = config('REQUEST_METRICS_HEADER', default=True, cast=bool)
+# Requisições acima destes limites saem no log como WARNING, com as instruções SQL que mais pesaram
+REQUEST_SLOW_MS = config('REQUEST_SLOW_MS', default=500, cast=int)
+REQUEST_SLOW_QUERIES = config('REQUEST_SLOW_QUERIES', default=50, cast=int)
+# Métricas do Prometheus (/metrics): diretório compartilhado pelos workers do gunicorn (vazio expõe
+# apenas o processo atual), intervalo em segundos entre as gravações de cada worker e token do scrape
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Perfil de requisições sob demanda para superusuários (X-Profile): ligado por padrão só com DEBUG, diretório
+# dos arquivos, quantos perfis manter e intervalo em segundos entre as amostras da pilha. Os parâmetros das
+# consultas (CPFs, e-mails, hashes de senha) só vão para o trace com PROFILING_SQL_PARAMS
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=DEBUG, cast=bool)
+PROFILING_SQL_PARAMS = config('PROFILING_SQL_PARAMS', default=False, cast=bool)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_KEEP = config('PROFILING_KEEP', default=50, cast=int)
+PROFILING_SAMPLE_INTERVAL = config('PROFILING_SAMPLE_INTERVAL', default=0.002, cast=float)
+# Compressão das respostas da API: tamanho mínimo (bytes) para comprimir e codificações oferecidas, na ordem
+# de preferência (zstd e br só valem com os pacotes zstandard e brotli instalados)
+COMPRESSION_ENABLED = config('COMPRESSION_ENABLED', default=True, cast=bool)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_ENCODINGS = config('COMPRESSION_ENCODINGS', default='zstd,br,gzip', cast=Csv())
+# Cache das respostas de leitura (avisos, apartamentos e condomínios): liga/desliga (por padrão, só com um
+# cache compartilhado pelos workers) e segundos em cache
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=not CACHE_PER_PROCESS, cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
 
 # Configurações do drf-spectacular
 SPECTACULAR_SETTINGS = {
@@ -170,14 +271,22 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    # Primeiro da lista, para medir o tempo total da requisição (Server-Timing e log 'core.metrics')
+    'core.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Depois do WhiteNoise, que já serve os estáticos pré-comprimidos
+    'core.compression.ResponseCompressionMiddleware',
+    # Antes de qualquer consulta: decide se as leituras da requisição podem ir para uma réplica
+    'core.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Perfil sob demanda (cabeçalho X-Profile), depois da autenticação para identificar o superusuário
+    'core.profiling.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -244,10 +353,62 @@ else:
     DATABASES = {
         'default': dj_database_url.config(
             default=config('DATABASE_URL'),
-            conn_max_age=600,
         )
     }
 
+# Réplicas de leitura (URLs separadas por vírgula): os GETs leem delas, exceto logo depois de uma gravação do
+# mesmo usuário. Nos testes, cada réplica espelha o banco de testes do principal
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{_index}'] = {
+        **dj_database_url.parse(_url),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# Pool de conexões por worker (psycopg 3): cada processo mantém de DB_POOL_MIN_SIZE a DB_POOL_MAX_SIZE conexões
+# abertas por banco e as empresta às requisições; quem espera mais de DB_POOL_TIMEOUT segundos por uma recebe erro
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=True, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=1, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+# Conexões ociosas acima do mínimo fecham depois de DB_POOL_MAX_IDLE segundos; todas são renovadas após DB_POOL_MAX_LIFETIME
+DB_POOL_MAX_IDLE = config('DB_POOL_MAX_IDLE', default=300, cast=float)
+DB_POOL_MAX_LIFETIME = config('DB_POOL_MAX_LIFETIME', default=1800, cast=float)
+# Sem o pool, segundos em que a conexão continua aberta entre requisições (0 fecha ao fim de cada uma)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+# Testa a conexão antes de usá-la (ao retirá-la do pool ou ao reaproveitá-la em outra requisição)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+# Atrás de um proxy em modo transação (PgBouncer com pool_mode=transaction), cada transação pode cair em outra
+# conexão do servidor: ficam desligados os cursores do lado do servidor e os prepared statements, que dependem da sessão
+DB_TRANSACTION_POOLING = config('DB_TRANSACTION_POOLING', default=False, cast=bool)
+
+for _database in DATABASES.values():
+    if _database.get('ENGINE') != 'django.db.backends.postgresql':
+        continue
+    # O mesmo backend do Django, medindo a espera por conexões (core/db_backends/postgresql)
+    _database['ENGINE'] = 'core.db_backends.postgresql'
+    _database['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+    _options = _database.setdefault('OPTIONS', {})
+    if DB_POOL_ENABLED:
+        # Com o pool, a conexão volta para ele ao fim da requisição: o Django exige CONN_MAX_AGE = 0
+        _database['CONN_MAX_AGE'] = 0
+        _options['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+        }
+    else:
+        _database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    if DB_TRANSACTION_POOLING:
+        _database['DISABLE_SERVER_SIDE_CURSORS'] = True
+        _options['prepare_threshold'] = None
+# Segundos em que as leituras de quem acabou de gravar continuam no principal (atraso tolerado das réplicas)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -324,12 +485,22 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        # Uma linha JSON por requisição, pronta para ser indexada pelo agregador de logs
+        'metrics': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'stream': sys.stdout,
         },
+        'metrics_console': {
+            'class': 'logging.StreamHandler',
+            'stream': sys.stdout,
+            'formatter': 'metrics',
+        },
     },
     'loggers': {
         'django': {
@@ -347,6 +518,12 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        # INFO registra todas as requisições; WARNING, apenas as lentas
+        'core.metrics': {
+            'handlers': ['metrics_console'],
+            'level': config('REQUEST_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
         'root': {
             'handlers': ['console'],
             'level' : os.getenv('DJANGO_LOG_LEVEL', default='INFO'),
@@ -15,16 +15,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from core.views import home
+from core.views import home, metrics_view, profile_download
 
 urlpatterns = [
        path('painel/', admin.site.urls),
        # API endpoints
        path('api/v1/', include('condomineo.api_urls')),
+       # Métricas para o Prometheus
+       path('metrics', metrics_view, name='metrics'),
+       # Perfis de requisições gravados sob demanda (X-Profile)
+       re_path(r'^profiles/(?P<profile_id>[\w-]+)\.(?P<extension>folded|prof|json)$', profile_download, name='profile-download'),
        path('', home, name='home'),
 
 ]
@@ -1,9 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
 from django.contrib.auth.models import Group
 from unfold.admin import ModelAdmin
 from unfold.forms import AdminPasswordChangeForm, UserCreationForm, UserChangeForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from rest_framework.exceptions import ValidationError
 
 from .filters import queryset_filter_reservation, queryset_filter_finance, queryset_filter_visitor, \
     queryset_filter_apartment, queryset_filter_notice, queryset_filter_condominium, queryset_filter_vehicle, \
@@ -13,8 +17,10 @@ from .models import (Apartment, Visitor, Reservation, Finance, Vehicle, Order, V
                      Communication, Address, Resident, Occurrence)
 from .forms import (
     VisitorForm, ReservationForm, FinanceForm, VehicleForm, ApartmentForm,
-    OrderForm, CondominiumForm, NoticeForm, CommunicationForm
+    OrderForm, CondominiumForm, NoticeForm, CommunicationForm, CSVImportForm, ApartmentGridForm
 )
+from .imports import CSV_IMPORTERS
+from .utils import generate_apartment_grid
 
 admin.site.unregister(Group)
 
@@ -26,6 +32,7 @@ class CondominiumAdmin(ModelAdmin):
     search_fields = ('name', 'cnpj')
     ordering = ('name',)
     readonly_fields = ('created_at', 'code_condominium', 'created_by')
+    actions = ['import_csv', 'generate_apartments']
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -37,6 +44,104 @@ class CondominiumAdmin(ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    def get_urls(self):
+        custom_urls = [
+            path(
+                '<int:pk>/importar/',
+                self.admin_site.admin_view(self.import_csv_view),
+                name='core_condominium_import_csv'
+            ),
+            path(
+                '<int:pk>/gerar-apartamentos/',
+                self.admin_site.admin_view(self.generate_apartments_view),
+                name='core_condominium_generate_apartments'
+            ),
+        ]
+        return custom_urls + super().get_urls()
+
+    @admin.action(description='Importar CSV de apartamentos, dependentes ou veículos')
+    def import_csv(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Selecione apenas um condomínio para importar.', messages.WARNING)
+            return None
+        return redirect(reverse('admin:core_condominium_import_csv', args=[queryset.first().pk]))
+
+    def import_csv_view(self, request, pk):
+        condominium = get_object_or_404(self.get_queryset(request), pk=pk)
+        report = None
+
+        if request.method == 'POST':
+            form = CSVImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                importer_class = CSV_IMPORTERS[form.cleaned_data['resource']]
+                opts = importer_class.model._meta
+                if not request.user.has_perm(f'{opts.app_label}.add_{opts.model_name}'):
+                    self.message_user(request, 'Você não tem permissão para importar estes registros.', messages.ERROR)
+                else:
+                    try:
+                        report = importer_class(condominium, request.user).run(
+                            form.cleaned_data['file'], delimiter=form.cleaned_data['delimiter']
+                        )
+                    except ValidationError as e:
+                        self.message_user(request, ' '.join(str(message) for message in e.detail), messages.ERROR)
+                    else:
+                        self.message_user(
+                            request,
+                            f"{report['created']} de {report['total']} registros importados.",
+                            messages.SUCCESS if not report['errors'] else messages.WARNING
+                        )
+        else:
+            form = CSVImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Importar CSV - {condominium.name}',
+            'opts': self.model._meta,
+            'condominium': condominium,
+            'form': form,
+            'report': report,
+        }
+        return TemplateResponse(request, 'admin/core/condominium/import_csv.html', context)
+
+    @admin.action(description='Gerar apartamentos a partir do layout (blocos x andares x unidades)')
+    def generate_apartments(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Selecione apenas um condomínio para gerar os apartamentos.', messages.WARNING)
+            return None
+        return redirect(reverse('admin:core_condominium_generate_apartments', args=[queryset.first().pk]))
+
+    def generate_apartments_view(self, request, pk):
+        condominium = get_object_or_404(self.get_queryset(request), pk=pk)
+
+        if request.method == 'POST':
+            form = ApartmentGridForm(request.POST)
+            if form.is_valid():
+                if not request.user.has_perm('core.add_apartment'):
+                    self.message_user(request, 'Você não tem permissão para criar apartamentos.', messages.ERROR)
+                else:
+                    try:
+                        created, skipped = generate_apartment_grid(condominium, **form.cleaned_data)
+                    except ValidationError as e:
+                        self.message_user(request, ' '.join(str(message) for message in e.detail), messages.ERROR)
+                    else:
+                        self.message_user(
+                            request,
+                            f'{created} apartamentos criados, {skipped} já existentes ignorados.',
+                            messages.SUCCESS
+                        )
+                        return redirect(reverse('admin:core_apartment_changelist') + f'?condominium__id__exact={pk}')
+        else:
+            form = ApartmentGridForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Gerar apartamentos - {condominium.name}',
+            'opts': self.model._meta,
+            'condominium': condominium,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/core/condominium/generate_apartments.html', context)
+
 
 @admin.register(Address)
 class AddressAdmin(ModelAdmin):
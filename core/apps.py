@@ -5,4 +5,5 @@ class CoreConfig(AppConfig):
     name = 'core'
     verbose_name = 'Gestão Condomínio'
     def ready(self):
-        pass
+        # Importando os sinais para garantir que sejam registrados
+        import core.signals
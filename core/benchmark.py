@@ -0,0 +1,339 @@
+import json
+import math
+import tracemalloc
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import (
+    Condominium, Apartment, Visitor, Visit, Occurrence, Reservation, Finance, Vehicle, Order, Notice,
+    Communication, Resident
+)
+from core.renderers import ORJSONRenderer, MessagePackRenderer, msgpack
+from users.models import Person
+
+API_PREFIX = '/api/v1/'
+
+# Recursos dos routers: caminho da listagem e modelo usado para escolher o registro do detalhe
+RESOURCES = {
+    'core/visitors': Visitor,
+    'core/reservations': Reservation,
+    'core/apartments': Apartment,
+    'core/finances': Finance,
+    'core/notices': Notice,
+    'core/vehicles': Vehicle,
+    'core/orders': Order,
+    'core/visits': Visit,
+    'core/residents': Resident,
+    'core/condominiums': Condominium,
+    'core/communications': Communication,
+    'core/occurrences': Occurrence,
+    'users/persons': Person,
+}
+
+# Listagens também medidas com os perfis de portaria e de morador, que têm outro escopo
+ROLE_LISTS = {
+    'employee': ('core/visits', 'core/visitors', 'core/orders', 'core/vehicles'),
+    'resident': ('core/visits', 'core/orders', 'core/notices', 'core/communications', 'core/reservations'),
+}
+
+# Listagens com os payloads mais aninhados, usadas na comparação dos renderers
+RENDERER_RESOURCES = ('core/visits', 'core/communications', 'core/residents', 'core/orders', 'core/reservations')
+
+
+class Scenario:
+    """Uma requisição medida: método, caminho, perfil do usuário e corpo (para as criações)."""
+
+    def __init__(self, name, method, path, role, payload=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.role = role
+        self.payload = payload
+
+    @property
+    def writes(self):
+        return self.method != 'GET'
+
+
+class BenchmarkContext:
+    """
+    Condomínio e usuários usados nas medições.
+
+    Por padrão, o condomínio com mais visitas: é onde as consultas e a paginação mais pesam.
+    """
+
+    def __init__(self, condominium=None):
+        if condominium is None:
+            busiest = (
+                Visit.objects.values('condominium').annotate(total=Count('id')).order_by('-total').first()
+            )
+            condominium = (
+                Condominium.objects.get(pk=busiest['condominium']) if busiest else Condominium.objects.first()
+            )
+        self.condominium = condominium
+        self.apartment = Apartment.objects.filter(condominium=condominium, main_resident__isnull=False).first()
+        self.users = {
+            'admin': condominium.created_by,
+            'employee': Person.objects.filter(
+                condominium=condominium, user_type=Person.UserType.EMPLOYEE, is_active=True
+            ).first(),
+            'resident': self.apartment.main_resident if self.apartment else None,
+        }
+
+    def token(self, role):
+        return str(AccessToken.for_user(self.users[role]))
+
+    def detail_id(self, model):
+        if model is Condominium:
+            return self.condominium.pk
+        return model.objects.filter(condominium=self.condominium).order_by('pk').values_list('pk', flat=True).first()
+
+
+def build_scenarios(context):
+    """Listagem e detalhe de todos os recursos, listagens por perfil e as criações mais frequentes."""
+    scenarios = []
+    for resource, model in RESOURCES.items():
+        scenarios.append(Scenario(f'{resource} list', 'GET', f'{resource}/', 'admin'))
+        object_id = context.detail_id(model)
+        if object_id:
+            scenarios.append(Scenario(f'{resource} detail', 'GET', f'{resource}/{object_id}/', 'admin'))
+    for role, resources in ROLE_LISTS.items():
+        if context.users[role] is None:
+            continue
+        scenarios += [Scenario(f'{resource} list ({role})', 'GET', f'{resource}/', role) for resource in resources]
+
+    if context.apartment:
+        target = {
+            'code_condominium': context.condominium.code_condominium,
+            'number_apartment': context.apartment.number,
+            'block_apartment': context.apartment.block,
+        }
+        scenarios += [
+            Scenario('core/visits create', 'POST', 'core/visits/', 'admin', {
+                **target, 'name_visitor': 'Visitante Benchmark', 'cpf_visitor': '98765432100',
+            }),
+            Scenario('core/orders create', 'POST', 'core/orders/', 'admin', {**target, 'order_code': 'BR123456789'}),
+            Scenario('core/notices create', 'POST', 'core/notices/', 'admin', {
+                'code_condominium': context.condominium.code_condominium,
+                'title': 'Aviso de benchmark', 'content': 'Conteúdo do aviso.',
+            }),
+            Scenario('core/communications create', 'POST', 'core/communications/', 'admin', {
+                **target, 'title': 'Mensagem de benchmark', 'message': 'Conteúdo da mensagem.',
+                'communication_type': Communication.CommunicationTypeChoices.MESSAGE,
+            }),
+            Scenario('core/occurrences create', 'POST', 'core/occurrences/', 'admin', {
+                **target, 'title': 'Ocorrência de benchmark', 'description': 'Descrição.',
+                'status': Occurrence.StatusChoices.OPEN,
+            }),
+        ]
+    return scenarios
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def benchmark_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return 'testserver' if not hosts or '*' in settings.ALLOWED_HOSTS else hosts[0]
+
+
+def send(client, scenario, headers):
+    if scenario.writes:
+        response = client.generic(
+            scenario.method, API_PREFIX + scenario.path, json.dumps(scenario.payload),
+            content_type='application/json', **headers
+        )
+    else:
+        response = client.get(API_PREFIX + scenario.path, **headers)
+    # Respostas em streaming (exportações) são consumidas para medir a geração inteira
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    return response.status_code, len(content)
+
+
+def execute(client, scenario, headers):
+    """Executa a requisição; as criações rodam em uma transação desfeita no fim, sem alterar a massa de dados."""
+    if not scenario.writes:
+        return send(client, scenario, headers)
+    with transaction.atomic():
+        result = send(client, scenario, headers)
+        transaction.set_rollback(True)
+    return result
+
+
+def measure(client, scenario, headers, iterations, warmup):
+    for _ in range(warmup):
+        execute(client, scenario, headers)
+
+    durations, queries = [], []
+    for _ in range(iterations):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            started = perf_counter()
+            status, size = execute(client, scenario, headers)
+            durations.append((perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    # Memória em uma execução à parte: o tracemalloc deixa o Python bem mais lento e distorceria os tempos
+    tracemalloc.start()
+    try:
+        execute(client, scenario, headers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': scenario.method,
+        'path': scenario.path,
+        'role': scenario.role,
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(percentile(durations, 0.50), 2),
+        'p95_ms': round(percentile(durations, 0.95), 2),
+        'mean_ms': round(sum(durations) / len(durations), 2),
+        'max_ms': round(max(durations), 2),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'response_bytes': size,
+    }
+
+
+def dataset_counts():
+    return {model._meta.label_lower: model.objects.count() for model in RESOURCES.values()}
+
+
+def run_benchmark(context, scenarios, iterations=20, warmup=2, log=None):
+    """
+    Mede cada cenário e monta o relatório.
+
+    Returns:
+        Dicionário serializável em JSON, comparável com compare_reports.
+    """
+    client = Client(HTTP_HOST=benchmark_host())
+    tokens = {}
+    results = {}
+    for scenario in scenarios:
+        if scenario.role not in tokens:
+            tokens[scenario.role] = context.token(scenario.role)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {tokens[scenario.role]}'}
+        results[scenario.name] = measure(client, scenario, headers, iterations, warmup)
+        if log:
+            log(scenario.name, results[scenario.name])
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'condominium': context.condominium.pk,
+        'dataset': dataset_counts(),
+        'iterations': iterations,
+        'results': results,
+    }
+
+
+def compare_reports(baseline, current, threshold=1.25, min_delta_ms=5.0):
+    """
+    Aponta as regressões do relatório atual em relação ao de referência.
+
+    Um cenário regride quando o p95 cresce mais que 'threshold' vezes (e mais que 'min_delta_ms', para
+    não acusar ruído em requisições de poucos milissegundos), quando faz mais consultas ao banco ou
+    quando o status da resposta muda.
+
+    Returns:
+        Lista de mensagens, uma por regressão.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if result['status'] != previous['status']:
+            regressions.append(f"{name}: status {previous['status']} -> {result['status']}")
+        if result['queries'] > previous['queries']:
+            regressions.append(f"{name}: consultas {previous['queries']} -> {result['queries']}")
+        if (result['p95_ms'] > previous['p95_ms'] * threshold
+                and result['p95_ms'] - previous['p95_ms'] > min_delta_ms):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {result['p95_ms']} ms")
+    return regressions
+
+
+def renderers():
+    """Renderers comparados; o JSONRenderer do DRF (json da biblioteca padrão) é a referência."""
+    available = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+    if msgpack is not None:
+        available['msgpack'] = MessagePackRenderer()
+    return available
+
+
+def collect_payload(client, resource, headers, pages):
+    """Junta os itens das primeiras 'pages' páginas da listagem, já serializados."""
+    items = []
+    for page in range(1, pages + 1):
+        response = client.get(f'{API_PREFIX}{resource}/', {'page': page}, HTTP_ACCEPT='application/json', **headers)
+        if response.status_code != 200:
+            break
+        items += response.data['results']
+        if not response.data.get('next'):
+            break
+    return items
+
+
+def run_renderer_benchmark(context, iterations=200, pages=10, log=None):
+    """
+    Mede só a renderização das maiores listagens com cada renderer: o payload é montado uma vez e
+    renderizado 'iterations' vezes, sem banco nem serializer no tempo medido.
+
+    Returns:
+        Dicionário serializável em JSON, por listagem e renderer.
+    """
+    client = Client(HTTP_HOST=benchmark_host())
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {context.token("admin")}'}
+    results = {}
+    for resource in RENDERER_RESOURCES:
+        data = collect_payload(client, resource, headers, pages)
+        reference = None
+        for name, renderer in renderers().items():
+            renderer.render(data)
+            started = perf_counter()
+            for _ in range(iterations):
+                content = renderer.render(data)
+            elapsed = perf_counter() - started
+            reference = reference or elapsed
+            result = {
+                'items': len(data),
+                'bytes': len(content),
+                'ms_per_render': round(elapsed / iterations * 1000, 3),
+                'renders_per_second': round(iterations / elapsed, 1),
+                'mb_per_second': round(len(content) * iterations / elapsed / 1024 / 1024, 2),
+                'speedup': round(reference / elapsed, 2),
+            }
+            results[f'{resource} {name}'] = result
+            if log:
+                log(f'{resource} {name}', result)
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'condominium': context.condominium.pk,
+        'iterations': iterations,
+        'results': results,
+    }
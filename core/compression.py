@@ -0,0 +1,228 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sem o pacote, 'br' não é oferecido na negociação
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    # Opcional: sem o pacote, 'zstd' não é oferecido na negociação
+    zstandard = None
+
+# Tipos de conteúdo comprimidos; imagens, PDFs e afins já vêm comprimidos
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/msgpack', 'application/xml', 'application/javascript',
+    'text/html', 'text/csv', 'text/plain', 'text/xml', 'text/css',
+)
+# Níveis pensados para respostas dinâmicas: boa taxa sem pesar na CPU da requisição
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class GzipEncoder:
+    def __init__(self):
+        # wbits 16 + MAX_WBITS gera o formato gzip (cabeçalho e CRC), e não zlib puro
+        self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    @staticmethod
+    def compress_all(data):
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class BrotliEncoder:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+    @staticmethod
+    def compress_all(data):
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+class ZstdEncoder:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    @staticmethod
+    def compress_all(data):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def available_encoders():
+    """Codificações suportadas, na ordem de preferência do servidor."""
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder
+    encoders['gzip'] = GzipEncoder
+    return {name: encoders[name] for name in settings.COMPRESSION_ENCODINGS if name in encoders}
+
+
+def parse_accept_encoding(header):
+    """Codificações aceitas pelo cliente, com o peso (q) de cada uma; 'q=0' recusa a codificação."""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        accepted[name] = weight
+    return accepted
+
+
+def negotiate_encoding(header):
+    """
+    Escolhe a codificação da resposta: a de maior peso para o cliente e, no empate, a preferida pelo
+    servidor (zstd, br, gzip). Sem nenhuma aceita, retorna None.
+    """
+    accepted = parse_accept_encoding(header or '')
+    wildcard = accepted.get('*', 0.0)
+    best, best_weight = None, 0.0
+    for name in available_encoders():
+        weight = accepted.get(name, wildcard)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def compression_exempt(view):
+    """
+    Marca a view para responder sem compressão: função, APIView/ViewSet inteiro ou uma ação do ViewSet.
+
+    Útil em rotas cujo corpo precisa sair byte a byte como foi gerado (streams de eventos, conteúdo já
+    comprimido, respostas com tamanho conhecido pelo cliente).
+    """
+    view.compression_exempt = True
+    return view
+
+
+def view_is_exempt(request, view_func):
+    if getattr(view_func, 'compression_exempt', False):
+        return True
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return False
+    if getattr(view_class, 'compression_exempt', False):
+        return True
+    # Ações de ViewSet: o router guarda o mapa método HTTP -> ação na função da view
+    action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+    return bool(action and getattr(getattr(view_class, action, None), 'compression_exempt', False))
+
+
+class ResponseCompressionMiddleware:
+    """
+    Comprime as respostas da API com a melhor codificação aceita pelo cliente (Accept-Encoding): zstd e
+    brotli, quando os pacotes estão instalados, ou gzip.
+
+    Só entram os tipos de COMPRESSIBLE_TYPES acima de COMPRESSION_MIN_SIZE bytes; abaixo disso, os
+    cabeçalhos da compressão custam mais do que economizam. Respostas em streaming (exportações CSV)
+    são comprimidas pedaço a pedaço, sem juntar o corpo em memória. Ficam de fora os streams de eventos,
+    respostas parciais ou com Range (downloads), as já codificadas e as views marcadas com
+    compression_exempt.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not settings.COMPRESSION_ENABLED or getattr(request, '_compression_exempt', False):
+            return response
+        if not self.compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        encoder = available_encoders()[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(encoder(), response.streaming_content)
+            else:
+                response.streaming_content = self.compress_stream(encoder(), response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = encoder.compress_all(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # O corpo muda com a codificação: um ETag forte deixaria de ser byte a byte igual
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_is_exempt(request, view_func):
+            request._compression_exempt = True
+
+    def compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code in (206, 304):
+            return False
+        # Downloads com Range e entregas pelo servidor web (X-Accel-Redirect) ficam como estão
+        if response.has_header('Accept-Ranges') or response.has_header('X-Accel-Redirect'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return False
+        if response.streaming:
+            length = response.get('Content-Length')
+            return not (length and length.isdigit() and int(length) < settings.COMPRESSION_MIN_SIZE)
+        return True
+
+    @staticmethod
+    def compress_stream(encoder, chunks):
+        for chunk in chunks:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.flush()
+
+    @staticmethod
+    async def compress_async_stream(encoder, chunks):
+        async for chunk in chunks:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.flush()
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.utils import user_tenant_ids, get_tenant_versions
+
+# Modelos lidos pelo CondominiumSerializer (o condomínio e o endereço aninhado)
+CONDOMINIUM_DEPENDENT_MODELS = ('core.condominium', 'core.address')
+# Modelos aninhados na maioria dos serializers; uma alteração neles também muda o ETag. O PersonSerializer
+# lê o apartamento da pessoa, que por sua vez traz o condomínio e o endereço
+DEFAULT_DEPENDENT_MODELS = (*CONDOMINIUM_DEPENDENT_MODELS, 'users.person', 'core.apartment')
+
+
+def request_tenant_ids(request):
+    """user_tenant_ids do usuário autenticado, calculado uma vez por requisição."""
+    if not hasattr(request, '_tenant_ids'):
+        request._tenant_ids = user_tenant_ids(request.user)
+    return request._tenant_ids
+
+
+def etag_matches(request, etag):
+    """Comparação fraca do 'If-None-Match' (RFC 9110), que é a usada em GET condicional."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag.removeprefix('W/') in {value.removeprefix('W/') for value in etags}
+
+
+class ConditionalGETMixin:
+    """
+    Adiciona ETag às respostas de listagem e detalhe do ViewSet.
+
+    O ETag é derivado dos contadores de alteração (TenantVersion) dos condomínios do usuário, e não
+    do conteúdo da resposta. Assim, um 'If-None-Match' que ainda confere é respondido com 304 sem
+    consultar os registros e sem rodar o serializer. Cada ViewSet declara em etag_dependent_models os
+    modelos que o serializer aninha, além do próprio.
+    """
+    etag_dependent_models = DEFAULT_DEPENDENT_MODELS
+
+    def get_version_etag(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return None
+
+        labels = {self.get_queryset().model._meta.label_lower, *self.etag_dependent_models}
+        versions = get_tenant_versions(labels, request_tenant_ids(request))
+        renderer = getattr(request, 'accepted_renderer', None)
+        token = '|'.join(map(str, (
+            user.pk, request.get_full_path(), getattr(renderer, 'format', ''), versions
+        )))
+        return f'W/"{hashlib.sha1(token.encode()).hexdigest()}"'
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_version_etag(request)
+        if etag and etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
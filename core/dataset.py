@@ -0,0 +1,510 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Address, Condominium, Apartment, Visitor, Visit, Occurrence, Reservation, Finance, Vehicle, Order,
+    Notice, Communication, Resident
+)
+from core.search import rebuild_search_index, search_enabled
+from core.utils import bump_tenant_versions
+from users.models import Person
+from utils.utils import search_key
+from utils.validators import plate_lookup_key
+
+# Tamanhos pré-definidos: condomínios, pessoas e visitas
+SCALES = {
+    'small': (5, 500, 5_000),
+    'medium': (50, 10_000, 500_000),
+    'large': (500, 100_000, 10_000_000),
+}
+
+FIRST_NAMES = (
+    'Ana', 'Antônio', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Daniela', 'Diego', 'Eduarda', 'Felipe',
+    'Fernanda', 'Gabriel', 'Helena', 'Igor', 'Isabela', 'João', 'Júlia', 'Larissa', 'Lucas', 'Luíza',
+    'Marcelo', 'Maria', 'Mariana', 'Mateus', 'Natália', 'Otávio', 'Patrícia', 'Pedro', 'Rafael', 'Renata',
+    'Rodrigo', 'Sofia', 'Thiago', 'Valéria', 'Vinícius', 'Yasmin',
+)
+LAST_NAMES = (
+    'Almeida', 'Alves', 'Araújo', 'Barbosa', 'Cardoso', 'Carvalho', 'Castro', 'Conceição', 'Costa',
+    'Dias', 'Fernandes', 'Ferreira', 'Gomes', 'Lima', 'Martins', 'Melo', 'Moreira', 'Nascimento',
+    'Oliveira', 'Pereira', 'Ribeiro', 'Rocha', 'Santos', 'Silva', 'Sousa', 'Souza', 'Teixeira', 'Vieira',
+)
+CITIES = (
+    ('São Paulo', 'SP'), ('Rio de Janeiro', 'RJ'), ('Belo Horizonte', 'MG'), ('Curitiba', 'PR'),
+    ('Porto Alegre', 'RS'), ('Salvador', 'BA'), ('Recife', 'PE'), ('Fortaleza', 'CE'), ('Goiânia', 'GO'),
+)
+POSITIONS = ('Porteiro', 'Zelador', 'Segurança', 'Faxineiro')
+VEHICLES = (('Onix', 'Prata'), ('HB20', 'Branco'), ('Gol', 'Preto'), ('Corolla', 'Cinza'), ('Kwid', 'Vermelho'))
+NOTICE_TOPICS = (
+    'Manutenção do elevador', 'Limpeza da caixa d\'água', 'Assembleia geral', 'Dedetização das áreas comuns',
+    'Obras na fachada', 'Troca do portão da garagem', 'Horário da piscina', 'Coleta seletiva',
+)
+OCCURRENCE_TOPICS = (
+    'Barulho após as 22h', 'Vazamento na garagem', 'Lâmpada queimada no corredor', 'Portão travado',
+    'Vaga ocupada indevidamente', 'Infiltração no teto',
+)
+SENTENCES = (
+    'Pedimos a colaboração de todos os moradores.',
+    'O serviço será realizado no período da manhã.',
+    'Em caso de dúvidas, procure a administração.',
+    'A portaria foi orientada sobre o procedimento.',
+    'O acesso ficará restrito durante a execução.',
+    'Agradecemos a compreensão.',
+)
+
+
+@contextmanager
+def keep_dates(model, *field_names):
+    """
+    Desliga o auto_now/auto_now_add dos campos durante o bulk_create, para gravar datas no passado.
+
+    Sem isso, todos os registros gerados teriam a data da geração, e as consultas por período não
+    refletiriam o uso real.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Tenant:
+    """Ids gerados de um condomínio, para montar as relações dos demais registros."""
+
+    def __init__(self, condominium, weight):
+        self.condominium = condominium
+        self.weight = weight
+        self.apartments = []
+        self.owners = {}
+        self.employees = []
+        self.residents = []
+        self.visitors = []
+
+
+class DatasetGenerator:
+    """
+    Gera uma massa de dados realista e reproduzível (mesma semente, mesmos dados) em todos os modelos.
+
+    Os registros são gravados com bulk_create em lotes de 'batch_size', sem os sinais de gravação; por
+    isso a geração também preenche as chaves de busca (name_key, plate_key), os grupos de permissão e,
+    ao final, os contadores dos ETags e o índice de busca textual.
+
+    O volume de cada modelo acompanha o de pessoas e o de visitas: três funcionários e um síndico a cada
+    dez condomínios, o restante moradores com apartamento próprio; visitantes, encomendas, avisos e
+    comunicações em proporção. O movimento se concentra em alguns condomínios, como na operação real.
+    """
+
+    def __init__(self, condominiums, persons, visits, seed=0, batch_size=5000, days=365, password='benchmark',
+                 log=None):
+        self.condominiums = condominiums
+        self.persons = persons
+        self.visits = visits
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.password = make_password(password)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.tenants = []
+        self.admins = []
+        self.counts = {}
+        self.sequence = 0
+
+    # Valores aleatórios
+
+    def next_number(self):
+        self.sequence += 1
+        return self.sequence
+
+    def name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def cpf(self):
+        return f'{self.next_number():011d}'
+
+    def phone(self):
+        return f'{self.rng.randint(11, 99)}9{self.rng.randint(10_000_000, 99_999_999)}'
+
+    def plate(self):
+        letters = ''.join(self.rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))
+        return f'{letters}{self.rng.randint(0, 9)}{self.rng.choice("ABCDEFGHIJ")}{self.rng.randint(10, 99)}'
+
+    def past(self, max_days=None):
+        return self.now - timedelta(seconds=self.rng.randint(0, (max_days or self.days) * 86_400))
+
+    def text(self, sentences=3):
+        return ' '.join(self.rng.choice(SENTENCES) for _ in range(sentences))
+
+    def tenant(self):
+        return self.rng.choices(self.tenants, cum_weights=self.cum_weights)[0]
+
+    # Gravação
+
+    def save(self, model, objects):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        label = model._meta.label_lower
+        self.counts[label] = self.counts.get(label, 0) + len(created)
+        return created
+
+    def generate(self):
+        """
+        Grava a massa de dados.
+
+        Returns:
+            Dicionário modelo -> quantidade de registros criados.
+        """
+        with transaction.atomic():
+            self.generate_condominiums()
+            self.generate_people()
+            self.generate_dependents()
+            self.generate_vehicles()
+            self.generate_visitors()
+        # As visitas são gravadas em transações por lote: 10 milhões de linhas não cabem em uma só
+        self.generate_visits()
+        with transaction.atomic():
+            self.generate_orders()
+            self.generate_notices()
+            self.generate_communications()
+            self.generate_occurrences()
+            self.generate_reservations()
+            self.generate_finances()
+        self.refresh_derived_data()
+        return self.counts
+
+    def generate_condominiums(self):
+        self.log(f'Condomínios: {self.condominiums}')
+        admin_count = max(1, self.condominiums // 10)
+        self.admins = self.save(Person, [
+            self.person(Person.UserType.ADMIN) for _ in range(admin_count)
+        ])
+
+        addresses = self.save(Address, [
+            Address(
+                street=f'Rua {self.rng.choice(LAST_NAMES)}',
+                number=self.rng.randint(1, 3000),
+                neighborhood='Centro',
+                city=city,
+                state=state,
+                zip_code=f'{self.rng.randint(10_000_000, 99_999_999)}',
+            )
+            for city, state in (self.rng.choice(CITIES) for _ in range(self.condominiums))
+        ])
+        condominiums = self.save(Condominium, [
+            Condominium(
+                name=f'Residencial {self.rng.choice(LAST_NAMES)} {index + 1}',
+                cnpj=f'{self.next_number():014d}',
+                address=address,
+                code_condominium=uuid.UUID(int=self.rng.getrandbits(128)).hex[:8].upper(),
+                created_by=self.admins[index % admin_count],
+            )
+            for index, address in enumerate(addresses)
+        ])
+        Person.managed_condominiums.through.objects.bulk_create([
+            Person.managed_condominiums.through(person_id=self.admins[index % admin_count].pk, condominium_id=condo.pk)
+            for index, condo in enumerate(condominiums)
+        ], batch_size=self.batch_size)
+
+        # Distribuição de cauda longa: poucos condomínios concentram boa parte do movimento
+        self.tenants = [Tenant(condo, self.rng.paretovariate(1.5)) for condo in condominiums]
+        self.cum_weights = []
+        total = 0
+        for tenant in self.tenants:
+            total += tenant.weight
+            self.cum_weights.append(total)
+
+    def person(self, user_type, tenant=None, apartment=None):
+        name = self.name()
+        number = self.next_number()
+        return Person(
+            email=f'{search_key(name).replace(" ", ".")}.{number}@exemplo.com.br',
+            name=name,
+            name_key=search_key(name),
+            cpf=f'{number:011d}',
+            telephone=self.phone(),
+            user_type=user_type,
+            position=self.rng.choice(POSITIONS) if user_type == Person.UserType.EMPLOYEE else None,
+            condominium=tenant.condominium if tenant else None,
+            apartment=apartment,
+            password=self.password,
+            is_active=True,
+            date_joined=self.past(),
+        )
+
+    def generate_people(self):
+        residents = max(self.persons - len(self.admins) - 3 * len(self.tenants), len(self.tenants))
+        self.log(f'Pessoas: {len(self.admins) + 3 * len(self.tenants) + residents}')
+
+        # Apartamentos: ~20% a mais que moradores (unidades vagas), repartidos pelo peso do condomínio
+        apartments = []
+        for tenant in self.tenants:
+            tenant_residents = max(1, round(residents * tenant.weight / self.cum_weights[-1]))
+            units = max(1, int(tenant_residents * 1.2))
+            floors = max(1, min(30, units // 8))
+            blocks = max(1, -(-units // (floors * 8)))
+            for index in range(units):
+                block, position = divmod(index, floors * 8)
+                floor, unit = divmod(position, 8)
+                apartments.append(Apartment(
+                    condominium=tenant.condominium,
+                    number=(floor + 1) * 100 + unit + 1,
+                    block=chr(ord('A') + block) if blocks <= 26 else f'B{block + 1}',
+                    tread=floor + 1,
+                    occupation=Apartment.Occupation.OCCUPIED,
+                ))
+            tenant.resident_target = tenant_residents
+        created = self.save(Apartment, apartments)
+        by_condo = {tenant.condominium.pk: tenant for tenant in self.tenants}
+        for apartment in created:
+            by_condo[apartment.condominium_id].apartments.append(apartment)
+
+        people = []
+        for tenant in self.tenants:
+            people += [self.person(Person.UserType.EMPLOYEE, tenant) for _ in range(3)]
+            occupied = self.rng.sample(tenant.apartments, min(tenant.resident_target, len(tenant.apartments)))
+            people += [self.person(Person.UserType.RESIDENT, tenant, apartment) for apartment in occupied]
+        people = self.save(Person, people)
+
+        groups = dict(Group.objects.filter(
+            name__in=['Moradores', 'Funcionários', 'Administração']
+        ).values_list('name', 'id'))
+        group_names = {
+            Person.UserType.RESIDENT: 'Moradores',
+            Person.UserType.EMPLOYEE: 'Funcionários',
+            Person.UserType.ADMIN: 'Administração',
+        }
+        memberships = []
+        for person in [*self.admins, *people]:
+            group_id = groups.get(group_names[person.user_type])
+            if group_id:
+                memberships.append(Person.groups.through(person_id=person.pk, group_id=group_id))
+            if person.user_type == Person.UserType.EMPLOYEE:
+                by_condo[person.condominium_id].employees.append(person.pk)
+            elif person.user_type == Person.UserType.RESIDENT:
+                tenant = by_condo[person.condominium_id]
+                tenant.residents.append(person.pk)
+                tenant.owners[person.apartment_id] = person.pk
+        Person.groups.through.objects.bulk_create(memberships, batch_size=self.batch_size)
+
+    def generate_dependents(self):
+        dependents = []
+        for tenant in self.tenants:
+            for apartment_id, owner_id in list(tenant.owners.items())[::2]:
+                name = self.name()
+                dependents.append(Resident(
+                    condominium=tenant.condominium,
+                    name=name,
+                    name_key=search_key(name),
+                    cpf=self.cpf(),
+                    phone=self.phone(),
+                    registered_by_id=owner_id,
+                    apartment_id=apartment_id,
+                    created_at=self.past(),
+                ))
+        self.log(f'Dependentes: {len(dependents)}')
+        with keep_dates(Resident, 'created_at'):
+            self.save(Resident, dependents)
+
+    def generate_vehicles(self):
+        vehicles = []
+        for tenant in self.tenants:
+            for owner_id in tenant.residents[::2]:
+                plate = self.plate()
+                model, color = self.rng.choice(VEHICLES)
+                vehicles.append(Vehicle(
+                    condominium=tenant.condominium,
+                    registered_by_id=self.rng.choice(tenant.employees),
+                    plate=plate,
+                    plate_key=plate_lookup_key(plate),
+                    model=model,
+                    color=color,
+                    owner_id=owner_id,
+                ))
+        self.log(f'Veículos: {len(vehicles)}')
+        self.save(Vehicle, vehicles)
+
+    def generate_visitors(self):
+        total = max(len(self.tenants), self.visits // 20)
+        self.log(f'Visitantes: {total}')
+        visitors = []
+        for _ in range(total):
+            tenant = self.tenant()
+            name = self.name()
+            visitors.append(Visitor(
+                condominium=tenant.condominium,
+                name=name,
+                name_key=search_key(name),
+                cpf=self.cpf(),
+                telephone=self.phone(),
+                registered_by_id=self.rng.choice(tenant.employees),
+            ))
+        by_condo = {tenant.condominium.pk: tenant for tenant in self.tenants}
+        for visitor in self.save(Visitor, visitors):
+            by_condo[visitor.condominium_id].visitors.append(visitor.pk)
+        # Todo condomínio com movimento precisa de ao menos um visitante
+        for tenant in self.tenants:
+            if not tenant.visitors:
+                name = self.name()
+                visitor = Visitor.objects.create(
+                    condominium=tenant.condominium, name=name, cpf=self.cpf(),
+                    registered_by_id=tenant.employees[0],
+                )
+                tenant.visitors.append(visitor.pk)
+
+    def generate_visits(self):
+        self.log(f'Visitas: {self.visits}')
+        # Quem ainda está dentro: entradas das últimas horas, sem saída
+        open_since = self.now - timedelta(hours=6)
+        for start in range(0, self.visits, self.batch_size):
+            visits = []
+            for _ in range(min(self.batch_size, self.visits - start)):
+                tenant = self.tenant()
+                entry = self.past()
+                visits.append(Visit(
+                    condominium=tenant.condominium,
+                    visitor_id=self.rng.choice(tenant.visitors),
+                    apartment=self.rng.choice(tenant.apartments),
+                    entry_date=entry,
+                    exit_date=None if entry > open_since else entry + timedelta(minutes=self.rng.randint(10, 480)),
+                    registered_by_id=self.rng.choice(tenant.employees),
+                ))
+            with transaction.atomic(), keep_dates(Visit, 'entry_date'):
+                self.save(Visit, visits)
+            if (start // self.batch_size) % 100 == 99:
+                self.log(f'  {start + len(visits)} visitas gravadas')
+
+    def generate_orders(self):
+        orders = []
+        for tenant in self.tenants:
+            for owner_id in tenant.residents:
+                for _ in range(2):
+                    received = self.past(90)
+                    orders.append(Order(
+                        condominium=tenant.condominium,
+                        registered_by_id=self.rng.choice(tenant.employees),
+                        order_code=f'BR{self.rng.randint(10**9, 10**10 - 1)}',
+                        order_date=received,
+                        status=Order.StatusChoices.RECEIVED if received > self.now - timedelta(days=2)
+                        else Order.StatusChoices.COMPLETED,
+                        owner_id=owner_id,
+                    ))
+        self.log(f'Encomendas: {len(orders)}')
+        with keep_dates(Order, 'order_date'):
+            self.save(Order, orders)
+
+    def generate_notices(self):
+        notices = []
+        for tenant in self.tenants:
+            for _ in range(20):
+                created = self.past()
+                notices.append(Notice(
+                    condominium=tenant.condominium,
+                    title=self.rng.choice(NOTICE_TOPICS),
+                    content=self.text(4),
+                    created_at=created,
+                    updated_at=created,
+                    author_id=tenant.condominium.created_by_id,
+                ))
+        self.log(f'Avisos: {len(notices)}')
+        with keep_dates(Notice, 'created_at', 'updated_at'):
+            self.save(Notice, notices)
+
+    def generate_communications(self):
+        communications, recipients = [], []
+        for tenant in self.tenants:
+            for _ in range(50):
+                notice = self.rng.random() < 0.3
+                communications.append(Communication(
+                    condominium=tenant.condominium,
+                    communication_type=Communication.CommunicationTypeChoices.NOTICE if notice
+                    else Communication.CommunicationTypeChoices.MESSAGE,
+                    title=self.rng.choice(NOTICE_TOPICS if notice else OCCURRENCE_TOPICS),
+                    message=self.text(),
+                    created_at=self.past(),
+                    all_residents=notice,
+                    sender_id=tenant.condominium.created_by_id,
+                ))
+                recipients.append(self.rng.sample(tenant.residents, min(3, len(tenant.residents))))
+        self.log(f'Comunicações: {len(communications)}')
+        with keep_dates(Communication, 'created_at'):
+            communications = self.save(Communication, communications)
+        Communication.recipients.through.objects.bulk_create([
+            Communication.recipients.through(communication_id=communication.pk, person_id=person_id)
+            for communication, people in zip(communications, recipients)
+            for person_id in people
+        ], batch_size=self.batch_size)
+
+    def generate_occurrences(self):
+        occurrences = []
+        for tenant in self.tenants:
+            for _ in range(20):
+                occurrences.append(Occurrence(
+                    condominium=tenant.condominium,
+                    title=self.rng.choice(OCCURRENCE_TOPICS),
+                    description=self.text(),
+                    status=self.rng.choice(Occurrence.StatusChoices.values),
+                    date_reported=self.past(),
+                    reported_by_id=self.rng.choice(tenant.residents),
+                ))
+        self.log(f'Ocorrências: {len(occurrences)}')
+        with keep_dates(Occurrence, 'date_reported'):
+            self.save(Occurrence, occurrences)
+
+    def generate_reservations(self):
+        reservations = []
+        for tenant in self.tenants:
+            # Uma reserva por espaço e dia, sem conflito de horário
+            for index, resident_id in enumerate(tenant.residents[::5]):
+                start = (self.now + timedelta(days=index // len(Reservation.SpaceChoices) + 1)).replace(
+                    hour=14, minute=0, second=0, microsecond=0
+                )
+                reservations.append(Reservation(
+                    condominium=tenant.condominium,
+                    resident_id=resident_id,
+                    space=Reservation.SpaceChoices.values[index % len(Reservation.SpaceChoices)],
+                    start_time=start,
+                    end_time=start + timedelta(hours=4),
+                ))
+        self.log(f'Reservas: {len(reservations)}')
+        self.save(Reservation, reservations)
+
+    def generate_finances(self):
+        finances = []
+        for tenant in self.tenants:
+            for month in range(24):
+                finances.append(Finance(
+                    condominium=tenant.condominium,
+                    creator_id=tenant.condominium.created_by_id,
+                    value=Decimal(self.rng.randint(-50_000_00, 80_000_00)) / 100,
+                    date=self.now - timedelta(days=30 * month),
+                    description=f'Lançamento de {month + 1} mês(es) atrás',
+                ))
+        self.log(f'Lançamentos financeiros: {len(finances)}')
+        with keep_dates(Finance, 'date'):
+            self.save(Finance, finances)
+
+    def refresh_derived_data(self):
+        """Atualiza o que os sinais de gravação manteriam: contadores dos ETags e índice de busca."""
+        condominium_ids = [tenant.condominium.pk for tenant in self.tenants]
+        for model in (
+            Apartment, Visitor, Visit, Occurrence, Reservation, Finance, Vehicle, Order, Notice, Communication,
+            Resident, Person,
+        ):
+            bump_tenant_versions(model, condominium_ids)
+        if search_enabled():
+            self.log('Índice de busca textual')
+            rebuild_search_index()
+
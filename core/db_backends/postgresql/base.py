@@ -0,0 +1,33 @@
+from time import perf_counter
+
+from django.db.backends.postgresql import base
+
+from core.metrics import DB_CONNECTION_WAIT
+
+try:
+    from psycopg_pool import PoolTimeout
+except ImportError:
+    # Opcional: sem o psycopg_pool não há pool (OPTIONS['pool']) e, portanto, nem espera por ele
+    PoolTimeout = None
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Backend do PostgreSQL do Django que mede a espera por conexões (condomineo_db_connection_wait_seconds).
+
+    Com o pool (OPTIONS['pool']), é o tempo para retirar uma conexão dele, que cresce quando todas estão em
+    uso; sem o pool, é o custo de abrir uma nova (TCP, TLS e autenticação). Estourar DB_POOL_TIMEOUT conta
+    como 'timeout'.
+    """
+
+    def get_new_connection(self, conn_params):
+        pooled = 'true' if self.pool else 'false'
+        started = perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception as e:
+            result = 'timeout' if PoolTimeout is not None and isinstance(e, PoolTimeout) else 'error'
+            DB_CONNECTION_WAIT.observe(perf_counter() - started, alias=self.alias, pooled=pooled, result=result)
+            raise
+        DB_CONNECTION_WAIT.observe(perf_counter() - started, alias=self.alias, pooled=pooled, result='ok')
+        return connection
@@ -0,0 +1,149 @@
+import logging
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+logger = logging.getLogger(__name__)
+
+# Apps sempre lidos do principal: os fluxos de login leem na requisição seguinte o que acabaram de gravar
+PRIMARY_ONLY_APPS = ('sessions', 'account', 'socialaccount', 'token_blacklist')
+# Cookie que mantém o navegador no principal logo depois de uma gravação
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class RequestRouting:
+    """Réplica escolhida para a requisição e se ela já gravou algo (a partir daí, tudo vai ao principal)."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def reading_from_replica():
+    routing = _routing.get()
+    return bool(routing and routing.replica and not routing.wrote)
+
+
+@contextmanager
+def use_primary():
+    """Lê do principal dentro do bloco, mesmo numa requisição encaminhada a uma réplica."""
+    routing = _routing.get()
+    if routing is None or routing.replica is None:
+        yield
+        return
+    replica, routing.replica = routing.replica, None
+    try:
+        yield
+    finally:
+        routing.replica = replica
+
+
+class ReplicaRouter:
+    """
+    Encaminha as leituras das requisições seguras (GET, HEAD, OPTIONS) para uma das réplicas de
+    DATABASE_REPLICAS; gravações e todo o resto vão ao banco principal ('default').
+
+    Depois da primeira gravação, a requisição inteira passa a ler do principal, e as leituras dentro de
+    uma transação também, para não misturar dados da réplica com os que a transação acabou de gravar.
+    Fora de uma requisição (comandos, tarefas em segundo plano), nada muda.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None:
+            return None
+        if (routing.replica is None or routing.wrote or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Explícito: sem isso, o Django gravaria um objeto lido da réplica de volta na réplica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema pela replicação
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+def request_user_id(request):
+    """Id do usuário pelo JWT da requisição, sem consultar o banco; None sem token válido."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+def primary_pin_key(user_id):
+    return f'db:primary-pin:{user_id}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Define, por requisição, se as leituras podem ir para uma réplica.
+
+    Garante que o usuário leia o que acabou de gravar: por REPLICA_STICKY_SECONDS depois de uma
+    gravação, as requisições dele vão ao principal, identificadas pelo id do JWT (apps) ou por um
+    cookie (navegador). Sem réplicas configuradas, não faz nada. A marcação do JWT fica no cache, então
+    com o cache na memória de cada processo (CACHE_PER_PROCESS) outro worker não a veria e leria da
+    réplica o que o usuário acabou de gravar: nesse caso, tudo continua no principal.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.DATABASE_REPLICAS and settings.CACHE_PER_PROCESS:
+            logger.warning(
+                "DATABASE_REPLICA_URLS exige um cache compartilhado (CACHE_BACKEND); as leituras ficam no principal."
+            )
+
+    def __call__(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or settings.CACHE_PER_PROCESS:
+            return self.get_response(request)
+
+        user_id = request_user_id(request)
+        use_replica = request.method in SAFE_METHODS and not self.pinned(request, user_id)
+        routing = RequestRouting(random.choice(replicas) if use_replica else None)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if routing.wrote:
+            self.pin(response, user_id)
+        return response
+
+    def pinned(self, request, user_id):
+        if request.COOKIES.get(PRIMARY_PIN_COOKIE):
+            return True
+        return user_id is not None and bool(cache.get(primary_pin_key(user_id)))
+
+    def pin(self, response, user_id):
+        seconds = settings.REPLICA_STICKY_SECONDS
+        if user_id is not None:
+            cache.set(primary_pin_key(user_id), True, seconds)
+        response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
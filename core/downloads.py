@@ -0,0 +1,172 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core.storage import blob_digest, is_blob_name
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Interpreta o cabeçalho Range para um arquivo de 'size' bytes.
+
+    Apenas um intervalo é atendido; cabeçalhos com vários intervalos ou mal formados são ignorados e o
+    arquivo é enviado inteiro, como o RFC 9110 permite.
+
+    Returns:
+        Tupla (início, fim) inclusiva, ou None para enviar o arquivo inteiro.
+
+    Raises:
+        RangeNotSatisfiable: Se o intervalo começa depois do fim do arquivo.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or size == 0:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # 'bytes=-500': os últimos 500 bytes
+        return max(size - int(end), 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, end
+
+
+def iter_file_range(path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_etag(name, stat):
+    # Documentos deduplicados já têm o hash do conteúdo no nome
+    if is_blob_name(name):
+        return f'"{blob_digest(name)}"'
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def offloaded_file_response(storage, name):
+    """Resposta vazia com o cabeçalho que manda o servidor web (nginx/Apache) enviar o arquivo."""
+    response = HttpResponse()
+    if settings.MEDIA_DELIVERY_MODE == 'x-accel':
+        response['X-Accel-Redirect'] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{name}"
+    else:
+        response['X-Sendfile'] = storage.path(name)
+    # O servidor web define o Content-Type a partir do arquivo
+    del response['Content-Type']
+    return response
+
+
+def protected_file_response(request, storage, name, filename):
+    """
+    Envia um arquivo do storage depois que a permissão do usuário já foi verificada.
+
+    Nos modos 'x-accel' e 'x-sendfile', a transferência fica com o servidor web e o worker do Python
+    é liberado na hora. No modo 'django', o arquivo é transmitido com suporte a Range (retomada de
+    downloads e visualização de PDFs por partes), ETag e Last-Modified.
+    """
+    if settings.MEDIA_DELIVERY_MODE in ('x-accel', 'x-sendfile'):
+        response = offloaded_file_response(storage, name)
+    else:
+        path = storage.path(name)
+        stat = os.stat(path)
+        etag = file_etag(name, stat)
+        last_modified = http_date(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = file_range_response(request, path, stat.st_size, etag, last_modified)
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response['Accept-Ranges'] = 'bytes'
+        content_type, _ = mimetypes.guess_type(filename)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+
+    response['Content-Disposition'] = content_disposition_header(
+        request.query_params.get('attachment') == 'true', filename
+    )
+    # Arquivos privados: o navegador pode guardar, mas deve revalidar (o ETag torna a revalidação barata)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def file_range_response(request, path, size, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    range_header = request.headers.get('Range')
+    if if_range and if_range not in (etag, last_modified):
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        # FileResponse usa o wsgi.file_wrapper (sendfile) do servidor quando disponível
+        return FileResponse(open(path, 'rb'))
+
+    start, end = byte_range
+    response = StreamingHttpResponse(iter_file_range(path, start, end), status=status.HTTP_206_PARTIAL_CONTENT)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+class ProtectedDownloadMixin:
+    """
+    Adiciona o endpoint '<recurso>/{id}/download/' ao ViewSet.
+
+    O registro é buscado com get_object(), então só baixa o arquivo quem enxerga o registro pelo
+    escopo do get_queryset (queryset_filter_*). Com '?rendition=thumb' ou '?rendition=display',
+    envia a versão reduzida gerada pelo pipeline de imagens.
+    """
+    download_field = None
+    download_filename = 'arquivo'
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        instance = self.get_object()
+
+        rendition = request.query_params.get('rendition')
+        if rendition:
+            info = (instance.renditions or {}).get('renditions', {}).get(rendition)
+            storage, name = default_storage, info['name'] if info else None
+        else:
+            file = getattr(instance, self.download_field)
+            storage, name = file.storage, file.name
+
+        if not name or not storage.exists(name):
+            return Response({"detail": "Arquivo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        extension = os.path.splitext(name)[1].lower()
+        return protected_file_response(request, storage, name, f'{self.download_filename}-{instance.pk}{extension}')
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import ChangeLog, Order, Visit, Communication
+from core.utils import change_log_cursor, change_log_horizon
+from users.models import Person
+
+logger = logging.getLogger(__name__)
+
+# Criações que viram eventos em tempo real
+EVENT_TYPES = {
+    'core.order': 'order.received',
+    'core.communication': 'communication.created',
+    'core.visit': 'visit.registered',
+}
+
+
+def event_audience(model, object_ids):
+    """
+    Quem pode receber o evento de cada registro, seguindo as regras dos queryset_filter_*.
+
+    Returns:
+        Dicionário id do registro -> (visível para administração/portaria, ids das pessoas que também recebem).
+    """
+    if model == 'core.order':
+        return {
+            order_id: (True, {owner_id})
+            for order_id, owner_id in Order.objects.filter(id__in=object_ids).values_list('id', 'owner_id')
+        }
+
+    if model == 'core.visit':
+        visits = list(Visit.objects.filter(id__in=object_ids).values_list('id', 'apartment_id', 'registered_by_id'))
+        residents = dict(
+            Person.objects.filter(apartment_id__in={apartment_id for _, apartment_id, _ in visits})
+            .values_list('apartment_id', 'id')
+        )
+        return {
+            visit_id: (True, {residents.get(apartment_id), registered_by_id} - {None})
+            for visit_id, apartment_id, registered_by_id in visits
+        }
+
+    # Comunicações são vistas apenas pelos participantes, inclusive pela administração
+    audience = {object_id: (False, set()) for object_id in object_ids}
+    recipients = Communication.recipients.through.objects.filter(communication_id__in=object_ids)
+    for communication_id, person_id in recipients.values_list('communication_id', 'person_id'):
+        audience[communication_id][1].add(person_id)
+    return audience
+
+
+def latest_event_id():
+    return change_log_cursor()
+
+
+def fetch_events(after_id, limit=500):
+    """
+    Busca as criações registradas no ChangeLog depois de 'after_id' que viram eventos.
+
+    O ChangeLog é gravado na mesma transação da alteração, então ele funciona como um broker
+    compartilhado por todos os workers: cada processo consulta a tabela e distribui os eventos
+    às conexões que mantém abertas. Como na sincronização, o cursor para antes de alterações ainda
+    não confirmadas (change_log_horizon) e de comunicações recentes ainda sem destinatários.
+
+    Returns:
+        Tupla (eventos, novo cursor); o cursor só fica igual a 'after_id' quando não há nada novo a entregar.
+    """
+    close_old_connections()
+    latest = ChangeLog.objects.aggregate(cursor=Max('id'))['cursor'] or after_id
+    horizon = change_log_horizon(after_id, latest)
+    rows = list(
+        ChangeLog.objects.filter(
+            id__gt=after_id, id__lte=horizon, model__in=EVENT_TYPES, action=ChangeLog.Action.CREATE
+        ).order_by('id').values_list('id', 'model', 'object_id', 'condominium_id', 'created_at')[:limit]
+    )
+    cursor = rows[-1][0] if len(rows) == limit else horizon
+
+    audiences = {}
+    for model in {row[1] for row in rows}:
+        audiences[model] = event_audience(model, [row[2] for row in rows if row[1] == model])
+
+    recent = timezone.now() - timedelta(seconds=settings.SYNC_GAP_TIMEOUT)
+    events = []
+    for event_id, model, object_id, condominium_id, created_at in rows:
+        audience = audiences[model].get(object_id)
+        if audience is None:
+            # O registro foi excluído antes do evento ser enviado
+            continue
+        staff, people = audience
+        if not staff and not people and created_at >= recent:
+            # Comunicação gravada fora de uma transação com os destinatários: espera eles chegarem
+            cursor = event_id - 1
+            break
+        events.append({
+            'id': event_id,
+            'event': EVENT_TYPES[model],
+            'object_id': object_id,
+            'condominium_id': condominium_id,
+            'staff': staff,
+            'people': people,
+        })
+    return events, cursor
+
+
+def format_event(event):
+    data = json.dumps({'id': event['object_id'], 'condominium': event['condominium_id']})
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    """Uma conexão SSE aberta, com o escopo do usuário resolvido uma única vez na conexão."""
+
+    def __init__(self, tenant_ids, person_id, is_staff):
+        self.tenant_ids = set(tenant_ids)
+        self.person_id = person_id
+        self.is_staff = is_staff
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def accepts(self, event):
+        if event['condominium_id'] not in self.tenant_ids:
+            return False
+        return (self.is_staff and event['staff']) or self.person_id in event['people']
+
+
+class EventBroker:
+    """
+    Pub/sub em memória do processo.
+
+    Uma única tarefa consulta o ChangeLog a cada EVENTS_POLL_INTERVAL segundos, qualquer que seja o
+    número de conexões, e entrega cada evento na fila das conexões que podem vê-lo. Cada conexão
+    parada custa apenas uma fila e uma corrotina esperando.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = 0
+        self.task = None
+        self.loop = None
+
+    async def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.cursor = await sync_to_async(latest_event_id)()
+            self.loop = loop
+            self.task = loop.create_task(self.poll())
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def poll(self):
+        while self.subscribers:
+            try:
+                events, self.cursor = await sync_to_async(fetch_events)(self.cursor)
+                self.publish(events)
+            except Exception as e:
+                logger.error(f"Erro ao buscar eventos: {str(e)}")
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+
+    def publish(self, events):
+        for event in events:
+            for subscriber in list(self.subscribers):
+                if not subscriber.accepts(event):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Cliente lento: o evento é descartado e recuperado na reconexão pelo Last-Event-ID
+                    logger.warning(f"Fila de eventos cheia para a pessoa {subscriber.person_id}.")
+
+
+broker = EventBroker()
+
+
+async def stream_events(subscriber, last_event_id=None):
+    """Gera o corpo text/event-stream de uma conexão até o cliente desconectar."""
+    await broker.subscribe(subscriber)
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+
+        # Reconexão: reenvia, página a página, o que foi criado desde o último evento recebido pelo cliente
+        replayed = 0
+        if last_event_id and last_event_id.isdigit():
+            replayed = int(last_event_id)
+            while True:
+                events, cursor = await sync_to_async(fetch_events)(replayed)
+                for event in events:
+                    if subscriber.accepts(event):
+                        yield format_event(event)
+                if cursor == replayed:
+                    break
+                replayed = cursor
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENTS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém a conexão viva através de proxies e balanceadores
+                yield ': keep-alive\n\n'
+                continue
+            if event['id'] <= replayed:
+                # Já enviado na reconexão
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,91 @@
+import csv
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+
+
+# Começos de célula que o Excel interpreta como fórmula (injeção de fórmulas no CSV)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """
+    Pseudo-buffer usado pelo csv.writer: em vez de acumular as linhas,
+    devolve cada linha escrita para que ela seja enviada imediatamente.
+    """
+    def write(self, value):
+        return value
+
+
+def format_export_value(value):
+    """Converte um valor do banco para o texto gravado no CSV."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, Decimal):
+        return f'{value:.2f}'
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Texto livre (nomes, observações) vira texto literal no Excel, e não uma fórmula
+        return f"'{value}"
+    return value
+
+
+def stream_csv_rows(queryset, columns, chunk_size=None, delimiter=','):
+    """
+    Gera as linhas do CSV a partir de um cursor no servidor.
+
+    Args:
+        queryset: Queryset já filtrado pelo escopo do usuário.
+        columns: Sequência de tuplas (cabeçalho, campo) em que o campo aceita lookups ('visitor__name').
+        chunk_size: Quantidade de registros buscados por vez no banco.
+        delimiter: Separador das colunas.
+
+    Yields:
+        Cada linha do CSV já formatada, começando pelo cabeçalho.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    writer = csv.writer(Echo(), delimiter=delimiter)
+
+    # BOM para que o Excel reconheça o arquivo como UTF-8
+    yield '\ufeff'
+    yield writer.writerow([header for header, _ in columns])
+
+    # values_list evita instanciar os modelos; iterator() mantém a memória constante
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow([format_export_value(value) for value in row])
+
+
+def csv_streaming_response(queryset, columns, filename, delimiter=','):
+    """Retorna uma resposta HTTP que transmite o CSV sem carregar tudo em memória."""
+    response = StreamingHttpResponse(
+        stream_csv_rows(queryset, columns, delimiter=delimiter),
+        content_type='text/csv; charset=utf-8'
+    )
+    timestamp = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timestamp}.csv"'
+    return response
+
+
+class ExportCSVMixin:
+    """
+    Adiciona o endpoint '<recurso>/export/' ao ViewSet.
+
+    Reaproveita o get_queryset (escopo do usuário) e os filtros do ViewSet (filterset_class,
+    busca e ordenação), então os mesmos parâmetros da listagem valem para a exportação.
+    """
+    export_columns = ()
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        delimiter = ';' if request.query_params.get('delimiter') == ';' else ','
+        return csv_streaming_response(queryset, self.export_columns, self.export_filename, delimiter=delimiter)
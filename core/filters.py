@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django_filters import rest_framework as filters
 from core.models import (
     Apartment, Vehicle, Finance, Reservation, Visitor, Order,
@@ -6,11 +8,18 @@ from core.models import (
 from django.db.models import Q
 
 from users.models import Person
+from utils.utils import search_key
+from utils.validators import plate_lookup_key
 
 
 def getuser(request):
     return request.user
 
+
+def filter_search_key(queryset, name, value):
+    """Busca parcial pela chave normalizada do nome (índice de trigramas), sem diferenciar acentos e maiúsculas."""
+    return queryset.filter(**{f'{name}__contains': search_key(value)})
+
 # Funções de filtro de queryset conforme o tipo de usuário
 def queryset_filter_condominium(query_base, user):
     """Filtra o queryset conforme o tipo de usuário."""
@@ -173,6 +182,82 @@ def queryset_filter_occurrence(query_base, user):
     else: # Se for residente, retorna apenas os registros da ocorrência do apartamento do residente
         return query_base.filter(reported_by=user)
 
+# Campos que dão acesso ao registro para um morador, conforme os queryset_filter_* acima: a pessoa ('person')
+# ou o apartamento dela ('apartment'). Modelos fora daqui são vistos por todo o condomínio.
+RESIDENT_SCOPE_FIELDS = {
+    'core.apartment': (('apartment', 'pk'),),
+    'core.resident': (('person', 'registered_by_id'), ('apartment', 'apartment_id')),
+    'core.visit': (('apartment', 'apartment_id'), ('person', 'registered_by_id')),
+    'core.reservation': (('person', 'resident_id'),),
+    'core.vehicle': (('person', 'owner_id'),),
+    'core.order': (('person', 'owner_id'),),
+    'core.occurrence': (('person', 'reported_by_id'),),
+}
+
+
+def record_audiences(instances):
+    """
+    Quem enxerga cada registro (todos do mesmo modelo), nas mesmas regras dos queryset_filter_*. Guardado nas
+    exclusões do ChangeLog, quando o registro já não existe para ser filtrado. Comunicações e visitantes
+    custam uma consulta para o lote inteiro; os demais modelos saem dos próprios campos.
+
+    Returns:
+        Dicionário id do registro -> None quando todo o condomínio enxerga o registro; senão, a lista com
+        'staff' (administração e portaria), 'person:<id>' e 'apartment:<id>' (quem mora no apartamento).
+    """
+    if not instances:
+        return {}
+    label = instances[0]._meta.label_lower
+    ids = [instance.pk for instance in instances]
+    if label == 'core.communication':
+        # Comunicações são vistas apenas pelos participantes, inclusive pela administração
+        people = defaultdict(set)
+        recipients = Communication.recipients.through.objects.filter(communication_id__in=ids)
+        for communication_id, person_id in recipients.values_list('communication_id', 'person_id'):
+            people[communication_id].add(person_id)
+        return {
+            instance.pk: [
+                f'person:{person_id}' for person_id in sorted({instance.sender_id, *people[instance.pk]} - {None})
+            ]
+            for instance in instances
+        }
+    if label == 'core.visitor':
+        apartments = defaultdict(set)
+        for visitor_id, apartment_id in Visit.objects.filter(visitor_id__in=ids).values_list('visitor_id', 'apartment_id'):
+            apartments[visitor_id].add(apartment_id)
+        return {
+            instance.pk: [
+                'staff', f'person:{instance.registered_by_id}',
+                *(f'apartment:{pk}' for pk in sorted(apartments[instance.pk]))
+            ]
+            for instance in instances
+        }
+
+    fields = RESIDENT_SCOPE_FIELDS.get(label)
+    if fields is None:
+        return dict.fromkeys(ids)
+    audiences = {}
+    for instance in instances:
+        audience = audiences[instance.pk] = ['staff']
+        for kind, attribute in fields:
+            value = getattr(instance, attribute)
+            if value is not None:
+                audience.append(f'{kind}:{value}')
+    return audiences
+
+
+def audience_includes(user, audience):
+    """Se o usuário está no público gravado por record_audiences."""
+    if audience is None:
+        return True
+    tokens = {f'person:{user.pk}'}
+    if user.user_type in (Person.UserType.ADMIN, Person.UserType.EMPLOYEE):
+        tokens.add('staff')
+    if user.apartment_id:
+        tokens.add(f'apartment:{user.apartment_id}')
+    return not tokens.isdisjoint(audience)
+
+
 # Filtros para os ViewSets, usando django-filters para facilitar a filtragem via query parameters
 class ApartmentFilter(filters.FilterSet):
     number = filters.CharFilter(field_name='number', lookup_expr='iexact')
@@ -186,7 +271,7 @@ class ApartmentFilter(filters.FilterSet):
 
 
 class VehicleFilter(filters.FilterSet):
-    plate = filters.CharFilter(field_name='plate', lookup_expr='iexact')
+    plate = filters.CharFilter(method='filter_plate')
     owner = filters.NumberFilter(field_name='owner')
     condominium = filters.NumberFilter(field_name='condominium')
 
@@ -194,6 +279,10 @@ class VehicleFilter(filters.FilterSet):
         model = Vehicle
         fields = ['plate', 'owner', 'condominium']
 
+    def filter_plate(self, queryset, name, value):
+        # Busca pela chave normalizada (índice vehicle_plate_key_idx), aceitando hífen, Mercosul e trocas O/0, I/1
+        return queryset.filter(plate_key=plate_lookup_key(value))
+
 
 class FinanceFilter(filters.FilterSet):
     date_after = filters.DateTimeFilter(field_name='date', lookup_expr='gte')
@@ -219,7 +308,7 @@ class ReservationFilter(filters.FilterSet):
 
 class VisitorFilter(filters.FilterSet):
     document = filters.CharFilter(field_name='cpf', lookup_expr='iexact')
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(field_name='name_key', method=filter_search_key)
     condominium = filters.NumberFilter(field_name='condominium')
 
     class Meta:
@@ -228,14 +317,20 @@ class VisitorFilter(filters.FilterSet):
 
 
 class OrderFilter(filters.FilterSet):
-    order_code = filters.CharFilter(field_name='order_code', lookup_expr='icontains')
+    order_code = filters.CharFilter(method='filter_order_code')
+    order_code_prefix = filters.CharFilter(method='filter_order_code')
     status = filters.CharFilter(field_name='status', lookup_expr='iexact')
     owner = filters.NumberFilter(field_name='owner')
     condominium = filters.NumberFilter(field_name='condominium')
 
     class Meta:
         model = Order
-        fields = ['order_code', 'status', 'owner', 'condominium']
+        fields = ['order_code', 'order_code_prefix', 'status', 'owner', 'condominium']
+
+    def filter_order_code(self, queryset, name, value):
+        # Os códigos são gravados em maiúsculas, então a busca exata e por prefixo usa o índice order_code_idx
+        lookup = 'order_code__startswith' if name == 'order_code_prefix' else 'order_code'
+        return queryset.filter(**{lookup: value.strip().upper()})
 
 
 class CondominiumFilter(filters.FilterSet):
@@ -267,7 +362,7 @@ class NoticeFilter(filters.FilterSet):
 
 
 class VisitFilter(filters.FilterSet):
-    visitor_name = filters.CharFilter(field_name='visitor__name', lookup_expr='icontains')
+    visitor_name = filters.CharFilter(field_name='visitor__name_key', method=filter_search_key)
     apartment_number = filters.CharFilter(field_name='apartment__number', lookup_expr='iexact')
     condominium = filters.NumberFilter(field_name='condominium')
 
@@ -277,7 +372,7 @@ class VisitFilter(filters.FilterSet):
 
 
 class ResidentFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(field_name='name_key', method=filter_search_key)
     apartment_number = filters.CharFilter(field_name='apartment__number', lookup_expr='iexact')
     condominium = filters.NumberFilter(field_name='condominium')
 
@@ -60,4 +60,43 @@ class NoticeForm(forms.ModelForm):
 class CommunicationForm(forms.ModelForm):
     class Meta:
         model = Communication
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class CSVImportForm(forms.Form):
+    RESOURCE_CHOICES = [
+        ('apartments', 'Apartamentos'),
+        ('residents', 'Dependentes'),
+        ('vehicles', 'Veículos'),
+    ]
+    DELIMITER_CHOICES = [
+        (',', 'Vírgula (,)'),
+        (';', 'Ponto e vírgula (;)'),
+    ]
+
+    resource = forms.ChoiceField(choices=RESOURCE_CHOICES, label='Tipo de registro')
+    file = forms.FileField(label='Arquivo CSV')
+    delimiter = forms.ChoiceField(choices=DELIMITER_CHOICES, initial=',', label='Separador')
+
+
+class ApartmentGridForm(forms.Form):
+    NUMBERING_CHOICES = [
+        ('floor_unit', 'Andar + unidade (101, 102, ..., 1204)'),
+        ('sequential', 'Sequencial por bloco (1, 2, 3, ...)'),
+    ]
+
+    blocks = forms.CharField(label='Blocos', help_text='Separados por vírgula. Ex.: A, B, C, D')
+    floors = forms.IntegerField(min_value=1, max_value=200, label='Andares por bloco')
+    units_per_floor = forms.IntegerField(min_value=1, max_value=99, label='Unidades por andar')
+    start_floor = forms.IntegerField(min_value=0, initial=1, label='Primeiro andar')
+    numbering = forms.ChoiceField(choices=NUMBERING_CHOICES, label='Numeração')
+    skip_existing = forms.BooleanField(required=False, label='Ignorar apartamentos já cadastrados')
+
+    def clean_blocks(self):
+        blocks = [block.strip().upper() for block in self.cleaned_data['blocks'].split(',') if block.strip()]
+        if not blocks:
+            raise forms.ValidationError('Informe pelo menos um bloco.')
+        if len(set(blocks)) != len(blocks):
+            raise forms.ValidationError('Os blocos não podem se repetir.')
+        if any(len(block) > 10 for block in blocks):
+            raise forms.ValidationError('Cada bloco deve ter até 10 caracteres.')
+        return blocks
@@ -0,0 +1,194 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.utils import record_changes
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'renditions/'
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+
+
+def get_executor():
+    """Pool de threads compartilhado pelo processo para o processamento das imagens."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix='image-renditions'
+        )
+    return _executor
+
+
+def rendition_sizes():
+    """Lado maior (px) de cada versão gerada."""
+    return {'thumb': settings.IMAGE_THUMBNAIL_SIZE, 'display': settings.IMAGE_DISPLAY_SIZE}
+
+
+def encode_rendition(image, max_size, image_format):
+    """Reduz a imagem e codifica sem metadados (EXIF com GPS, modelo do aparelho, perfil ICC)."""
+    rendition = image.copy()
+    rendition.thumbnail((max_size, max_size))
+    mode = 'RGBA' if image_format == 'WEBP' and rendition.has_transparency_data else 'RGB'
+    if rendition.mode != mode:
+        rendition = rendition.convert(mode)
+    rendition.info = {}
+
+    buffer = BytesIO()
+    rendition.save(buffer, format=image_format, quality=settings.IMAGE_RENDITION_QUALITY)
+    return rendition, buffer.getvalue()
+
+
+def build_renditions(storage, name):
+    """
+    Gera as versões reduzidas de um arquivo lido de 'storage'.
+
+    Returns:
+        Dicionário gravado no campo 'renditions' do modelo: dimensões e tamanho do original e, para
+        cada versão, o nome no storage, as dimensões e o tamanho. Arquivos que não são imagem (PDF,
+        DOCX) registram apenas o tamanho.
+    """
+    info = {'source': name, 'size': storage.size(name), 'renditions': {}}
+    with storage.open(name, 'rb') as file:
+        try:
+            image = Image.open(file)
+            image.load()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            return info
+
+    # Aplica a orientação do EXIF antes de descartá-lo, senão as fotos de celular ficam deitadas
+    image = ImageOps.exif_transpose(image)
+    info['width'], info['height'] = image.size
+
+    image_format = settings.IMAGE_RENDITION_FORMAT.upper()
+    base = os.path.splitext(os.path.basename(name))[0]
+    for label, max_size in rendition_sizes().items():
+        rendition, content = encode_rendition(image, max_size, image_format)
+        # As versões ficam no storage padrão, fora da contagem de referências dos documentos
+        saved = default_storage.save(
+            f'{RENDITIONS_DIR}{base}_{label}.{FORMAT_EXTENSIONS[image_format]}', ContentFile(content)
+        )
+        info['renditions'][label] = {
+            'name': saved,
+            'width': rendition.width,
+            'height': rendition.height,
+            'size': len(content),
+        }
+    return info
+
+
+def process_renditions(model, field_name, name):
+    """
+    Gera as versões do arquivo e grava o resultado em todos os registros que apontam para ele.
+
+    A atualização é feita pelo nome do arquivo, então uma assinatura compartilhada por um lote de
+    encomendas é processada uma única vez, e um registro cujo arquivo mudou no meio do caminho não
+    recebe versões do arquivo antigo. Se nenhum registro precisar mais das versões geradas, elas
+    são apagadas.
+    """
+    try:
+        field = model._meta.get_field(field_name)
+        records = model.objects.filter(**{field_name: name})
+        if all(source == name for source in records.values_list('renditions__source', flat=True)):
+            # Nenhum registro aponta mais para o arquivo, ou outra tarefa já gerou as versões dele
+            return
+        info = build_renditions(field.storage, name)
+        with transaction.atomic():
+            # A conferência e a gravação ficam na mesma transação, com os registros travados: uma tarefa
+            # atrasada não sobrescreve as versões gravadas por outra
+            current = records.select_for_update().values_list('condominium_id', 'id', 'renditions__source')
+            changes = [(condominium_id, pk) for condominium_id, pk, source in current if source != name]
+            model.objects.filter(pk__in=[pk for _, pk in changes]).update(renditions=info)
+            record_changes(model, changes)
+        if not changes:
+            delete_renditions(rendition_names(info))
+    except Exception as e:
+        logger.error(f"Erro ao gerar as versões de {name}: {str(e)}")
+
+
+def rendition_names(info):
+    """Nomes no storage das versões registradas em 'info' (o campo 'renditions' do modelo)."""
+    return [rendition['name'] for rendition in (info or {}).get('renditions', {}).values()]
+
+
+def delete_renditions(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError as e:
+            logger.error(f"Erro ao apagar a versão {name}: {str(e)}")
+
+
+def discard_renditions(model, field_name, *infos):
+    """
+    Apaga do storage, depois do commit, as versões de cada 'info' quando nenhum registro do modelo aponta mais
+    para o arquivo de origem (uma assinatura é compartilhada por um lote de encomendas, e as versões também).
+    Vários 'infos' (exclusão em lote) custam uma única consulta.
+    """
+    names_by_source = {}
+    for info in infos:
+        names = rendition_names(info)
+        if names:
+            names_by_source.setdefault(info.get('source'), set()).update(names)
+    if not names_by_source:
+        return
+
+    def run():
+        sources = [source for source in names_by_source if source]
+        referenced = set(model.objects.filter(**{f'{field_name}__in': sources}).values_list(field_name, flat=True))
+        for source, names in names_by_source.items():
+            if source not in referenced:
+                delete_renditions(sorted(names))
+
+    transaction.on_commit(run)
+
+
+def process_renditions_in_worker(model, field_name, name):
+    try:
+        process_renditions(model, field_name, name)
+    finally:
+        # Cada thread abre a própria conexão com o banco; fecha ao terminar para não vazar conexões
+        connections.close_all()
+
+
+def schedule_renditions(model, field_name, name):
+    """Agenda o processamento para depois do commit, fora da thread da requisição."""
+    if not name:
+        return
+
+    def run():
+        if settings.IMAGE_PIPELINE_ASYNC:
+            get_executor().submit(process_renditions_in_worker, model, field_name, name)
+        else:
+            process_renditions(model, field_name, name)
+
+    transaction.on_commit(run)
+
+
+def rendition_urls(storage, info, request=None):
+    """Monta a representação pública das versões, com URLs absolutas quando houver requisição."""
+    if not info or not info.get('renditions'):
+        return None
+
+    def url(name):
+        value = storage.url(name)
+        return request.build_absolute_uri(value) if request else value
+
+    data = {'width': info.get('width'), 'height': info.get('height'), 'size': info.get('size')}
+    for label, rendition in info['renditions'].items():
+        data[label] = {
+            'url': url(rendition['name']),
+            'width': rendition['width'],
+            'height': rendition['height'],
+            'size': rendition['size'],
+        }
+    return data
@@ -0,0 +1,317 @@
+import csv
+import logging
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from core.models import Apartment, Resident, Vehicle, ChangeLog
+from core.utils import plate_index_cache_key, record_changes
+from utils.utils import search_key
+from utils.validators import (
+    validator_cpf, validator_telephone, validator_email, validator_plate, normalize_plate, plate_lookup_key
+)
+
+logger = logging.getLogger(__name__)
+
+
+def validation_messages(error):
+    """Extrai as mensagens de um serializers.ValidationError como lista de textos."""
+    detail = error.detail if isinstance(error.detail, list) else [error.detail]
+    return [str(message) for message in detail]
+
+
+def decode_lines(file):
+    """
+    Decodifica o arquivo linha a linha: UTF-8 (com ou sem BOM) e, nas linhas que não são UTF-8, Windows-1252,
+    a codificação dos CSVs salvos pelo Excel em português.
+    """
+    for number, line in enumerate(file, start=1):
+        try:
+            text = line.decode('utf-8')
+        except UnicodeDecodeError:
+            text = line.decode('cp1252', errors='replace')
+        yield text.lstrip('\ufeff') if number == 1 else text
+
+
+class BaseCSVImporter(ABC):
+    """
+    Importa um CSV em lotes para um condomínio.
+
+    Cada lote é validado em memória (formato, duplicados no arquivo) e comparado com o banco
+    em uma única consulta; as linhas válidas são gravadas com bulk_create. O resultado é um
+    relatório com a quantidade criada e os erros por linha. As subclasses implementam clean_row,
+    row_key, existing_keys e build.
+    """
+    model = None
+    required_columns = ()
+
+    def __init__(self, condominium, user, batch_size=None):
+        self.condominium = condominium
+        self.user = user
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.seen_keys = {}
+
+    def run(self, file, delimiter=','):
+        reader = csv.DictReader(decode_lines(file), delimiter=delimiter)
+        try:
+            fieldnames = reader.fieldnames or []
+        except csv.Error as e:
+            raise serializers.ValidationError(f"Cabeçalho do arquivo malformado: {str(e)}.")
+        missing = [column for column in self.required_columns if column not in fieldnames]
+        if missing:
+            raise serializers.ValidationError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(missing)}.")
+
+        self.prepare()
+        report = {'total': 0, 'created': 0, 'errors': []}
+        batch, malformed, line = [], None, 1
+        try:
+            # A linha 1 é o cabeçalho, então os registros começam na linha 2
+            for line, row in enumerate(reader, start=2):
+                batch.append((line, {key: (value or '').strip() for key, value in row.items() if key}))
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch, report)
+                    batch = []
+        except csv.Error as e:
+            # O leitor não consegue seguir depois de uma linha malformada: grava o que veio antes e para ali
+            malformed = {
+                'line': line + 1,
+                'errors': [f"Linha malformada ({str(e)}); a importação parou nesta linha."],
+            }
+        if batch:
+            self.process_batch(batch, report)
+        if malformed:
+            report['errors'].append(malformed)
+
+        logger.info(
+            f"Importação de {self.model._meta.verbose_name_plural} no condomínio {self.condominium.id}: "
+            f"{report['created']} de {report['total']} registros criados."
+        )
+        return report
+
+    def process_batch(self, batch, report):
+        report['total'] += len(batch)
+        candidates = []
+
+        for line, row in batch:
+            errors, values = self.clean_row(row)
+            if not errors:
+                key = self.row_key(values)
+                if key in self.seen_keys:
+                    errors.append(f"Registro duplicado no arquivo (mesmo valor da linha {self.seen_keys[key]}).")
+                else:
+                    self.seen_keys[key] = line
+                    candidates.append((line, key, values))
+            if errors:
+                report['errors'].append({'line': line, 'errors': errors})
+
+        # Uma consulta por lote para encontrar registros que já existem no banco
+        existing = self.existing_keys([key for _, key, _ in candidates])
+        objects, lines = [], []
+        for line, key, values in candidates:
+            if key in existing:
+                report['errors'].append({'line': line, 'errors': [self.duplicate_message]})
+            else:
+                objects.append(self.build(values))
+                lines.append(line)
+
+        if not objects:
+            return
+
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objects)
+                record_changes(
+                    self.model, [(self.condominium.id, obj.pk) for obj in objects], ChangeLog.Action.CREATE
+                )
+                transaction.on_commit(self.batch_saved)
+        except IntegrityError as e:
+            logger.error(f"Erro ao gravar lote da importação: {str(e)}")
+            for line in lines:
+                report['errors'].append({'line': line, 'errors': ["Erro de integridade ao gravar o registro."]})
+            return
+
+        report['created'] += len(objects)
+
+    def prepare(self):
+        """Carrega dados auxiliares uma única vez antes dos lotes."""
+
+    def batch_saved(self):
+        """Chamado depois do commit de cada lote; bulk_create não dispara os sinais de post_save."""
+
+    @abstractmethod
+    def clean_row(self, row):
+        """Valida uma linha do CSV; retorna (lista de erros, valores limpos)."""
+
+    @abstractmethod
+    def row_key(self, values):
+        """Chave que identifica o registro, usada para achar duplicados no arquivo e no banco."""
+
+    @abstractmethod
+    def existing_keys(self, keys):
+        """Conjunto das chaves, entre as informadas, que já existem no condomínio."""
+
+    @abstractmethod
+    def build(self, values):
+        """Instância do modelo (ainda não gravada) a partir dos valores limpos."""
+
+
+class ApartmentLookupMixin:
+    """Resolve 'number_apartment' e 'block_apartment' com os apartamentos do condomínio já carregados."""
+
+    def prepare(self):
+        apartments = self.condominium.apartments.select_related('main_resident')
+        self.apartments = {(apartment.number, apartment.block.upper()): apartment for apartment in apartments}
+
+    def resolve_apartment(self, row, errors):
+        try:
+            number = int(row.get('number_apartment'))
+        except (TypeError, ValueError):
+            errors.append("Número do apartamento inválido.")
+            return None
+
+        apartment = self.apartments.get((number, row.get('block_apartment', '').upper()))
+        if not apartment:
+            errors.append("Apartamento não encontrado no condomínio especificado.")
+        return apartment
+
+
+class ApartmentCSVImporter(BaseCSVImporter):
+    model = Apartment
+    required_columns = ('number', 'block')
+    duplicate_message = 'Já existe um apartamento com este número e bloco.'
+
+    def clean_row(self, row):
+        errors, values = [], {}
+
+        try:
+            values['number'] = int(row.get('number'))
+        except (TypeError, ValueError):
+            errors.append("Número do apartamento inválido.")
+
+        block = row.get('block', '')
+        if not block or len(block) > 10:
+            errors.append("Bloco é obrigatório e deve ter até 10 caracteres.")
+        values['block'] = block
+
+        tread = row.get('tread')
+        values['tread'] = None
+        if tread:
+            try:
+                values['tread'] = int(tread)
+            except ValueError:
+                errors.append("Piso inválido.")
+
+        occupation = row.get('occupation') or Apartment.Occupation.UNOCCUPIED
+        if occupation not in Apartment.Occupation.values:
+            errors.append(f"Ocupação inválida. Use: {', '.join(Apartment.Occupation.values)}.")
+        values['occupation'] = occupation
+
+        return errors, values
+
+    def row_key(self, values):
+        return values['number'], values['block'].upper()
+
+    def existing_keys(self, keys):
+        rows = Apartment.objects.filter(
+            condominium=self.condominium,
+            number__in={number for number, _ in keys}
+        ).values_list('number', 'block')
+        return {(number, block.upper()) for number, block in rows}
+
+    def build(self, values):
+        return Apartment(condominium=self.condominium, **values)
+
+
+class ResidentCSVImporter(ApartmentLookupMixin, BaseCSVImporter):
+    model = Resident
+    required_columns = ('name', 'cpf', 'number_apartment', 'block_apartment')
+    duplicate_message = 'Já existe um dependente com este CPF.'
+
+    def clean_row(self, row):
+        errors, values = [], {}
+
+        if not row.get('name'):
+            errors.append("Nome é obrigatório.")
+        values['name'] = row.get('name', '').title()
+
+        for field, validator in (('cpf', validator_cpf), ('phone', validator_telephone), ('email', validator_email)):
+            value = row.get(field)
+            if not value and field != 'cpf':
+                values[field] = None
+                continue
+            try:
+                values[field] = validator(value or '')
+            except serializers.ValidationError as e:
+                errors.extend(validation_messages(e))
+
+        values['apartment'] = self.resolve_apartment(row, errors)
+        return errors, values
+
+    def row_key(self, values):
+        return values['cpf']
+
+    def existing_keys(self, keys):
+        # O CPF do dependente é único em todo o sistema, não apenas no condomínio
+        return set(Resident.objects.filter(cpf__in=keys).values_list('cpf', flat=True))
+
+    def build(self, values):
+        # bulk_create não chama save(), então a chave de busca do nome é preenchida aqui
+        return Resident(
+            condominium=self.condominium, registered_by=self.user, name_key=search_key(values['name']), **values
+        )
+
+
+class VehicleCSVImporter(ApartmentLookupMixin, BaseCSVImporter):
+    model = Vehicle
+    required_columns = ('plate', 'model', 'color', 'number_apartment', 'block_apartment')
+    duplicate_message = 'Já existe um veículo com esta placa no condomínio.'
+
+    def clean_row(self, row):
+        errors, values = [], {}
+
+        try:
+            values['plate'] = validator_plate(normalize_plate(row.get('plate')))
+        except serializers.ValidationError as e:
+            errors.extend(validation_messages(e))
+
+        for field, max_length in (('model', 50), ('color', 20)):
+            value = row.get(field, '')
+            if not value or len(value) > max_length:
+                errors.append(f"O campo '{field}' é obrigatório e deve ter até {max_length} caracteres.")
+            values[field] = value.title()
+
+        apartment = self.resolve_apartment(row, errors)
+        if apartment:
+            values['owner'] = getattr(apartment, 'main_resident', None)
+            if not values['owner']:
+                errors.append("O apartamento não possui morador principal para ser o proprietário.")
+
+        return errors, values
+
+    def row_key(self, values):
+        return plate_lookup_key(values['plate'])
+
+    def existing_keys(self, keys):
+        return set(
+            Vehicle.objects.filter(condominium=self.condominium, plate_key__in=keys).values_list('plate_key', flat=True)
+        )
+
+    def batch_saved(self):
+        # Os veículos novos entram na busca aproximada de placas (lookup) sem esperar o cache expirar
+        cache.delete(plate_index_cache_key(self.condominium.id))
+
+    def build(self, values):
+        # bulk_create não chama save(), então a chave de busca é preenchida aqui
+        return Vehicle(
+            condominium=self.condominium, registered_by=self.user, plate_key=plate_lookup_key(values['plate']), **values
+        )
+
+
+CSV_IMPORTERS = {
+    'apartments': ApartmentCSVImporter,
+    'residents': ResidentCSVImporter,
+    'vehicles': VehicleCSVImporter,
+}
@@ -0,0 +1,198 @@
+import contextvars
+import json
+import logging
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_DURATION, view_labels
+
+logger = logging.getLogger('core.metrics')
+
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+# Instruções SQL distintas acompanhadas por requisição; o restante só entra na contagem
+MAX_TRACKED_STATEMENTS = 200
+# Instruções mostradas no log de uma requisição lenta
+SLOW_LOG_STATEMENTS = 5
+
+
+class RequestMetrics:
+    """Medições de uma requisição: consultas ao banco, trechos cronometrados e tempo total."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.db_count = 0
+        self.db_time = 0.0
+        self.timings = {}
+        self.statements = {}
+
+    def record_query(self, sql, duration):
+        self.db_count += 1
+        self.db_time += duration
+        # O SQL vem com os parâmetros separados, então um N+1 aparece como a mesma instrução repetida
+        statement = self.statements.get(sql)
+        if statement is not None:
+            statement[0] += 1
+            statement[1] += duration
+        elif len(self.statements) < MAX_TRACKED_STATEMENTS:
+            self.statements[sql] = [1, duration]
+
+    def add_timing(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    def durations(self):
+        """Tempos em milissegundos: banco, trechos cronometrados, view e total."""
+        now = perf_counter()
+        data = {'db': self.db_time * 1000}
+        data.update({name: duration * 1000 for name, duration in self.timings.items()})
+        if self.view_started is not None:
+            data['view'] = ((self.view_finished or now) - self.view_started) * 1000
+        data['total'] = (now - self.started) * 1000
+        return data
+
+    def slowest_statements(self, limit=SLOW_LOG_STATEMENTS):
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql[:1000], 'count': count, 'ms': round(duration * 1000, 2)}
+            for sql, (count, duration) in ranked
+        ]
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+@contextmanager
+def measure(name):
+    """Cronometra um trecho da requisição atual; sem instrumentação ativa, não faz nada."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, perf_counter() - started)
+
+
+def measured(name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with measure(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+class QueryRecorder:
+    """execute_wrapper do Django: mede cada consulta sem o custo do CursorDebugWrapper do DEBUG."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics.record_query(sql, perf_counter() - started)
+
+
+def server_timing_header(metrics, durations):
+    parts = [f'db;dur={durations.pop("db"):.1f};desc="{metrics.db_count} queries"']
+    parts += [f'{name};dur={duration:.1f}' for name, duration in durations.items()]
+    return ', '.join(parts)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Mede cada requisição e publica o resultado no cabeçalho Server-Timing, no log 'core.metrics' e
+    nos histogramas do /metrics.
+
+    Registra a quantidade e o tempo das consultas ao banco, o tempo dos serializers, da view, da
+    renderização e o total. Requisições acima de REQUEST_SLOW_MS ou de REQUEST_SLOW_QUERIES consultas
+    saem no log como WARNING, com as instruções SQL que mais pesaram e quantas vezes cada uma rodou.
+
+    Deve ser o primeiro middleware, para que o total inclua os demais.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(QueryRecorder(metrics)))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+
+        if metrics.view_started is not None and metrics.view_finished is None:
+            metrics.view_finished = perf_counter()
+        self.report(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        # Respostas do DRF são renderizadas depois da view; o tempo da renderização é medido à parte
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_finished = perf_counter()
+            response.render = measured('render', response.render)
+        return response
+
+    def report(self, request, response, metrics):
+        durations = metrics.durations()
+        total = durations['total']
+        slow = total >= settings.REQUEST_SLOW_MS or metrics.db_count >= settings.REQUEST_SLOW_QUERIES
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': getattr(getattr(request, 'resolver_match', None), 'route', None),
+            'status': response.status_code,
+            'user': getattr(getattr(request, 'user', None), 'pk', None),
+            'db_queries': metrics.db_count,
+            **{f'{name}_ms': round(duration, 2) for name, duration in durations.items()},
+        }
+        if slow:
+            record['slow_queries'] = metrics.slowest_statements()
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+        # Séries do /metrics, por ViewSet e ação, para percentis de latência e consultas por requisição
+        labels = view_labels(request)
+        REQUEST_DURATION.observe(total / 1000, method=request.method, status=response.status_code, **labels)
+        REQUEST_DB_QUERIES.observe(metrics.db_count, **labels)
+        REQUEST_DB_DURATION.observe(metrics.db_time, **labels)
+
+        if settings.REQUEST_METRICS_HEADER:
+            response['Server-Timing'] = server_timing_header(metrics, durations)
+
+
+class SerializerTimingMixin:
+    """Cronometra a serialização das respostas do ViewSet no trecho 'serializer' do Server-Timing."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _current_metrics.get() is not None:
+            # Só a chamada de fora é medida; os serializers aninhados já estão dentro dela
+            serializer.to_representation = measured('serializer', serializer.to_representation)
+        return serializer
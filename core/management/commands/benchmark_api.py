@@ -0,0 +1,74 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import BenchmarkContext, build_scenarios, compare_reports, run_benchmark
+from core.models import Condominium
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95), consultas e memória das listagens, detalhes e criações da API e grava um '
+        'relatório JSON comparável entre execuções.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Execuções medidas por cenário.')
+        parser.add_argument('--warmup', type=int, default=2, help='Execuções descartadas antes das medidas.')
+        parser.add_argument('--condominium', type=int, help='Id do condomínio usado (padrão: o com mais visitas).')
+        parser.add_argument('--only', help='Mede apenas os cenários cujo nome contém este texto.')
+        parser.add_argument('--output', help='Arquivo onde gravar o relatório JSON.')
+        parser.add_argument('--baseline', help='Relatório anterior para comparar; regressões encerram com erro.')
+        parser.add_argument(
+            '--threshold', type=float, default=1.25, help='Aumento do p95 tolerado em relação à referência.'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations deve ser ao menos 1.')
+        condominium = None
+        if options['condominium']:
+            condominium = Condominium.objects.filter(pk=options['condominium']).first()
+            if condominium is None:
+                raise CommandError('Condomínio não encontrado.')
+        elif not Condominium.objects.exists():
+            raise CommandError('Nenhum condomínio cadastrado. Gere uma massa de dados com generate_dataset.')
+
+        context = BenchmarkContext(condominium)
+        scenarios = build_scenarios(context)
+        if options['only']:
+            scenarios = [scenario for scenario in scenarios if options['only'] in scenario.name]
+
+        # O log de cada requisição do 'core.metrics' esconderia a tabela de resultados
+        metrics_logger = logging.getLogger('core.metrics')
+        previous_level = metrics_logger.level
+        metrics_logger.setLevel(logging.ERROR)
+        try:
+            self.stdout.write(f"{'cenário':45} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'consultas':>9} {'memória KB':>11}")
+            report = run_benchmark(
+                context, scenarios, iterations=options['iterations'], warmup=options['warmup'], log=self.write_result
+            )
+        finally:
+            metrics_logger.setLevel(previous_level)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}."))
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = compare_reports(baseline, report, threshold=options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regressão(ões) em relação a {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação à referência.'))
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f"{name:45} {result['status']:>6} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+            f"{result['queries']:>9} {result['peak_memory_kb']:>11}"
+        )
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import BenchmarkContext, run_renderer_benchmark
+from core.models import Condominium
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão dos renderers da API (JSON do DRF, orjson e MessagePack) nas listagens com os '
+        'payloads mais aninhados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renderizações medidas por listagem.')
+        parser.add_argument('--pages', type=int, default=10, help='Páginas de cada listagem juntadas no payload.')
+        parser.add_argument('--condominium', type=int, help='Id do condomínio usado (padrão: o com mais visitas).')
+        parser.add_argument('--output', help='Arquivo onde gravar o relatório JSON.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['pages'] < 1:
+            raise CommandError('--iterations e --pages devem ser ao menos 1.')
+        condominium = None
+        if options['condominium']:
+            condominium = Condominium.objects.filter(pk=options['condominium']).first()
+            if condominium is None:
+                raise CommandError('Condomínio não encontrado.')
+        elif not Condominium.objects.exists():
+            raise CommandError('Nenhum condomínio cadastrado. Gere uma massa de dados com generate_dataset.')
+
+        self.stdout.write(
+            f"{'listagem':32} {'itens':>6} {'KB':>9} {'ms':>9} {'render/s':>10} {'MB/s':>8} {'ganho':>7}"
+        )
+        report = run_renderer_benchmark(
+            BenchmarkContext(condominium), iterations=options['iterations'], pages=options['pages'],
+            log=self.write_result
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}."))
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f"{name:32} {result['items']:>6} {result['bytes'] / 1024:>9.1f} {result['ms_per_render']:>9} "
+            f"{result['renders_per_second']:>10} {result['mb_per_second']:>8} {result['speedup']:>6}x"
+        )
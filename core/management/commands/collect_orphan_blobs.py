@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import collect_orphan_blobs
+
+
+class Command(BaseCommand):
+    help = 'Apaga os documentos armazenados que não são mais referenciados por nenhum aviso ou finança.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds',
+            type=int,
+            default=None,
+            help='Tempo mínimo sem referências antes de apagar (padrão: BLOB_GC_GRACE_SECONDS).'
+        )
+
+    def handle(self, *args, **options):
+        deleted = collect_orphan_blobs(options['grace_seconds'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} arquivo(s) órfão(s) apagado(s).'))
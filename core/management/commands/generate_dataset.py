@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dataset import SCALES, DatasetGenerator
+from core.models import Condominium
+
+
+class Command(BaseCommand):
+    help = 'Gera uma massa de dados sintética e reproduzível (bulk_create) para testes de carga e benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=SCALES,
+            default='small',
+            help='Tamanho pré-definido: small (5/500/5 mil), medium (50/10 mil/500 mil) ou large (500/100 mil/10 milhões).'
+        )
+        parser.add_argument('--condominiums', type=int, help='Quantidade de condomínios (substitui a escala).')
+        parser.add_argument('--persons', type=int, help='Quantidade de pessoas (substitui a escala).')
+        parser.add_argument('--visits', type=int, help='Quantidade de visitas (substitui a escala).')
+        parser.add_argument('--seed', type=int, default=0, help='Semente: a mesma semente gera os mesmos dados.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Registros por bulk_create.')
+        parser.add_argument('--days', type=int, default=365, help='Período, em dias, das datas geradas.')
+        parser.add_argument('--password', default='benchmark', help='Senha de todos os usuários gerados.')
+        parser.add_argument(
+            '--allow-existing',
+            action='store_true',
+            help='Gera mesmo com condomínios já cadastrados (CPFs e CNPJs gerados podem colidir).'
+        )
+
+    def handle(self, *args, **options):
+        if Condominium.objects.exists() and not options['allow_existing']:
+            raise CommandError(
+                'O banco já tem condomínios. Gere a massa de dados em um banco vazio ou use --allow-existing.'
+            )
+
+        condominiums, persons, visits = SCALES[options['scale']]
+        generator = DatasetGenerator(
+            condominiums=options['condominiums'] or condominiums,
+            persons=options['persons'] or persons,
+            visits=options['visits'] if options['visits'] is not None else visits,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            password=options['password'],
+            log=self.stdout.write,
+        )
+        counts = generator.generate()
+        for label, total in counts.items():
+            self.stdout.write(f'  {label}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} registro(s) gerado(s).'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'Apaga o histórico de alterações da sincronização incremental mais antigo que SYNC_RETENTION_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Dias de histórico mantidos (padrão: SYNC_RETENTION_DAYS).'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} alteração(ões) apagada(s).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o índice de busca textual de avisos, ocorrências e comunicações, inclusive o texto dos anexos.'
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('A busca textual exige PostgreSQL.')
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'{total} registro(s) reindexado(s).'))
@@ -0,0 +1,338 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+from time import monotonic, time
+
+from django.conf import settings
+
+# Limites (segundos) dos histogramas de duração
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """
+    Registro de métricas do processo, no formato de exposição do Prometheus.
+
+    Cada worker do gunicorn mantém os valores em memória e, no máximo a cada METRICS_FLUSH_INTERVAL
+    segundos, grava uma cópia em METRICS_DIR/<pid>-<início>.json (escrita atômica com os.replace); o
+    início evita que um pid reaproveitado sobrescreva o arquivo de um worker anterior. O endpoint
+    /metrics soma os arquivos de todos os workers, então qualquer worker responde pelo conjunto, e
+    passa os de workers encerrados para DEAD_WORKERS_FILE, para que o diretório não cresça a cada
+    reinício sem que os contadores voltem atrás. Sem METRICS_DIR, apenas o processo atual é exposto.
+    """
+
+    # Soma dos workers encerrados
+    DEAD_WORKERS_FILE = 'dead.json'
+
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.started = int(time() * 1000)
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = monotonic()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def check_fork(self):
+        # Depois de um fork (gunicorn --preload), o worker começa do zero e grava no próprio arquivo
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def inc(self, name, labels, amount):
+        with self.lock:
+            self.check_fork()
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            self.check_fork()
+            key = (name, labels)
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            self.check_fork()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, list(labels), list(buckets), total, count]
+                    for (name, labels), (buckets, total, count) in self.histograms.items()
+                ],
+            }
+
+    def file_path(self, directory):
+        return os.path.join(directory, f'{self.pid}-{self.started}.json')
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        self.last_flush = monotonic()
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+        write_snapshot(directory, self.file_path(directory), snapshot)
+
+    def collect(self):
+        """Soma os valores de todos os workers; o processo atual entra com os valores em memória."""
+        snapshots = [self.snapshot()]
+        directory = settings.METRICS_DIR
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            own_file = self.file_path(directory)
+            with open(os.path.join(directory, '.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self.merge_dead_workers(directory)
+                # A leitura fica sob a trava para não somar um worker junto com a soma em que ele acabou de entrar
+                for path in [os.path.join(directory, self.DEAD_WORKERS_FILE), *worker_files(directory)]:
+                    if path != own_file:
+                        snapshot = read_snapshot(path)
+                        if snapshot is not None:
+                            snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def merge_dead_workers(self, directory):
+        """Soma os arquivos de workers encerrados em DEAD_WORKERS_FILE e os apaga (chamado sob a trava)."""
+        dead = [path for path in worker_files(directory) if not process_alive(worker_pid(path))]
+        if not dead:
+            return
+        dead_path = os.path.join(directory, self.DEAD_WORKERS_FILE)
+        snapshots = [read_snapshot(path) for path in [dead_path, *dead]]
+        counters, histograms = merge_snapshots([snapshot for snapshot in snapshots if snapshot is not None])
+        write_snapshot(directory, dead_path, {
+            'counters': [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+            'histograms': [
+                [name, [list(pair) for pair in labels], buckets, total, count]
+                for (name, labels), (buckets, total, count) in histograms.items()
+            ],
+        })
+        for path in dead:
+            os.remove(path)
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            family = f'{name}_total' if metric.kind == 'counter' else name
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.kind}')
+            if metric.kind == 'counter':
+                for (metric_name, labels), value in sorted(counters.items()):
+                    if metric_name == name:
+                        lines.append(f'{family}{format_labels(labels)} {value:g}')
+            else:
+                for (metric_name, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets, buckets):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{format_labels(labels, le=f"{bound:g}")} {cumulative}')
+                    lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {total:g}')
+                    lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def worker_files(directory):
+    return glob.glob(os.path.join(directory, '*-*.json'))
+
+
+def worker_pid(path):
+    return int(os.path.basename(path).split('-', 1)[0])
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, mas é de outro usuário
+        return True
+    return True
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        # Arquivo ausente, sendo substituído ou corrompido: fica para a próxima coleta
+        return None
+
+
+def write_snapshot(directory, path, snapshot):
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temp_path, path)
+
+
+def merge_snapshots(snapshots):
+    """Soma cópias de registros (Registry.snapshot) em dicionários de contadores e histogramas."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            state = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            state[0] = [current + added for current, added in zip(state[0], buckets)]
+            state[1] += total
+            state[2] += count
+    return counters, histograms
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def label_values(self, labels):
+        return tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """Contador crescente; exposto com o sufixo _total."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        registry.inc(self.name, self.label_values(labels), amount)
+
+
+class Histogram(Metric):
+    """Distribuição de valores em faixas, para percentis (histogram_quantile) no Prometheus."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        registry.observe(self.name, self.label_values(labels), value, self.buckets)
+
+
+REQUEST_DURATION = Histogram(
+    'condomineo_http_request_duration_seconds',
+    'Duração das requisições por ViewSet e ação.',
+    ('view', 'action', 'method', 'status'),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'condomineo_http_request_db_queries',
+    'Consultas ao banco por requisição.',
+    ('view', 'action'),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_DB_DURATION = Histogram(
+    'condomineo_http_request_db_duration_seconds',
+    'Tempo gasto no banco por requisição.',
+    ('view', 'action'),
+)
+RESPONSE_CACHE = Counter(
+    'condomineo_response_cache_lookups',
+    'Consultas ao cache de respostas dos ViewSets, por resultado (hit, miss).',
+    ('view', 'action', 'result'),
+)
+DB_CONNECTIONS = Counter(
+    'condomineo_db_connections_opened',
+    'Conexões abertas com o banco de dados (com o pool, cada conexão retirada dele).',
+    ('alias',),
+)
+DB_CONNECTION_WAIT = Histogram(
+    'condomineo_db_connection_wait_seconds',
+    'Espera por uma conexão com o banco: retirada do pool ou abertura de uma nova, por resultado (ok, timeout, error).',
+    ('alias', 'pooled', 'result'),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+EMAILS = Counter(
+    'condomineo_emails',
+    'E-mails enviados por send_custom_email, por template e resultado.',
+    ('template', 'status'),
+)
+EMAIL_DURATION = Histogram(
+    'condomineo_email_duration_seconds',
+    'Duração do envio de e-mails.',
+    ('status',),
+)
+SUMMARIZATION_DURATION = Histogram(
+    'condomineo_summarization_duration_seconds',
+    'Duração das chamadas de sumarização (summarize_text), por resultado.',
+    ('status',),
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+RECAPTCHA = Counter(
+    'condomineo_recaptcha_verifications',
+    'Verificações do reCAPTCHA, por resultado (success, failure, error, missing).',
+    ('result',),
+)
+RECAPTCHA_DURATION = Histogram(
+    'condomineo_recaptcha_duration_seconds',
+    'Duração da verificação do reCAPTCHA no Google.',
+    ('result',),
+)
+
+
+def view_labels(request):
+    """
+    Identifica a ação do ViewSet atendida pela requisição (ex.: OrderViewSet/deliver).
+
+    Usa a classe e o mapa de ações que o router do DRF guarda na view, e não o caminho, para que
+    ids na URL não multipliquem as séries.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return {'view': 'unmatched', 'action': ''}
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None)
+    if view_class is not None:
+        action = actions.get(request.method.lower(), '') if actions else ''
+        return {'view': view_class.__name__, 'action': action}
+    return {'view': match.url_name or match.func.__name__, 'action': ''}
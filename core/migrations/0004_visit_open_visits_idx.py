@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_communication_all_residents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(condition=models.Q(('exit_date__isnull', True)), fields=['condominium', 'entry_date'], name='open_visits_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.validators import plate_lookup_key
+
+
+def fill_plate_key(apps, schema_editor):
+    Vehicle = apps.get_model('core', 'Vehicle')
+    vehicles = list(Vehicle.objects.only('id', 'plate'))
+    for vehicle in vehicles:
+        vehicle.plate_key = plate_lookup_key(vehicle.plate)
+    Vehicle.objects.bulk_update(vehicles, ['plate_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_visit_open_visits_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='plate_key',
+            field=models.CharField(blank=True, editable=False, help_text='Placa normalizada (padrão antigo, sem hífen) usada nas buscas da portaria.', max_length=10, verbose_name='Chave de Busca da Placa'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['condominium', 'plate_key'], name='vehicle_plate_key_idx'),
+        ),
+        migrations.RunPython(fill_plate_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Trim, Upper
+
+
+def normalize_order_code(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    Order.objects.update(order_code=Upper(Trim('order_code')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_vehicle_plate_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['condominium', 'order_code'], name='order_code_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.RunPython(normalize_order_code, migrations.RunPython.noop),
+    ]
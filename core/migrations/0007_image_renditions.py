@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_order_code_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finance',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.', verbose_name='Versões Reduzidas'),
+        ),
+        migrations.AddField(
+            model_name='notice',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.', verbose_name='Versões Reduzidas'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.', verbose_name='Versões Reduzidas'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:45
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Arquivo')),
+                ('digest', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Referências')),
+                ('extracted_text', models.TextField(blank=True, help_text='Texto do PDF/DOCX, reaproveitado por todos os avisos com o mesmo arquivo.', null=True, verbose_name='Texto Extraído')),
+                ('summary', models.TextField(blank=True, null=True, verbose_name='Resumo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Arquivo Armazenado',
+                'verbose_name_plural': 'Arquivos Armazenados',
+            },
+        ),
+        migrations.AlterField(
+            model_name='finance',
+            name='document',
+            field=models.FileField(blank=True, help_text='Envie o comprovante de pagamento ou recibo.', null=True, storage=core.storage.get_document_storage, upload_to='financeiro_doc/', verbose_name='Comprovante'),
+        ),
+        migrations.AlterField(
+            model_name='notice',
+            name='file_complement',
+            field=models.FileField(blank=True, help_text='Anexe um arquivo relacionado ao aviso, se necessário.', null=True, storage=core.storage.get_document_storage, upload_to='notice_files/', verbose_name='Arquivo Complementar'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_stored_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('condominium_id', models.PositiveBigIntegerField(verbose_name='Condomínio')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Dados',
+                'verbose_name_plural': 'Versões de Dados',
+                'constraints': [models.UniqueConstraint(fields=('model', 'condominium_id'), name='unique_tenant_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tenant_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Registro')),
+                ('condominium_id', models.PositiveBigIntegerField(verbose_name='Condomínio')),
+                ('action', models.CharField(choices=[('upsert', 'Criado/Alterado'), ('delete', 'Excluído')], max_length=10, verbose_name='Ação')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Alteração',
+                'verbose_name_plural': 'Alterações',
+                'indexes': [models.Index(fields=['condominium_id', 'id'], name='change_log_cursor_idx'), models.Index(fields=['created_at'], name='change_log_created_idx')],
+            },
+        ),
+    ]
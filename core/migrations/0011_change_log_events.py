@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelog',
+            name='action',
+            field=models.CharField(choices=[('create', 'Criado'), ('upsert', 'Criado/Alterado'), ('delete', 'Excluído')], max_length=10, verbose_name='Ação'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model', 'action', 'id'], name='change_log_event_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Configuração de busca em português que também remove acentos ('reunião' encontra 'reuniao' e vice-versa)
+CREATE_SEARCH_CONFIG = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+"""
+
+SEARCH_FIELDS = {
+    'Notice': (('title', 'A'), ('content', 'B')),
+    'Occurrence': (('title', 'A'), ('description', 'B')),
+    'Communication': (('title', 'A'), ('message', 'B')),
+}
+
+
+def create_search_config(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_CONFIG)
+
+
+def drop_search_config(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent')
+
+
+def populate_search_vectors(apps, schema_editor):
+    """Indexa os registros existentes; o texto dos anexos entra com o comando rebuild_search_index."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, fields in SEARCH_FIELDS.items():
+        vector = None
+        for field, weight in fields:
+            part = SearchVector(field, weight=weight, config='portuguese_unaccent')
+            vector = part if vector is None else vector + part
+        apps.get_model('core', model_name).objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_change_log_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunPython(create_search_config, drop_search_config),
+        migrations.AddField(
+            model_name='communication',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Título e mensagem em tsvector (português, sem acentos), mantido pelo core.search.', null=True, verbose_name='Índice de Busca'),
+        ),
+        migrations.AddField(
+            model_name='notice',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Título, conteúdo e texto do arquivo complementar em tsvector, mantido pelo core.search.', null=True, verbose_name='Índice de Busca'),
+        ),
+        migrations.AddField(
+            model_name='occurrence',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Título e descrição em tsvector (português, sem acentos), mantido pelo core.search.', null=True, verbose_name='Índice de Busca'),
+        ),
+        migrations.AddIndex(
+            model_name='communication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='communication_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='notice_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='occurrence_search_idx'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:10
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from utils.utils import search_key
+
+
+def fill_name_key(apps, schema_editor):
+    for model_name in ('Resident', 'Visitor'):
+        model = apps.get_model('core', model_name)
+        records = list(model.objects.only('id', 'name'))
+        for record in records:
+            record.name_key = search_key(record.name)
+        model.objects.bulk_update(records, ['name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_full_text_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='resident',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.', max_length=255, verbose_name='Chave de Busca do Nome'),
+        ),
+        migrations.AddField(
+            model_name='visitor',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.', max_length=255, verbose_name='Chave de Busca do Nome'),
+        ),
+        migrations.AddIndex(
+            model_name='resident',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_key'], name='resident_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_key'], name='visitor_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='audience',
+            field=models.JSONField(blank=True, null=True, verbose_name='Público'),
+        ),
+    ]
@@ -2,8 +2,13 @@ import uuid
 
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from users.models import Person
+from utils.utils import search_key
+from utils.validators import plate_lookup_key
+from core.storage import get_document_storage
 
 class Condominium(models.Model):
     name = models.CharField(max_length=255, verbose_name='Nome do Condomínio')
@@ -63,6 +68,13 @@ class Visitor(models.Model):
         verbose_name='Condomínio'
     )
     name = models.CharField(max_length=255, verbose_name='Nome do Visitante')
+    name_key = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Chave de Busca do Nome',
+        help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.'
+    )
     cpf = models.CharField(
         max_length=11,
         verbose_name='Cadastro de Pessoa Física (CPF)',
@@ -84,10 +96,18 @@ class Visitor(models.Model):
         verbose_name_plural = 'Visitantes'
         unique_together = ('cpf', 'condominium')
         ordering = ['name', 'cpf']
+        indexes = [
+            GinIndex(fields=['name_key'], opclasses=['gin_trgm_ops'], name='visitor_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return f'Visitante {self.name}'
 
+    def save(self, *args, **kwargs):
+        # Mantém a chave de busca sempre coerente com o nome
+        self.name_key = search_key(self.name)
+        super().save(*args, **kwargs)
+
 
 # Definindo o modelo de Apartamento
 class Apartment(models.Model):
@@ -183,6 +203,14 @@ class Visit(models.Model):
         verbose_name = 'Visita'
         verbose_name_plural = 'Visitas'
         ordering = ['entry_date']
+        indexes = [
+            # Índice parcial com apenas as visitas em aberto (quem está dentro do condomínio agora)
+            models.Index(
+                fields=['condominium', 'entry_date'],
+                condition=models.Q(exit_date__isnull=True),
+                name='open_visits_idx'
+            ),
+        ]
 
     def __str__(self):
         return (f'Visita de {self.visitor.name} ao Apartamento {self.apartment.number} '
@@ -224,11 +252,20 @@ class Occurrence(models.Model):
         related_name='reported_ocurrences',
         verbose_name='Reportado por',
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Índice de Busca',
+        help_text='Título e descrição em tsvector (português, sem acentos), mantido pelo core.search.'
+    )
 
     class Meta:
         verbose_name = 'Ocorrência'
         verbose_name_plural = 'Ocorrências'
         ordering = ['-date_reported']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='occurrence_search_idx'),
+        ]
 
     def __str__(self):
         return f'Ocorrência: {self.title} - Reportado por: {self.reported_by.name}'
@@ -337,10 +374,18 @@ class Finance(models.Model):
     description = models.TextField(verbose_name='Descrição')
     document = models.FileField(
         upload_to='financeiro_doc/',
+        storage=get_document_storage,
         blank=True, null=True,
         verbose_name='Comprovante',
         help_text='Envie o comprovante de pagamento ou recibo.'
     )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Versões Reduzidas',
+        help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.'
+    )
 
     class Meta:
         verbose_name = 'Finança'
@@ -373,6 +418,13 @@ class Vehicle(models.Model):
         verbose_name='Cadastrado por'
     )
     plate = models.CharField(max_length=10, verbose_name='Placa do Veículo')
+    plate_key = models.CharField(
+        max_length=10,
+        blank=True,
+        editable=False,
+        verbose_name='Chave de Busca da Placa',
+        help_text='Placa normalizada (padrão antigo, sem hífen) usada nas buscas da portaria.'
+    )
     model = models.CharField(max_length=50, verbose_name='Modelo do Veículo')
     color = models.CharField(max_length=20, verbose_name='Cor do Veículo')
     owner = models.ForeignKey(
@@ -388,10 +440,18 @@ class Vehicle(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['plate', 'condominium'], name='unique_plate_per_condo')
         ]
+        indexes = [
+            models.Index(fields=['condominium', 'plate_key'], name='vehicle_plate_key_idx'),
+        ]
 
     def __str__(self):
         return f'Veículo {self.model} - {self.plate} - Proprietário: {self.owner.name}'
 
+    def save(self, *args, **kwargs):
+        # Mantém a chave de busca sempre coerente com a placa
+        self.plate_key = plate_lookup_key(self.plate)
+        super().save(*args, **kwargs)
+
 
 class Order(models.Model):
     # Definindo os tipos de 'status' disponíveis para o pedido
@@ -420,6 +480,13 @@ class Order(models.Model):
         verbose_name='Comprovante',
         help_text='Anexe uma foto da assinatura.'
     )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Versões Reduzidas',
+        help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.'
+    )
     order_code = models.CharField(max_length=20, verbose_name='Número do Pedido')
     order_date = models.DateTimeField(auto_now_add=True, verbose_name='Data do Recebimento')
     status = models.CharField(
@@ -440,6 +507,14 @@ class Order(models.Model):
         verbose_name = 'Encomenda'
         verbose_name_plural = 'Encomendas'
         ordering = ['-order_date', 'status', 'order_code']
+        indexes = [
+            # varchar_pattern_ops permite que o PostgreSQL use o índice também na busca por prefixo (LIKE 'ABC%')
+            models.Index(
+                fields=['condominium', 'order_code'],
+                name='order_code_idx',
+                opclasses=['int8_ops', 'varchar_pattern_ops']
+            ),
+        ]
 
     def __str__(self):
         return f'Encomenda {self.order_code} - {self.status} - {self.owner}'
@@ -448,6 +523,12 @@ class Order(models.Model):
         if not self.order_code:
             raise ValidationError('O código do pedido é obrigatório.')
 
+    def save(self, *args, **kwargs):
+        # O código é salvo sempre em maiúsculas para que a busca exata e por prefixo usem o índice
+        if self.order_code:
+            self.order_code = self.order_code.strip().upper()
+        super().save(*args, **kwargs)
+
 
 class Notice(models.Model):
     # Definindo os campos do modelo
@@ -463,21 +544,38 @@ class Notice(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
     file_complement = models.FileField(
         upload_to='notice_files/',
+        storage=get_document_storage,
         blank=True,
         null=True,
         verbose_name='Arquivo Complementar',
         help_text='Anexe um arquivo relacionado ao aviso, se necessário.'
     )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Versões Reduzidas',
+        help_text='Miniatura e versão de exibição geradas a partir do arquivo enviado, com dimensões e tamanho.'
+    )
     author = models.ForeignKey(
         'users.Person',
         on_delete=models.CASCADE,
         related_name='notices',
         verbose_name='Autor'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Índice de Busca',
+        help_text='Título, conteúdo e texto do arquivo complementar em tsvector, mantido pelo core.search.'
+    )
 
     class Meta:
         verbose_name = 'Aviso'
         verbose_name_plural = 'Avisos'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='notice_search_idx'),
+        ]
 
     def __str__(self):
         return f'Aviso: {self.title} - Autor: {self.author.name}'
@@ -521,11 +619,20 @@ class Communication(models.Model):
         related_name='received_communications',
         verbose_name='Destinatários'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Índice de Busca',
+        help_text='Título e mensagem em tsvector (português, sem acentos), mantido pelo core.search.'
+    )
 
     class Meta:
         verbose_name = 'Comunicação'
         verbose_name_plural = 'Comunicações'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='communication_search_idx'),
+        ]
 
     def __str__(self):
         return f'Comunicação: {self.title} - Remetente: {self.sender.name}'
@@ -540,6 +647,13 @@ class Resident(models.Model):
         verbose_name='Condomínio'
     )
     name = models.CharField(max_length=255, verbose_name='Nome do Morador')
+    name_key = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Chave de Busca do Nome',
+        help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.'
+    )
     cpf = models.CharField(
         max_length=11,
         unique=True,
@@ -578,4 +692,93 @@ class Resident(models.Model):
     class Meta:
         verbose_name = 'Dependente'
         verbose_name_plural = 'Dependentes'
-        ordering = ['name', 'cpf']
\ No newline at end of file
+        ordering = ['name', 'cpf']
+        indexes = [
+            GinIndex(fields=['name_key'], opclasses=['gin_trgm_ops'], name='resident_name_trgm_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Mantém a chave de busca sempre coerente com o nome
+        self.name_key = search_key(self.name)
+        super().save(*args, **kwargs)
+
+
+class StoredBlob(models.Model):
+    """Conteúdo único gravado pelo ContentAddressedStorage e quantos registros apontam para ele."""
+    name = models.CharField(max_length=255, unique=True, verbose_name='Arquivo')
+    digest = models.CharField(max_length=64, db_index=True, verbose_name='SHA-256')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='Referências')
+    extracted_text = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name='Texto Extraído',
+        help_text='Texto do PDF/DOCX, reaproveitado por todos os avisos com o mesmo arquivo.'
+    )
+    summary = models.TextField(blank=True, null=True, verbose_name='Resumo')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Arquivo Armazenado'
+        verbose_name_plural = 'Arquivos Armazenados'
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count} referências)'
+
+
+class TenantVersion(models.Model):
+    """
+    Contador de alterações por modelo e condomínio.
+
+    É incrementado a cada gravação ou exclusão e usado para gerar os ETags das listagens: se nenhum
+    contador do escopo do usuário mudou, a resposta anterior continua válida.
+    """
+    model = models.CharField(max_length=100, verbose_name='Modelo')
+    # Sem chave estrangeira: 0 representa registros sem condomínio (ex.: administradores)
+    condominium_id = models.PositiveBigIntegerField(verbose_name='Condomínio')
+    version = models.PositiveBigIntegerField(default=1, verbose_name='Versão')
+
+    class Meta:
+        verbose_name = 'Versão de Dados'
+        verbose_name_plural = 'Versões de Dados'
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'condominium_id'], name='unique_tenant_version'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} - {self.condominium_id} - v{self.version}'
+
+
+class ChangeLog(models.Model):
+    """
+    Registro de cada alteração (inclusive exclusões) usado na sincronização incremental dos apps.
+
+    O id é o cursor: cresce a cada alteração, então o cliente pede apenas o que veio depois do
+    último id que recebeu.
+    """
+    class Action(models.TextChoices):
+        CREATE = 'create', 'Criado'
+        UPSERT = 'upsert', 'Criado/Alterado'
+        DELETE = 'delete', 'Excluído'
+
+    model = models.CharField(max_length=100, verbose_name='Modelo')
+    object_id = models.PositiveBigIntegerField(verbose_name='Registro')
+    # Sem chave estrangeira para que o histórico sobreviva à exclusão do condomínio
+    condominium_id = models.PositiveBigIntegerField(verbose_name='Condomínio')
+    action = models.CharField(max_length=10, choices=Action.choices, verbose_name='Ação')
+    # Nas exclusões, quem enxergava o registro (core.filters.record_audiences); vazio é todo o condomínio
+    audience = models.JSONField(null=True, blank=True, verbose_name='Público')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Data')
+
+    class Meta:
+        verbose_name = 'Alteração'
+        verbose_name_plural = 'Alterações'
+        indexes = [
+            models.Index(fields=['condominium_id', 'id'], name='change_log_cursor_idx'),
+            models.Index(fields=['model', 'action', 'id'], name='change_log_event_idx'),
+            models.Index(fields=['created_at'], name='change_log_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id} - {self.action}'
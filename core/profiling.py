@@ -0,0 +1,239 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+# Modos aceitos no cabeçalho X-Profile ou no parâmetro ?_profile=
+PROFILE_MODES = {'1': 'sample', 'sample': 'sample', 'cprofile': 'cprofile'}
+# Extensões dos arquivos gravados por perfil
+PROFILE_FILES = {
+    'folded': 'text/plain; charset=utf-8',
+    'prof': 'application/octet-stream',
+    'json': 'application/json',
+}
+# Profundidade máxima das pilhas amostradas
+MAX_STACK_DEPTH = 128
+
+
+def requested_mode(request):
+    value = request.headers.get('X-Profile') or request.GET.get('_profile')
+    return PROFILE_MODES.get((value or '').lower())
+
+
+def profiling_user(request):
+    """Superusuário da requisição, pela sessão ou pelo JWT; o perfil nunca é feito para outros usuários."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = authenticated[0] if authenticated else None
+    if user is not None and user.is_authenticated and user.is_superuser:
+        return user
+    return None
+
+
+def project_frame(filename):
+    """Arquivo do próprio projeto (fora do virtualenv e da biblioteca padrão)."""
+    return filename.startswith(str(settings.BASE_DIR)) and 'site-packages' not in filename
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.relpath(code.co_filename, settings.BASE_DIR)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Profiler por amostragem: uma thread lê a pilha da thread da requisição a cada intervalo.
+
+    O resultado sai no formato de pilhas dobradas ('a;b;c 12'), aceito pelo flamegraph.pl e pelo
+    speedscope. O custo na requisição é baixo e não depende de quantas funções ela chama.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def redact_param(param):
+    """Apenas o tipo do parâmetro: os valores são dados pessoais e ficariam gravados em PROFILING_DIR."""
+    return None if param is None else f'<{type(param).__name__}>'
+
+
+class SQLTrace:
+    """
+    execute_wrapper que guarda cada consulta, com parâmetros, duração e a linha do projeto que a disparou.
+
+    Sem PROFILING_SQL_PARAMS, os parâmetros saem apenas com o tipo (ex.: '<str>').
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.format_param = str if settings.PROFILING_SQL_PARAMS else redact_param
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            origin = [
+                f'{os.path.relpath(entry.filename, settings.BASE_DIR)}:{entry.lineno} in {entry.name}'
+                for entry in traceback.extract_stack()[:-1]
+                if project_frame(entry.filename)
+            ]
+            self.queries.append({
+                'sql': sql,
+                'params': None if many else [self.format_param(param) for param in params or ()],
+                'ms': round(duration * 1000, 3),
+                'origin': origin[-3:],
+            })
+
+
+def prune_profiles(directory):
+    """Mantém apenas os PROFILING_KEEP perfis mais recentes."""
+    reports = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in reports[settings.PROFILING_KEEP:]:
+        profile_id = entry.name[:-len('.json')]
+        for extension in PROFILE_FILES:
+            try:
+                os.remove(os.path.join(directory, f'{profile_id}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(profile_id, extension):
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}.{extension}')
+
+
+class RequestProfilingMiddleware:
+    """
+    Perfil de uma requisição sob demanda, para superusuários.
+
+    Com o cabeçalho 'X-Profile: sample' (ou '?_profile=sample'), a requisição roda sob o profiler por
+    amostragem; com 'cprofile', sob o cProfile (determinístico, mais lento, mas com a contagem exata
+    de chamadas). Os resultados ficam em PROFILING_DIR e são baixados em /profiles/<id>.<formato>:
+
+    - folded: pilhas dobradas para flamegraph (apenas no modo 'sample');
+    - prof: estatísticas do cProfile, para o snakeviz ou o pstats (apenas no modo 'cprofile');
+    - json: dados da requisição e o trace das consultas SQL, com a linha do projeto que disparou cada uma.
+
+    A resposta traz o id do perfil no cabeçalho 'X-Profile-Id'. Para outros usuários, o pedido é ignorado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request) if settings.PROFILING_ENABLED else None
+        if mode is None:
+            return self.get_response(request)
+        user = profiling_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        trace = SQLTrace()
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        sampler = None if profiler else StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(trace))
+            if profiler:
+                profiler.enable()
+            else:
+                sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+                else:
+                    sampler.stop()
+        duration = perf_counter() - started
+
+        try:
+            profile_id = self.save(request, response, user, mode, duration, trace, profiler, sampler)
+        except OSError as e:
+            logger.error(f"Erro ao gravar o perfil de {request.path}: {str(e)}")
+            return response
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def save(self, request, response, user, mode, duration, trace, profiler, sampler):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        profile_id = f"{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+        if profiler:
+            profiler.dump_stats(profile_path(profile_id, 'prof'))
+        else:
+            with open(profile_path(profile_id, 'folded'), 'w') as file:
+                file.write(sampler.folded())
+
+        report = {
+            'id': profile_id,
+            'mode': mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user': user.pk,
+            'duration_ms': round(duration * 1000, 2),
+            'samples': sampler.samples if sampler else None,
+            'db_queries': len(trace.queries),
+            'db_ms': round(sum(query['ms'] for query in trace.queries), 2),
+            'queries': trace.queries,
+        }
+        with open(profile_path(profile_id, 'json'), 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        prune_profiles(directory)
+        return profile_id
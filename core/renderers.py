@@ -0,0 +1,78 @@
+import orjson
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    # Opcional: sem o pacote, o formato application/msgpack não entra nos renderers (ver settings)
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def encode_default(obj):
+    """
+    Converte o que o orjson e o msgpack não serializam sozinhos (Decimal, timedelta, textos traduzíveis,
+    querysets...) com as mesmas regras do JSONEncoder do DRF, para a resposta sair igual em qualquer formato.
+    """
+    return JSONEncoder().default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer do DRF com o orjson, bem mais rápido nos payloads aninhados das listagens.
+
+    Datas saem em ISO 8601 com 'Z' em UTC, UUIDs como texto e Decimal como número, como no renderer
+    padrão.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # O orjson só indenta com 2 espaços; serve para a API navegável e para '?indent='
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=option)
+
+
+class ORJSONParser(parsers.JSONParser):
+    """JSONParser do DRF com o orjson."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f'JSON inválido: {str(e)}')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Respostas em MessagePack (Accept: application/msgpack ou '?format=msgpack'), um binário mais compacto
+    que o JSON para clientes que o suportam. Os valores seguem as mesmas conversões do JSON.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(parsers.BaseParser):
+    """Corpo de requisição em MessagePack (Content-Type: application/msgpack)."""
+    media_type = MSGPACK_MEDIA_TYPE
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except ValueError as e:
+            raise ParseError(f'MessagePack inválido: {str(e)}')
@@ -0,0 +1,72 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.conditional import DEFAULT_DEPENDENT_MODELS, request_tenant_ids
+from core.db_routers import use_primary
+from core.metrics import RESPONSE_CACHE
+from core.utils import get_response_generations
+from users.models import Person
+
+
+class CachedResponseMixin:
+    """
+    Cache de leitura (read-through) das respostas de listagem e detalhe do ViewSet.
+
+    Guarda os dados já serializados no cache padrão, sob uma chave com o escopo do usuário (perfil,
+    condomínios que enxerga e, para moradores, o apartamento), a URL com os parâmetros e a geração de
+    cada modelo envolvido em cada condomínio. Os sinais de gravação e exclusão trocam a geração
+    (bump_tenant_versions), então uma alteração invalida as respostas do condomínio sem varrer o cache.
+
+    Serve para ViewSets cujo queryset depende só desse escopo; os que filtram pelo próprio usuário
+    (remetente, proprietário) precisam acrescentar o id dele em response_cache_scope.
+    As consultas aparecem no /metrics como condomineo_response_cache_lookups_total e na resposta,
+    no cabeçalho X-Cache (HIT ou MISS). As gerações só valem entre workers com um cache compartilhado,
+    então RESPONSE_CACHE_ENABLED vem desligado com o LocMemCache.
+    """
+    cache_dependent_models = DEFAULT_DEPENDENT_MODELS
+
+    def response_cache_scope(self, request):
+        user = request.user
+        scope = [user.user_type, *request_tenant_ids(request)]
+        if user.user_type == Person.UserType.RESIDENT:
+            scope.append(f'apartment:{user.apartment_id}')
+        return scope
+
+    def response_cache_key(self, request):
+        labels = {self.get_queryset().model._meta.label_lower, *self.cache_dependent_models}
+        generations = get_response_generations(labels, request_tenant_ids(request))
+        # A URL absoluta entra inteira: os links de paginação e de arquivos levam o host
+        token = '|'.join(map(str, (self.response_cache_scope(request), request.build_absolute_uri(), generations)))
+        return f'response:{type(self).__name__}:{self.action}:{hashlib.sha1(token.encode()).hexdigest()}'
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED or not request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = self.response_cache_key(request)
+        labels = {'view': type(self).__name__, 'action': self.action}
+        data = cache.get(key)
+        if data is not None:
+            RESPONSE_CACHE.inc(result='hit', **labels)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        RESPONSE_CACHE.inc(result='miss', **labels)
+        # Uma réplica atrasada guardaria dados antigos sob a geração nova; o cache é preenchido pelo principal
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
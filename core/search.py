@@ -0,0 +1,184 @@
+import logging
+import os
+
+import docx
+import pdfplumber
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection, connections, transaction
+from django.db.models import F, FloatField, Q, Value
+
+from core.images import get_executor
+from core.models import StoredBlob
+from utils.utils import search_key
+
+logger = logging.getLogger(__name__)
+
+# Configuração criada na migração 0012: português com remoção de acentos
+SEARCH_CONFIG = 'portuguese_unaccent'
+
+# Campos indexados de cada modelo e o peso no ranking ('A' pesa mais que 'B')
+SEARCH_FIELDS = {
+    'core.notice': (('title', 'A'), ('content', 'B')),
+    'core.occurrence': (('title', 'A'), ('description', 'B')),
+    'core.communication': (('title', 'A'), ('message', 'B')),
+}
+
+# Arquivo cujo texto extraído também entra no índice, com peso menor
+SEARCH_ATTACHMENTS = {
+    'core.notice': 'file_complement',
+}
+
+
+def search_enabled():
+    """A busca textual usa tsvector; em outros bancos (SQLite nos testes) cai para icontains."""
+    return connection.vendor == 'postgresql'
+
+
+def extract_document_text(path):
+    """
+    Extrai o texto de um PDF ou DOCX.
+
+    Returns:
+        O texto extraído, ou None se o formato não for suportado.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        with pdfplumber.open(path) as pdf:
+            pages = [page.extract_text() for page in pdf.pages if page.extract_text()]
+            return "\n".join(pages)
+    if extension == '.docx':
+        document = docx.Document(path)
+        return "\n".join(paragraph.text for paragraph in document.paragraphs if paragraph.text)
+    return None
+
+
+def attachment_text(file):
+    """
+    Texto do arquivo anexado, extraído uma única vez por conteúdo e guardado no StoredBlob.
+
+    Avisos que compartilham o mesmo arquivo reaproveitam a extração (e o resumo) já feita.
+    """
+    if not file:
+        return ''
+
+    blob = StoredBlob.objects.filter(name=file.name).first()
+    if blob and blob.extracted_text:
+        return blob.extracted_text
+
+    try:
+        text = extract_document_text(file.path)
+    except Exception as e:
+        logger.error(f"Erro ao extrair o texto de {file.name}: {str(e)}")
+        return ''
+    if text and blob:
+        StoredBlob.objects.filter(pk=blob.pk).update(extracted_text=text)
+    return text or ''
+
+
+def search_vector(label, attachment=''):
+    """Expressão que monta o tsvector do registro no próprio banco."""
+    vector = None
+    for field, weight in SEARCH_FIELDS[label]:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    if attachment:
+        vector += SearchVector(Value(attachment), weight='C', config=SEARCH_CONFIG)
+    return vector
+
+
+def update_search_vector(model, pk):
+    """Recalcula o índice de busca de um registro, sem disparar os sinais de gravação."""
+    label = model._meta.label_lower
+    try:
+        text = ''
+        if label in SEARCH_ATTACHMENTS:
+            instance = model.objects.filter(pk=pk).only(SEARCH_ATTACHMENTS[label]).first()
+            if instance is None:
+                return
+            text = attachment_text(getattr(instance, SEARCH_ATTACHMENTS[label]))
+        model.objects.filter(pk=pk).update(search_vector=search_vector(label, text))
+    except Exception as e:
+        logger.error(f"Erro ao indexar {label} {pk} para a busca: {str(e)}")
+
+
+def update_search_vector_in_worker(model, pk):
+    try:
+        update_search_vector(model, pk)
+    finally:
+        connections.close_all()
+
+
+def schedule_search_update(model, pk):
+    """Atualiza o índice depois do commit; com anexo, a extração do texto roda fora da requisição."""
+    if not search_enabled():
+        return
+
+    def run():
+        if settings.SEARCH_INDEX_ASYNC and model._meta.label_lower in SEARCH_ATTACHMENTS:
+            get_executor().submit(update_search_vector_in_worker, model, pk)
+        else:
+            update_search_vector(model, pk)
+
+    transaction.on_commit(run)
+
+
+def search_queryset(queryset, terms):
+    """
+    Filtra e ordena o queryset pela relevância para os termos.
+
+    No PostgreSQL, usa o índice GIN do tsvector e a sintaxe de busca da web ("frase exata", -excluir, OR).
+    Em outros bancos, busca os termos com icontains e devolve rank 0.
+    """
+    label = queryset.model._meta.label_lower
+    queryset = queryset.defer('search_vector')
+    if search_enabled():
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank')
+
+    condition = Q()
+    for field, _ in SEARCH_FIELDS[label]:
+        condition |= Q(**{f'{field}__icontains': terms})
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+
+def autocomplete_queryset(queryset, terms):
+    """
+    Filtra e ordena o queryset pela semelhança do nome com o texto digitado.
+
+    A comparação é feita na chave normalizada 'name_key' (sem acentos, minúsculas). No PostgreSQL,
+    aceita trechos do nome (LIKE) e erros de digitação (similaridade de palavra do pg_trgm), os dois
+    atendidos pelo índice GIN de trigramas; em outros bancos, apenas trechos do nome.
+    """
+    key = search_key(terms)
+    if search_enabled():
+        return queryset.filter(Q(name_key__contains=key) | Q(name_key__trigram_word_similar=key)).annotate(
+            similarity=TrigramWordSimilarity(key, 'name_key')
+        ).order_by('-similarity', 'name')
+
+    return queryset.filter(name_key__contains=key).annotate(
+        similarity=Value(1.0, output_field=FloatField())
+    ).order_by('name')
+
+def rebuild_search_index():
+    """
+    Reindexa todos os registros pesquisáveis, inclusive o texto dos anexos.
+
+    Returns:
+        Quantidade de registros reindexados.
+    """
+    total = 0
+    for label in SEARCH_FIELDS:
+        model = apps.get_model(label)
+        # Os campos de texto de todos os registros em um único UPDATE; os anexos depois, um a um
+        total += model.objects.update(search_vector=search_vector(label))
+        field_name = SEARCH_ATTACHMENTS.get(label)
+        if field_name:
+            with_file = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            for pk in with_file.values_list('pk', flat=True).iterator():
+                update_search_vector(model, pk)
+    return total
@@ -1,3 +1,5 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
 from users.serializers import PersonSerializer
 from .filters import getuser
@@ -7,7 +9,12 @@ from core.models import (
     Notice, Communication, Occurrence
 )
 from users.models import Person
-from .utils import get_condominium_to_code, get_user_condo_apartment
+from .images import rendition_urls
+from .utils import (
+    get_condominium_to_code, get_user_condo_apartment, generate_apartment_grid,
+    get_condominium_id_cached, get_apartment_id_cached, record_changes
+)
+from utils.utils import search_key
 from utils.validators import validator_cpf, validator_telephone, validator_email, \
     validate_apartment_and_condominium_fields, validator_value_finance
 
@@ -113,6 +120,31 @@ class ApartmentSerializer(serializers.ModelSerializer):
             'condominium_detail'
         )
 
+class ApartmentGridSerializer(serializers.Serializer):
+    NUMBERING_CHOICES = (
+        ('floor_unit', 'Andar + unidade (101, 102, ..., 1204)'),
+        ('sequential', 'Sequencial por bloco (1, 2, 3, ...)'),
+    )
+
+    blocks = serializers.ListField(
+        child=serializers.CharField(max_length=10), allow_empty=False, max_length=50
+    )
+    floors = serializers.IntegerField(min_value=1, max_value=200)
+    units_per_floor = serializers.IntegerField(min_value=1, max_value=99)
+    start_floor = serializers.IntegerField(min_value=0, default=1)
+    numbering = serializers.ChoiceField(choices=NUMBERING_CHOICES, default='floor_unit')
+    skip_existing = serializers.BooleanField(default=False)
+
+    def validate_blocks(self, blocks):
+        blocks = [block.strip().upper() for block in blocks]
+        if len(set(blocks)) != len(blocks):
+            raise serializers.ValidationError('Os blocos não podem se repetir.')
+        return blocks
+
+    def create(self, validated_data):
+        created, skipped = generate_apartment_grid(self.context['condominium'], **validated_data)
+        return {'created': created, 'skipped': skipped}
+
 class VisitorSerializer(serializers.ModelSerializer):
     # O campo 'registered_by' é somente leitura, pois é preenchido automaticamente com o usuário autenticado
     code_condominium = serializers.CharField(write_only=True)
@@ -268,6 +300,88 @@ class VisitSerializer(serializers.ModelSerializer):
 
         return super().update(instance, validated_data)
 
+class VisitCheckInSerializer(serializers.Serializer):
+    """
+    Registro de visita em uma única chamada para a portaria.
+
+    O visitante é criado ou atualizado pelo par (cpf, condomínio) com um único INSERT ... ON CONFLICT,
+    o apartamento vem do cache e a resposta traz apenas o necessário para a tela da portaria.
+    """
+    cpf = serializers.CharField()
+    name = serializers.CharField(max_length=255)
+    telephone = serializers.CharField(required=False)
+    number_apartment = serializers.IntegerField(required=False)
+    block_apartment = serializers.CharField(required=False)
+    code_condominium = serializers.CharField(required=False)
+    observation = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_cpf(self, cpf):
+        return validator_cpf(cpf)
+
+    def validate_telephone(self, telephone):
+        return validator_telephone(telephone)
+
+    def validate(self, data):
+        user = getuser(self.context['request'])
+        if user.user_type != Person.UserType.RESIDENT:
+            validate_apartment_and_condominium_fields(user, data)
+        elif user.apartment_id is None:
+            # A visita do morador vai para o apartamento dele; sem um, não há onde registrá-la
+            raise serializers.ValidationError('Seu cadastro não está vinculado a um apartamento.')
+        return data
+
+    def create(self, validated_data):
+        user = getuser(self.context['request'])
+
+        if user.user_type == Person.UserType.RESIDENT:
+            condominium_id, apartment_id = user.condominium_id, user.apartment_id
+        else:
+            if user.user_type == Person.UserType.ADMIN:
+                condominium_id = get_condominium_id_cached(validated_data['code_condominium'])
+                if not user.managed_condominiums.filter(id=condominium_id).exists():
+                    raise serializers.ValidationError('Você não gerencia o condomínio informado.')
+            else:
+                condominium_id = user.condominium_id
+            apartment_id = get_apartment_id_cached(
+                condominium_id, validated_data['number_apartment'], validated_data['block_apartment']
+            )
+
+        visitor = Visitor(
+            condominium_id=condominium_id,
+            cpf=validated_data['cpf'],
+            name=validated_data['name'].title(),
+            name_key=search_key(validated_data['name']),
+            telephone=validated_data.get('telephone'),
+            registered_by=user,
+        )
+        update_fields = ['name', 'name_key', 'telephone'] if visitor.telephone else ['name', 'name_key']
+        # Se a visita não for gravada, o visitante e a alteração no ChangeLog também não ficam
+        with transaction.atomic():
+            Visitor.objects.bulk_create(
+                [visitor], update_conflicts=True, unique_fields=['cpf', 'condominium'], update_fields=update_fields
+            )
+            record_changes(Visitor, [(condominium_id, visitor.pk)])
+
+            visit = Visit.objects.create(
+                condominium_id=condominium_id,
+                apartment_id=apartment_id,
+                visitor=visitor,
+                registered_by=user,
+                observation=validated_data.get('observation'),
+            )
+        return visit
+
+    def to_representation(self, visit):
+        return {
+            'id': visit.id,
+            'entry_date': serializers.DateTimeField().to_representation(visit.entry_date),
+            'visitor': {'id': visit.visitor.id, 'name': visit.visitor.name, 'cpf': visit.visitor.cpf},
+            'apartment': visit.apartment_id,
+        }
+
+class VisitCheckoutSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
 class ReservationSerializer(serializers.ModelSerializer):
 
     # O campo 'resident' é somente leitura, pois é preenchido automaticamente com o usuário autenticado
@@ -327,17 +441,24 @@ class ReservationSerializer(serializers.ModelSerializer):
 
         return super().update(instance, validated_data)
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Expõe a miniatura e a versão de exibição do arquivo, para que as listagens não baixem o original."""
+
+    def to_representation(self, value):
+        return rendition_urls(default_storage, value, self.context.get('request'))
+
 class FinanceSerializer(serializers.ModelSerializer):
     creator = PersonSerializer(read_only=True)
     condominium = CondominiumSerializer(read_only=True)
     code_condominium = serializers.CharField(write_only=True)
     value = serializers.FloatField()
+    renditions = ImageRenditionsField()
 
     class Meta:
         model = Finance
         fields = (
             'id', 'creator', 'value', 'date', 'description',
-            'document', 'condominium', 'code_condominium'
+            'document', 'renditions', 'condominium', 'code_condominium'
         )
         read_only_fields = (
             'id', 'creator', 'condominium'
@@ -584,6 +705,7 @@ class OrderSerializer(serializers.ModelSerializer):
     registered_by = PersonSerializer(read_only=True)
     condominium = CondominiumSerializer(read_only=True)
     owner = PersonSerializer(read_only=True)
+    renditions = ImageRenditionsField()
 
     number_apartment = serializers.IntegerField(write_only=True, required=False)
     block_apartment = serializers.CharField(write_only=True, required=False)
@@ -593,7 +715,7 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = (
             'id', 'order_code', 'status', 'code_condominium', 'condominium',
-            'signature_image', 'registered_by', 'owner', 'number_apartment', 'block_apartment'
+            'signature_image', 'renditions', 'registered_by', 'owner', 'number_apartment', 'block_apartment'
         )
         read_only_fields = ('id', 'owner', 'registered_by', 'condominium')
 
@@ -633,15 +755,20 @@ class OrderSerializer(serializers.ModelSerializer):
 
         return super().update(instance, validated_data)
 
+class OrderDeliverySerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    signature_image = serializers.FileField(required=False)
+
 class NoticeSerializer(serializers.ModelSerializer):
     author = PersonSerializer(read_only=True)
     condominium = CondominiumSerializer(read_only=True)
     code_condominium = serializers.CharField(write_only=True, required=False)
+    renditions = ImageRenditionsField()
 
     class Meta:
         model = Notice
         fields = (
-            'id', 'title', 'content', 'created_at', 'file_complement',
+            'id', 'title', 'content', 'created_at', 'file_complement', 'renditions',
             'author', 'condominium', 'code_condominium'
         )
         read_only_fields = (
@@ -751,12 +878,14 @@ class CommunicationSerializer(serializers.ModelSerializer):
         else:
             final_recipients = recipients_qs
 
-        communication = Communication.objects.create(
-            sender=user,
-            condominium=condominium,
-            **validated_data
-        )
-        communication.recipients.set(final_recipients)
+        # Os destinatários entram na mesma transação do registro, antes que o evento seja visto
+        with transaction.atomic():
+            communication = Communication.objects.create(
+                sender=user,
+                condominium=condominium,
+                **validated_data
+            )
+            communication.recipients.set(final_recipients)
         return communication
 
     def update(self, instance, validated_data):
@@ -1,6 +1,9 @@
 from decouple import config
 from huggingface_hub import InferenceClient
 import re
+from time import perf_counter
+
+from core.metrics import SUMMARIZATION_DURATION
 
 print("Configurando cliente de inferência da Hugging Face...")
 try:
@@ -47,8 +50,10 @@ def summarize_text(text_to_summarize: str) -> str | None:
     """
     if not inference_client:
         print("Cliente de inferência não está disponível.")
+        SUMMARIZATION_DURATION.observe(0, status='unavailable')
         return None
 
+    started = perf_counter()
     try:
         prompt = (
             "Resuma o seguinte texto em português de forma detalhada. "
@@ -74,10 +79,12 @@ def summarize_text(text_to_summarize: str) -> str | None:
         # O objeto retornado tem um atributo 'summary_text'.
         # Extrai o conteúdo da resposta do Llama
         md_summary = summary_list.choices[0].message.content
+        SUMMARIZATION_DURATION.observe(perf_counter() - started, status='success')
         return reformat_text(md_summary)
 
     except Exception as e:
         print(f"Erro ao gerar o resumo via API: {e}")
+        SUMMARIZATION_DURATION.observe(perf_counter() - started, status='error')
         return None
 
 
@@ -0,0 +1,286 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.filters import record_audiences
+from core.images import discard_renditions, schedule_renditions
+from core.metrics import DB_CONNECTIONS
+from core.search import SEARCH_FIELDS, SEARCH_ATTACHMENTS, schedule_search_update
+from core.models import (
+    Address, Apartment, Condominium, Visit, Vehicle, Order, Notice, Finance,
+    Visitor, Reservation, Occurrence, Communication, Resident, ChangeLog
+)
+from core.utils import (
+    bump_apartment_lookup_version, condominium_cache_key,
+    increment_open_visits_count, clear_open_visits_count, plate_index_cache_key,
+    BLOB_FIELDS, retain_blob, release_blob, release_blobs, bump_tenant_versions, record_changes, person_tenant_ids
+)
+from users.models import Person
+
+
+# Tratamento das exclusões, por modelo: cada função recebe de uma vez todos os registros do modelo apagados
+# pelo mesmo delete(), inclusive os apagados em cascata (ver DeletionBatch)
+DELETE_HANDLERS = defaultdict(list)
+
+
+def on_delete(*senders):
+    def register(handler):
+        for sender in senders:
+            DELETE_HANDLERS[sender].append(handler)
+        return handler
+    return register
+
+
+@receiver(post_save, sender=Apartment)
+def clear_apartment_lookup_cache(sender, instance, **kwargs):
+    """Invalida os ids de apartamentos em cache do condomínio usados pelo check-in da portaria."""
+    bump_apartment_lookup_version(instance.condominium_id)
+
+
+@on_delete(Apartment)
+def clear_apartment_lookup_caches(sender, instances):
+    for condominium_id in {instance.condominium_id for instance in instances}:
+        bump_apartment_lookup_version(condominium_id)
+
+
+@on_delete(Condominium)
+def clear_condominium_lookup_cache(sender, instances):
+    cache.delete_many([condominium_cache_key(instance.code_condominium) for instance in instances])
+
+
+@receiver(post_save, sender=Visit)
+def update_open_visits_count(sender, instance, created, **kwargs):
+    """Mantém o contador de presença: entradas somam, qualquer outra alteração força o recálculo."""
+    if created and instance.exit_date is None:
+        increment_open_visits_count(instance.condominium_id)
+    else:
+        clear_open_visits_count(instance.condominium_id)
+
+
+@on_delete(Visit)
+def clear_open_visits_count_on_delete(sender, instances):
+    clear_open_visits_count(*{instance.condominium_id for instance in instances})
+
+
+@receiver(post_save, sender=Vehicle)
+def clear_plate_index(sender, instance, **kwargs):
+    cache.delete(plate_index_cache_key(instance.condominium_id))
+
+
+@on_delete(Vehicle)
+def clear_plate_indexes(sender, instances):
+    cache.delete_many([plate_index_cache_key(condominium_id) for condominium_id in {i.condominium_id for i in instances}])
+
+
+# Campo de arquivo de cada modelo que recebe miniatura e versão de exibição
+RENDITION_FIELDS = {
+    Order: 'signature_image',
+    Notice: 'file_complement',
+    Finance: 'document',
+}
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Notice)
+@receiver(post_save, sender=Finance)
+def schedule_image_renditions(sender, instance, **kwargs):
+    """Agenda as versões reduzidas quando o arquivo do registro muda e descarta as do arquivo anterior."""
+    field_name = RENDITION_FIELDS[sender]
+    name = getattr(instance, field_name).name
+    previous = getattr(instance, '_previous_renditions', None)
+    if previous and previous.get('source') != name:
+        discard_renditions(sender, field_name, previous)
+    if name and instance.renditions.get('source') != name:
+        schedule_renditions(sender, field_name, name)
+    elif not name and instance.renditions:
+        sender.objects.filter(pk=instance.pk).update(renditions={})
+
+
+@on_delete(Order, Notice, Finance)
+def discard_renditions_on_delete(sender, instances):
+    discard_renditions(sender, RENDITION_FIELDS[sender], *(instance.renditions for instance in instances))
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=Notice)
+@receiver(pre_save, sender=Finance)
+def remember_previous_file(sender, instance, **kwargs):
+    """Guarda o arquivo atual do registro e as versões dele, para liberá-los caso o arquivo seja trocado."""
+    field_name = RENDITION_FIELDS[sender]
+    instance._previous_file, instance._previous_renditions = None, None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list(field_name, 'renditions').first()
+        if previous:
+            instance._previous_file, instance._previous_renditions = previous
+            # As versões são gravadas em segundo plano: uma instância carregada antes disso não as apaga ao salvar
+            if previous[0] == getattr(instance, field_name).name:
+                instance.renditions = previous[1]
+
+
+@receiver(post_save, sender=Notice)
+@receiver(post_save, sender=Finance)
+def update_blob_references(sender, instance, **kwargs):
+    name = getattr(instance, BLOB_FIELDS[sender]).name
+    previous = getattr(instance, '_previous_file', None)
+    if name != previous:
+        retain_blob(name)
+        release_blob(previous)
+
+
+@on_delete(Notice, Finance)
+def release_blob_on_delete(sender, instances):
+    release_blobs([getattr(instance, BLOB_FIELDS[sender]).name for instance in instances])
+
+
+@receiver(post_save, sender=Notice)
+@receiver(post_save, sender=Occurrence)
+@receiver(post_save, sender=Communication)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Reindexa o registro para a busca textual quando um campo indexado pode ter mudado."""
+    label = sender._meta.label_lower
+    indexed = {field for field, _ in SEARCH_FIELDS[label]} | {SEARCH_ATTACHMENTS.get(label)}
+    if update_fields is None or indexed & set(update_fields):
+        schedule_search_update(sender, instance.pk)
+
+
+@receiver(connection_created)
+def count_db_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc(alias=connection.alias)
+
+
+# Modelos expostos pelos ViewSets (e o endereço, aninhado no condomínio); cada gravação ou exclusão muda o ETag
+# e entra na sincronização incremental
+TENANT_VERSIONED_MODELS = (
+    Condominium, Apartment, Visitor, Visit, Reservation, Finance, Vehicle, Order,
+    Notice, Communication, Occurrence, Resident, Person, Address,
+)
+
+
+def record_model_change(sender, instance, **kwargs):
+    # Pessoas e endereços não entram na sincronização incremental; só invalidam os ETags
+    if sender is Person:
+        # O login grava last_login (UPDATE_LAST_LOGIN do SIMPLE_JWT), que nenhuma resposta expõe
+        if kwargs.get('update_fields') == frozenset({'last_login'}):
+            return
+        bump_tenant_versions(sender, person_tenant_ids(instance))
+        return
+    if sender is Address:
+        bump_tenant_versions(sender, Condominium.objects.filter(address_id=instance.pk).values_list('id', flat=True))
+        return
+    condominium_id = instance.pk if sender is Condominium else instance.condominium_id
+    action = ChangeLog.Action.CREATE if kwargs.get('created') else ChangeLog.Action.UPSERT
+    record_changes(sender, [(condominium_id, instance.pk)], action)
+
+
+@on_delete(*TENANT_VERSIONED_MODELS)
+def record_model_deletes(sender, instances):
+    if sender is Person:
+        bump_tenant_versions(sender, {pk for instance in instances for pk in person_tenant_ids(instance)})
+        return
+    if sender is Address:
+        condominiums = Condominium.objects.filter(address_id__in=[instance.pk for instance in instances])
+        bump_tenant_versions(sender, condominiums.values_list('id', flat=True))
+        return
+    record_changes(
+        sender,
+        [(instance.pk if sender is Condominium else instance.condominium_id, instance.pk) for instance in instances],
+        ChangeLog.Action.DELETE,
+        {instance.pk: getattr(instance, '_audience', None) for instance in instances},
+    )
+
+
+class DeletionBatch:
+    """
+    Registros apagados por um mesmo delete(), identificado pela origem (o registro ou o queryset excluído).
+
+    Com receptores de exclusão, o Collector do Django carrega os registros em cascata e envia os sinais um a
+    um: primeiro todos os pre_delete, agrupados por modelo, depois todos os post_delete. O lote junta os
+    registros e, depois do último post_delete, chama os DELETE_HANDLERS uma vez por modelo, em vez de uma
+    gravação no ChangeLog, um contador e uma limpeza de cache por registro. O público de cada registro
+    (record_audiences) é lido no pre_delete, enquanto os relacionamentos existem, com uma consulta por modelo.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.pending = set()
+        self.deleted = defaultdict(list)
+        self.unresolved = []
+        self.origin_audiences = None
+
+    def resolve_audiences(self):
+        audiences = record_audiences(self.unresolved)
+        for instance in self.unresolved:
+            instance._audience = audiences[instance.pk]
+        self.unresolved = []
+
+    def remember_audience(self, sender, instance):
+        if sender in (Person, Address):
+            return
+        origin_model = type(self.origin) if isinstance(self.origin, models.Model) else getattr(self.origin, 'model', None)
+        if sender is not origin_model:
+            # Um modelo em cascata: o público sai junto com o dos outros registros dele, quando chegar outro modelo
+            if self.unresolved and type(self.unresolved[0]) is not sender:
+                self.resolve_audiences()
+            self.unresolved.append(instance)
+            return
+        # A origem vem por último; o público dela é lido de uma vez, antes que a exclusão comece
+        if self.origin_audiences is None:
+            self.resolve_audiences()
+            roots = [self.origin] if isinstance(self.origin, models.Model) else list(self.origin.all())
+            self.origin_audiences = record_audiences(roots)
+        instance._audience = self.origin_audiences.get(instance.pk)
+
+    def flush(self):
+        # Sem um pre_delete depois deles, os últimos modelos em cascata só têm os próprios campos para o público
+        self.resolve_audiences()
+        for sender, instances in self.deleted.items():
+            for handler in DELETE_HANDLERS[sender]:
+                handler(sender, instances)
+
+
+# Exclusões em andamento, pelo id da origem
+DELETIONS = {}
+
+
+def deletion_batch(origin):
+    batch = DELETIONS.get(id(origin))
+    if batch is None or batch.origin is not origin:
+        batch = DELETIONS[id(origin)] = DeletionBatch(origin)
+    return batch
+
+
+def start_deletion(sender, instance, origin=None, **kwargs):
+    batch = deletion_batch(origin)
+    batch.pending.add((sender, instance.pk))
+    batch.remember_audience(sender, instance)
+
+
+def finish_deletion(sender, instance, origin=None, **kwargs):
+    batch = deletion_batch(origin)
+    batch.pending.discard((sender, instance.pk))
+    batch.deleted[sender].append(instance)
+    if not batch.pending:
+        del DELETIONS[id(origin)]
+        batch.flush()
+
+
+for model in TENANT_VERSIONED_MODELS:
+    post_save.connect(record_model_change, sender=model, dispatch_uid=f'tenant_version_save_{model.__name__}')
+for model in DELETE_HANDLERS:
+    pre_delete.connect(start_deletion, sender=model, dispatch_uid=f'deletion_start_{model.__name__}')
+    post_delete.connect(finish_deletion, sender=model, dispatch_uid=f'deletion_finish_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=Communication.recipients.through)
+def record_recipients_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Trocar os destinatários muda quem enxerga a comunicação; entra na sincronização como alteração."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        record_changes(Communication, [(instance.condominium_id, instance.pk)])
+    elif pk_set:
+        record_changes(Communication, Communication.objects.filter(pk__in=pk_set).values_list('condominium_id', 'id'))
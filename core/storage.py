@@ -0,0 +1,75 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_PREFIX = 'blobs/'
+
+
+def blob_name(digest, extension=''):
+    """Caminho do conteúdo no storage: blobs/<2 primeiros caracteres>/<sha256><extensão>."""
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def blob_digest(name):
+    """SHA-256 de um arquivo gravado pelo ContentAddressedStorage, extraído do próprio nome."""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage que grava cada conteúdo uma única vez, em um caminho derivado do seu SHA-256.
+
+    O hash é calculado enquanto o upload é copiado para um arquivo temporário, sem ler o arquivo
+    duas vezes. Se o mesmo conteúdo já existir, o temporário é descartado e o nome existente é
+    reaproveitado. A contagem de referências fica no modelo StoredBlob (ver core.signals).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # O nome definitivo só é conhecido depois de ler o conteúdo (ver _save)
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()[:10]
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                # Conteúdo já armazenado: renova a data para que a coleta de órfãos não o apague agora
+                os.utime(full_path)
+            else:
+                os.replace(temp_path, full_path)
+                temp_path = None
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+        return name
+
+
+document_storage = ContentAddressedStorage()
+
+
+def get_document_storage():
+    """Usado como 'storage' dos campos de documentos; a referência ao callable mantém as migrações estáveis."""
+    return document_storage
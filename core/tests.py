@@ -1,16 +1,59 @@
+import csv
+import gzip
+import json
+import re
+import pstats
+import os
+import shutil
+import tempfile
+import uuid
+from unittest import mock, skipUnless
 from datetime import date, timedelta
 from decimal import Decimal
+from functools import partial
+from io import BytesIO, StringIO
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from users.models import Person
 from .models import (
     Address, Condominium, Apartment, Visitor, Visit,
     Occurrence, Reservation, Finance, Vehicle, Order,
-    Notice, Communication, Resident
+    Notice, Communication, Resident, StoredBlob, ChangeLog
 )
+from .events import Subscriber, fetch_events, format_event, latest_event_id, stream_events
+from .benchmark import compare_reports
+from .compression import negotiate_encoding, zstandard
+from .db_routers import PRIMARY_PIN_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, use_primary
+from .exports import format_export_value, stream_csv_rows
+from .metrics import DB_CONNECTION_WAIT, RESPONSE_CACHE, Registry, registry
+from .renderers import MSGPACK_MEDIA_TYPE, ORJSONRenderer, msgpack
+from .views import NoticeViewSet
+from .imports import ApartmentCSVImporter, BaseCSVImporter, VehicleCSVImporter
+from .utils import (
+    apartment_grid_numbers, generate_apartment_grid, get_apartment_id_cached, get_open_visits_count, get_plate_index,
+    collect_orphan_blobs
+)
+from utils.validators import plate_lookup_key
 
 
 class AddressModelTests(TestCase):
@@ -1000,3 +1043,2807 @@ class ResidentModelTests(TestCase):
         )
         self.assertIsNotNone(dependent.created_at)
 
+
+
+class VisitExportTests(TestCase):
+    """Testes para a exportação CSV de visitas"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Export',
+            cpf='12121212121',
+            email='admin@export.com'
+        )
+        address = Address.objects.create(
+            street='Rua Export',
+            number=10,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='12121000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Export',
+            cnpj='12121212000100',
+            address=address,
+            created_by=self.admin
+        )
+        other_address = Address.objects.create(
+            street='Rua Outra',
+            number=20,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='13131000'
+        )
+        self.other_condominium = Condominium.objects.create(
+            name='Condo Outro',
+            cnpj='13131313000100',
+            address=other_address,
+            created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+
+        for condominium, cpf in ((self.condominium, '14141414141'), (self.other_condominium, '15151515151')):
+            apartment = Apartment.objects.create(condominium=condominium, number=101, block='A', tread=1)
+            visitor = Visitor.objects.create(
+                condominium=condominium,
+                name=f'Visitante {cpf}',
+                cpf=cpf,
+                registered_by=self.admin
+            )
+            Visit.objects.create(
+                condominium=condominium,
+                visitor=visitor,
+                apartment=apartment,
+                registered_by=self.admin
+            )
+
+    def test_stream_csv_rows_writes_header_and_rows(self):
+        """Testa que o gerador produz o cabeçalho e uma linha por registro"""
+        columns = (('Visitante', 'visitor__name'), ('CPF', 'visitor__cpf'), ('Saída', 'exit_date'))
+        lines = list(stream_csv_rows(Visit.objects.order_by('id'), columns, chunk_size=1))
+
+        self.assertEqual(lines[0], '\ufeff')
+        self.assertEqual(lines[1], 'Visitante,CPF,Saída\r\n')
+        self.assertEqual(lines[2], 'Visitante 14141414141,14141414141,\r\n')
+        self.assertEqual(len(lines), 4)
+
+    def test_formulas_are_neutralized(self):
+        """Testa que textos que o Excel leria como fórmula saem como texto literal"""
+        Visit.objects.filter(condominium=self.condominium).update(observation='=HYPERLINK("http://x")')
+        columns = (('Observação', 'observation'), ('Valor', 'id'))
+        lines = list(stream_csv_rows(Visit.objects.filter(condominium=self.condominium), columns))
+
+        self.assertTrue(lines[2].startswith('"\'=HYPERLINK(""http://x"")"'))
+        for value in ('+1', '-1', '@SUM(A1)', '\tx', 'Normal'):
+            expected = value if value == 'Normal' else f"'{value}"
+            self.assertEqual(format_export_value(value), expected)
+        self.assertEqual(format_export_value(Decimal('-10')), '-10.00')
+
+    def test_export_endpoint_respects_tenant_scope(self):
+        """Testa que a exportação retorna apenas as visitas do condomínio gerenciado"""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/v1/core/visits/export/', {'delimiter': ';'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('14141414141', content)
+        self.assertNotIn('15151515151', content)
+        self.assertIn('ID;Visitante;CPF', content)
+
+
+class CSVImportTests(TestCase):
+    """Testes para a importação CSV em lote"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Import',
+            cpf='16161616161',
+            email='admin@import.com'
+        )
+        address = Address.objects.create(
+            street='Rua Import',
+            number=30,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='16161000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Import',
+            cnpj='16161616000100',
+            address=address,
+            created_by=self.admin
+        )
+        Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+
+    def test_importer_must_implement_hooks(self):
+        """Testa que um importador sem os métodos obrigatórios falha ao ser criado, e não no meio da importação"""
+        class IncompleteImporter(BaseCSVImporter):
+            model = Apartment
+
+            def clean_row(self, row):
+                return [], row
+
+        with self.assertRaises(TypeError):
+            IncompleteImporter(self.condominium, self.admin)
+
+    def test_apartment_import_reports_row_errors(self):
+        """Testa que linhas inválidas, duplicadas ou existentes são reportadas e as válidas criadas"""
+        content = (
+            'number,block,tread\n'
+            '101,a,1\n'      # já existe no banco
+            '102,A,1\n'
+            '102,A,1\n'      # duplicada no arquivo
+            'abc,A,1\n'      # número inválido
+            '201,B,2\n'
+        ).encode('utf-8')
+
+        report = ApartmentCSVImporter(self.condominium, self.admin, batch_size=2).run(iter(content.splitlines(True)))
+
+        self.assertEqual(report['total'], 5)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['line'] for error in report['errors']], [2, 4, 5])
+        self.assertTrue(Apartment.objects.filter(condominium=self.condominium, number=201, block='B').exists())
+
+    def test_import_accepts_windows_1252_and_stops_at_malformed_line(self):
+        """Testa que CSVs do Excel (Windows-1252) são lidos e que uma linha malformada vira erro, sem exceção"""
+        content = (
+            'number,block\n'
+            '301,Ç\n'
+            f'302,{"x" * (csv.field_size_limit() + 1)}\n'
+            '303,C\n'
+        ).encode('cp1252')
+
+        report = ApartmentCSVImporter(self.condominium, self.admin).run(iter(content.splitlines(True)))
+
+        self.assertEqual(report['created'], 1)
+        self.assertTrue(Apartment.objects.filter(condominium=self.condominium, number=301, block='Ç').exists())
+        self.assertEqual([error['line'] for error in report['errors']], [3])
+        self.assertFalse(Apartment.objects.filter(condominium=self.condominium, number=303).exists())
+
+    def test_vehicle_import_requires_valid_plate_and_main_resident(self):
+        """Testa a validação de placa e de morador principal na importação de veículos"""
+        resident = Person.objects.create(
+            name='Morador Import',
+            email='morador@import.com',
+            cpf='17171717171',
+            user_type='resident',
+            condominium=self.condominium,
+            apartment=Apartment.objects.get(number=101)
+        )
+        Apartment.objects.create(condominium=self.condominium, number=102, block='A', tread=1)
+        content = (
+            'plate,model,color,number_apartment,block_apartment\n'
+            'abc-1234,gol,prata,101,A\n'
+            'XYZ9,uno,preto,101,A\n'
+            'BRA2E19,onix,branco,102,A\n'
+        ).encode('utf-8')
+
+        report = VehicleCSVImporter(self.condominium, self.admin).run(iter(content.splitlines(True)))
+
+        self.assertEqual(report['created'], 1)
+        vehicle = Vehicle.objects.get(condominium=self.condominium)
+        self.assertEqual(vehicle.plate, 'ABC1234')
+        self.assertEqual(vehicle.owner, resident)
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+
+    def test_vehicle_import_refreshes_plate_index(self):
+        """Testa que os veículos importados aparecem no índice de placas já em cache"""
+        Person.objects.create(
+            name='Morador Placa',
+            email='placa@import.com',
+            cpf='18181818182',
+            user_type='resident',
+            condominium=self.condominium,
+            apartment=Apartment.objects.get(number=101)
+        )
+        cache.clear()
+        self.assertEqual(get_plate_index(self.condominium.id), [])
+
+        content = 'plate,model,color,number_apartment,block_apartment\nABC1234,gol,prata,101,A\n'.encode('utf-8')
+        with self.captureOnCommitCallbacks(execute=True):
+            VehicleCSVImporter(self.condominium, self.admin).run(iter(content.splitlines(True)))
+
+        self.assertEqual([key for key, _ in get_plate_index(self.condominium.id)], [plate_lookup_key('ABC1234')])
+
+
+class ApartmentGridTests(TestCase):
+    """Testes para a geração de apartamentos a partir do layout"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Grid',
+            cpf='18181818181',
+            email='admin@grid.com'
+        )
+        address = Address.objects.create(
+            street='Rua Grid',
+            number=40,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='18181000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Grid',
+            cnpj='18181818000100',
+            address=address,
+            created_by=self.admin
+        )
+
+    def test_numbering_schemes(self):
+        """Testa as numerações andar+unidade e sequencial"""
+        self.assertEqual(apartment_grid_numbers(2, 2, 'floor_unit'), [(101, 1), (102, 1), (201, 2), (202, 2)])
+        self.assertEqual(apartment_grid_numbers(2, 2, 'sequential', start_floor=0), [(1, 0), (2, 0), (3, 1), (4, 1)])
+
+    def test_generate_grid_in_bulk(self):
+        """Testa que uma torre inteira é criada com uma única consulta de unicidade"""
+        with CaptureQueriesContext(connection) as queries:
+            created, skipped = generate_apartment_grid(self.condominium, ['A', 'B', 'C', 'D'], 40, 4, 'floor_unit')
+
+        selects = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'core_apartment' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual((created, skipped), (640, 0))
+        self.assertTrue(Apartment.objects.filter(condominium=self.condominium, number=4004, block='D', tread=40).exists())
+
+    def test_generate_grid_conflicts(self):
+        """Testa que apartamentos existentes bloqueiam a geração, a menos que sejam ignorados"""
+        Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+
+        with self.assertRaises(APIValidationError):
+            generate_apartment_grid(self.condominium, ['A'], 2, 2, 'floor_unit')
+
+        created, skipped = generate_apartment_grid(self.condominium, ['A'], 2, 2, 'floor_unit', skip_existing=True)
+        self.assertEqual((created, skipped), (3, 1))
+
+    def test_generate_grid_matches_existing_blocks_ignoring_case(self):
+        """Testa que um bloco existente em minúsculas conta como o mesmo bloco do layout"""
+        Apartment.objects.create(condominium=self.condominium, number=101, block='a', tread=1)
+
+        with self.assertRaises(APIValidationError):
+            generate_apartment_grid(self.condominium, ['A'], 2, 2, 'floor_unit')
+
+        created, skipped = generate_apartment_grid(self.condominium, ['A'], 2, 2, 'floor_unit', skip_existing=True)
+        self.assertEqual((created, skipped), (3, 1))
+        self.assertEqual(Apartment.objects.filter(condominium=self.condominium, number=101).count(), 1)
+
+
+class VisitCheckInTests(TestCase):
+    """Testes para o check-in rápido da portaria"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Portaria',
+            cpf='19191919191',
+            email='admin@portaria.com'
+        )
+        address = Address.objects.create(
+            street='Rua Portaria',
+            number=50,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='19191000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Portaria',
+            cnpj='19191919000100',
+            address=address,
+            created_by=self.admin
+        )
+        self.apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            name='Porteiro',
+            cpf='20202020202',
+            email='porteiro@portaria.com',
+            position='Porteiro',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.client = APIClient()
+        self.client.force_authenticate(self.porter)
+        self.payload = {'cpf': '21212121212', 'name': 'maria visitante', 'number_apartment': 101, 'block_apartment': 'a'}
+
+    def test_check_in_creates_visit_and_visitor(self):
+        """Testa que o check-in cria a visita e o visitante com resposta enxuta"""
+        response = self.client.post('/api/v1/core/visits/check-in/', self.payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['visitor']['name'], 'Maria Visitante')
+        self.assertEqual(response.data['apartment'], self.apartment.id)
+        visit = Visit.objects.get(pk=response.data['id'])
+        self.assertEqual(visit.condominium, self.condominium)
+        self.assertEqual(visit.registered_by, self.porter)
+
+    def test_check_in_upserts_visitor_by_cpf(self):
+        """Testa que o mesmo CPF reaproveita o visitante e atualiza o nome"""
+        self.client.post('/api/v1/core/visits/check-in/', self.payload, format='json')
+        response = self.client.post(
+            '/api/v1/core/visits/check-in/', {**self.payload, 'name': 'Maria Souza'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Visitor.objects.filter(cpf='21212121212').count(), 1)
+        self.assertEqual(Visitor.objects.get(cpf='21212121212').name, 'Maria Souza')
+        self.assertEqual(Visit.objects.filter(visitor__cpf='21212121212').count(), 2)
+
+    def test_failed_check_in_keeps_visitor_untouched(self):
+        """Testa que, se a visita não é gravada, o visitante e o ChangeLog também não mudam"""
+        self.client.post('/api/v1/core/visits/check-in/', self.payload, format='json')
+        visitor = Visitor.objects.get(cpf='21212121212')
+        logged = ChangeLog.objects.filter(model='core.visitor', object_id=visitor.id).count()
+
+        with mock.patch.object(Visit.objects, 'create', side_effect=IntegrityError('visita')):
+            with self.assertRaises(IntegrityError):
+                self.client.post('/api/v1/core/visits/check-in/', {**self.payload, 'name': 'Outro Nome'}, format='json')
+
+        visitor.refresh_from_db()
+        self.assertEqual(visitor.name, 'Maria Visitante')
+        self.assertEqual(ChangeLog.objects.filter(model='core.visitor', object_id=visitor.id).count(), logged)
+
+    def test_check_in_by_resident_without_apartment_is_rejected(self):
+        """Testa que o morador sem apartamento recebe erro de validação, e não um erro de integridade"""
+        apartment = Apartment.objects.create(condominium=self.condominium, number=102, block='A', tread=1)
+        resident = Person.objects.create_user(
+            password='pass123',
+            user_type='resident',
+            name='Morador Sem Apartamento',
+            cpf='22222222222',
+            email='sem.apartamento@portaria.com',
+            condominium=self.condominium,
+            apartment=apartment
+        )
+        resident.approve_person()
+        # O apartamento excluído deixa o morador sem vínculo (SET_NULL)
+        apartment.delete()
+        resident.refresh_from_db()
+        self.client.force_authenticate(resident)
+
+        response = self.client.post('/api/v1/core/visits/check-in/', self.payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Visitor.objects.filter(cpf='21212121212').exists())
+
+    def test_apartment_lookup_is_cached(self):
+        """Testa que o apartamento resolvido fica em cache e é invalidado quando muda"""
+        self.assertEqual(get_apartment_id_cached(self.condominium.id, 101, 'A'), self.apartment.id)
+        with self.assertNumQueries(0):
+            get_apartment_id_cached(self.condominium.id, 101, 'a')
+
+        self.apartment.number = 102
+        self.apartment.save()
+        with self.assertRaises(APIValidationError):
+            get_apartment_id_cached(self.condominium.id, 101, 'A')
+
+
+class VisitPresenceTests(TestCase):
+    """Testes para a presença (visitas em aberto) e a saída em lote"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Presenca',
+            cpf='22222222221',
+            email='admin@presenca.com'
+        )
+        address = Address.objects.create(
+            street='Rua Presenca',
+            number=60,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='22222000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Presenca',
+            cnpj='22222222000122',
+            address=address,
+            created_by=self.admin
+        )
+        apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            name='Porteiro Presenca',
+            cpf='23232323232',
+            email='porteiro@presenca.com',
+            position='Porteiro',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.visits = []
+        for cpf in ('24242424242', '25252525252', '26262626262'):
+            visitor = Visitor.objects.create(
+                condominium=self.condominium, name=f'Visitante {cpf}', cpf=cpf, registered_by=self.porter
+            )
+            self.visits.append(Visit.objects.create(
+                condominium=self.condominium, visitor=visitor, apartment=apartment, registered_by=self.porter
+            ))
+        self.client = APIClient()
+        self.client.force_authenticate(self.porter)
+
+    def test_presence_lists_open_visits(self):
+        """Testa que a presença lista apenas visitas sem saída, com o total da lista"""
+        self.visits[0].exit_date = timezone.now()
+        self.visits[0].save()
+
+        response = self.client.get('/api/v1/core/visits/presence/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual({visit['id'] for visit in response.data['results']}, {self.visits[1].id, self.visits[2].id})
+
+    def test_presence_count_follows_filters(self):
+        """Testa que o total acompanha os filtros aplicados à lista"""
+        response = self.client.get('/api/v1/core/visits/presence/', {'visitor_name': 'Visitante 25252525252'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([visit['id'] for visit in response.data['results']], [self.visits[1].id])
+        self.assertEqual(response.data['count'], 1)
+
+    def test_presence_count_comes_from_cached_counter(self):
+        """Testa que, sem filtros, o total vem do contador em cache e a lista é paginada"""
+        visitor = self.visits[0].visitor
+        for _ in range(10):
+            Visit.objects.create(
+                condominium=self.condominium, visitor=visitor, apartment=self.visits[0].apartment, registered_by=self.porter
+            )
+        self.assertEqual(get_open_visits_count(self.condominium.id), 13)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/core/visits/presence/')
+
+        self.assertEqual(response.data['count'], 13)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 3)
+
+    def test_bulk_checkout_closes_visits_and_resets_counter(self):
+        """Testa que a saída em lote fecha as visitas e atualiza o contador"""
+        self.assertEqual(get_open_visits_count(self.condominium.id), 3)
+
+        response = self.client.post(
+            '/api/v1/core/visits/checkout/', {'ids': [self.visits[0].id, self.visits[1].id]}, format='json'
+        )
+
+        self.assertEqual(response.data['checked_out'], 2)
+        self.assertEqual(Visit.objects.filter(exit_date__isnull=True).count(), 1)
+        self.assertEqual(get_open_visits_count(self.condominium.id), 1)
+
+
+class VehiclePlateLookupTests(TestCase):
+    """Testes para a normalização e a busca de placas na portaria"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Placa',
+            cpf='27272727271',
+            email='admin@placa.com'
+        )
+        address = Address.objects.create(
+            street='Rua Placa',
+            number=70,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='27272000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Placa',
+            cnpj='27272727000127',
+            address=address,
+            created_by=self.admin
+        )
+        apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        owner = Person.objects.create_user(
+            password='pass123',
+            user_type='resident',
+            name='Dono Placa',
+            cpf='28282828282',
+            email='dono@placa.com',
+            condominium=self.condominium,
+            apartment=apartment
+        )
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            name='Porteiro Placa',
+            cpf='29292929292',
+            email='porteiro@placa.com',
+            position='Porteiro',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.vehicle = Vehicle.objects.create(
+            condominium=self.condominium, plate='ABC1234', model='Gol', color='Prata',
+            owner=owner, registered_by=self.admin
+        )
+        self.other = Vehicle.objects.create(
+            condominium=self.condominium, plate='XYZ9876', model='Uno', color='Branco',
+            owner=owner, registered_by=self.admin
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.porter)
+
+    def test_plate_lookup_key_normalizes_formats(self):
+        """Testa que hífen, padrão Mercosul e erros de leitura geram a mesma chave"""
+        for plate in ('abc-1234', 'ABC1C34', 'A8C1234', 'ABCI234', 'ABC 1234'):
+            self.assertEqual(plate_lookup_key(plate), 'ABC1234')
+        self.assertEqual(self.vehicle.plate_key, 'ABC1234')
+
+    def test_exact_lookup_matches_mercosul_plate(self):
+        """Testa que a busca exata encontra o veículo pela placa Mercosul equivalente"""
+        response = self.client.get('/api/v1/core/vehicles/lookup/', {'plate': 'ABC-1C34'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([vehicle['id'] for vehicle in response.data['results']], [self.vehicle.id])
+
+    def test_fuzzy_lookup_ranks_by_distance(self):
+        """Testa que a busca aproximada tolera um caractere errado e ordena pela distância"""
+        response = self.client.get('/api/v1/core/vehicles/lookup/', {'plate': 'ABD1234', 'fuzzy': 'true'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.vehicle.id)
+        self.assertEqual(response.data['results'][0]['distance'], 1)
+
+    def test_plate_index_invalidated_on_vehicle_change(self):
+        """Testa que o índice de placas em cache é descartado quando um veículo muda"""
+        self.assertEqual(len(get_plate_index(self.condominium.id)), 2)
+
+        self.other.delete()
+
+        self.assertEqual(get_plate_index(self.condominium.id), [('ABC1234', self.vehicle.id)])
+
+
+class OrderDeliveryTests(TestCase):
+    """Testes para a busca por código e a entrega em lote de encomendas"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Encomenda',
+            cpf='31313131311',
+            email='admin@encomenda.com'
+        )
+        address = Address.objects.create(
+            street='Rua Encomenda',
+            number=80,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='31313000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Encomenda',
+            cnpj='31313131000131',
+            address=address,
+            created_by=self.admin
+        )
+        apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        owner = Person.objects.create_user(
+            password='pass123',
+            user_type='resident',
+            name='Morador Encomenda',
+            cpf='32323232323',
+            email='morador@encomenda.com',
+            condominium=self.condominium,
+            apartment=apartment
+        )
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            name='Porteiro Encomenda',
+            cpf='33333333334',
+            email='porteiro@encomenda.com',
+            position='Porteiro',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.orders = [
+            Order.objects.create(
+                condominium=self.condominium, registered_by=self.porter, order_code=code, owner=owner
+            )
+            for code in ('br123456789br', 'BR123999000BR', 'LX555000111CN')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.porter)
+
+    def test_order_code_exact_and_prefix_lookup(self):
+        """Testa a busca exata e por prefixo do código, sem diferenciar maiúsculas"""
+        self.assertEqual(self.orders[0].order_code, 'BR123456789BR')
+
+        exact = self.client.get('/api/v1/core/orders/', {'order_code': 'br123456789br'})
+        prefix = self.client.get('/api/v1/core/orders/', {'order_code_prefix': 'br123'})
+
+        self.assertEqual([order['id'] for order in exact.data['results']], [self.orders[0].id])
+        self.assertEqual(
+            {order['id'] for order in prefix.data['results']}, {self.orders[0].id, self.orders[1].id}
+        )
+
+    def test_batch_delivery_shares_signature(self):
+        """Testa que a entrega em lote marca as encomendas como entregues com a mesma assinatura"""
+        self.orders[1].status = Order.StatusChoices.COMPLETED
+        self.orders[1].save()
+        signature = SimpleUploadedFile('assinatura.png', b'fake-image', content_type='image/png')
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            response = self.client.post(
+                '/api/v1/core/orders/deliver/',
+                {'ids': [order.id for order in self.orders], 'signature_image': signature},
+                format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['delivered'], 2)
+        delivered = Order.objects.filter(id__in=[self.orders[0].id, self.orders[2].id])
+        self.assertTrue(all(order.status == Order.StatusChoices.COMPLETED for order in delivered))
+        self.assertEqual(len({order.signature_image.name for order in delivered}), 1)
+        self.assertFalse(Order.objects.get(id=self.orders[1].id).signature_image)
+
+
+class ImageRenditionTests(TestCase):
+    """Testes para a geração das versões reduzidas dos arquivos enviados"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root, IMAGE_PIPELINE_ASYNC=False)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.author = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Imagem',
+            cpf='34343434341',
+            email='admin@imagem.com'
+        )
+        address = Address.objects.create(
+            street='Rua Imagem',
+            number=90,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='34343000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Imagem',
+            cnpj='34343434000134',
+            address=address,
+            created_by=self.author
+        )
+        self.author.managed_condominiums.add(self.condominium)
+
+    def photo(self, name='foto.jpg', size=(2000, 1000)):
+        """Gera uma foto JPEG com EXIF, como as enviadas pelo celular."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Fabricante'
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def create_notice(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = Notice.objects.create(
+                condominium=self.condominium, title='Aviso', content='Conteúdo', author=self.author,
+                file_complement=file
+            )
+        notice.refresh_from_db()
+        return notice
+
+    def test_renditions_generated_without_metadata(self):
+        """Testa que a miniatura é gerada reduzida, sem EXIF, e que as dimensões são registradas"""
+        notice = self.create_notice(self.photo())
+
+        self.assertEqual((notice.renditions['width'], notice.renditions['height']), (2000, 1000))
+        thumb = notice.renditions['renditions']['thumb']
+        self.assertEqual((thumb['width'], thumb['height']), (320, 160))
+        with default_storage.open(thumb['name']) as file:
+            image = Image.open(file)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertFalse(image.getexif())
+        self.assertEqual(thumb['size'], default_storage.size(thumb['name']))
+
+    def test_non_image_records_only_size(self):
+        """Testa que arquivos que não são imagem registram apenas o tamanho"""
+        notice = self.create_notice(SimpleUploadedFile('ata.pdf', b'%PDF-1.4 conteudo', content_type='application/pdf'))
+
+        self.assertEqual(notice.renditions['renditions'], {})
+        self.assertEqual(notice.renditions['size'], len(b'%PDF-1.4 conteudo'))
+
+    def test_serializer_exposes_rendition_urls(self):
+        """Testa que a listagem de avisos expõe a URL da miniatura"""
+        self.create_notice(self.photo())
+        client = APIClient()
+        client.force_authenticate(self.author)
+
+        response = client.get('/api/v1/core/notices/')
+
+        renditions = response.data['results'][0]['renditions']
+        self.assertTrue(renditions['thumb']['url'].startswith('http://testserver/'))
+        self.assertTrue(renditions['thumb']['url'].endswith('_thumb.webp'))
+
+    def test_renditions_removed_when_file_changes_or_record_is_deleted(self):
+        """Testa que as versões do arquivo anterior saem do storage ao trocar o arquivo e ao excluir o registro"""
+        notice = self.create_notice(self.photo())
+        first = [rendition['name'] for rendition in notice.renditions['renditions'].values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notice.file_complement = self.photo('outra.jpg', size=(1000, 2000))
+            notice.save()
+        notice.refresh_from_db()
+        second = [rendition['name'] for rendition in notice.renditions['renditions'].values()]
+
+        self.assertFalse(any(default_storage.exists(name) for name in first))
+        self.assertTrue(all(default_storage.exists(name) for name in second))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notice.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in second))
+
+    def test_stale_instance_keeps_renditions(self):
+        """Testa que salvar uma instância carregada antes das versões não as apaga nem as gera de novo"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            notice = Notice.objects.create(
+                condominium=self.condominium, title='Aviso', content='Conteúdo', author=self.author,
+                file_complement=self.photo()
+            )
+        stale = Notice.objects.get(pk=notice.pk)
+        for callback in callbacks:
+            callback()
+        info = Notice.objects.get(pk=notice.pk).renditions
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.title = 'Aviso Editado'
+            stale.save()
+
+        self.assertEqual(Notice.objects.get(pk=notice.pk).renditions, info)
+        self.assertEqual(len(os.listdir(os.path.join(settings.MEDIA_ROOT, 'renditions'))), 2)
+
+
+class DocumentStorageTests(TestCase):
+    """Testes para o armazenamento deduplicado dos documentos enviados"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.author = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Documento',
+            cpf='35353535351',
+            email='admin@documento.com'
+        )
+        address = Address.objects.create(
+            street='Rua Documento',
+            number=95,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='35353000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Documento',
+            cnpj='35353535000135',
+            address=address,
+            created_by=self.author
+        )
+        self.author.managed_condominiums.add(self.condominium)
+
+    def create_notice(self, filename='regimento.pdf', content=b'%PDF-1.4 regimento interno'):
+        return Notice.objects.create(
+            condominium=self.condominium, title='Regimento', content='Regimento interno', author=self.author,
+            file_complement=SimpleUploadedFile(filename, content, content_type='application/pdf')
+        )
+
+    def test_same_content_stored_once(self):
+        """Testa que o mesmo arquivo enviado duas vezes é gravado uma vez, com duas referências"""
+        first = self.create_notice()
+        second = self.create_notice(filename='regimento (1).pdf')
+
+        self.assertEqual(first.file_complement.name, second.file_complement.name)
+        self.assertTrue(first.file_complement.name.startswith('blobs/'))
+        blob = StoredBlob.objects.get(name=first.file_complement.name)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(b'%PDF-1.4 regimento interno'))
+
+    def test_orphan_blobs_collected(self):
+        """Testa que a coleta apaga apenas os arquivos sem referências"""
+        kept = self.create_notice()
+        removed = self.create_notice(content=b'%PDF-1.4 orcamento anual')
+        name = removed.file_complement.name
+        removed.delete()
+
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 0)
+        self.assertEqual(collect_orphan_blobs(grace_seconds=0), 1)
+        self.assertFalse(kept.file_complement.storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertTrue(kept.file_complement.storage.exists(kept.file_complement.name))
+
+    def test_summary_reused_across_notices(self):
+        """Testa que o resumo gerado para um arquivo é reaproveitado pelos avisos com o mesmo conteúdo"""
+        self.create_notice()
+        notice = self.create_notice()
+        StoredBlob.objects.filter(name=notice.file_complement.name).update(summary='Resumo do regimento')
+        client = APIClient()
+        client.force_authenticate(self.author)
+
+        response = client.get(f'/api/v1/core/notices/{notice.id}/summarize/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], 'Resumo do regimento')
+
+
+class ProtectedDownloadTests(TestCase):
+    """Testes para o download protegido dos arquivos anexados"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.author = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Download',
+            cpf='36363636361',
+            email='admin@download.com'
+        )
+        address = Address.objects.create(
+            street='Rua Download',
+            number=96,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='36363000'
+        )
+        condominium = Condominium.objects.create(
+            name='Condo Download',
+            cnpj='36363636000136',
+            address=address,
+            created_by=self.author
+        )
+        self.author.managed_condominiums.add(condominium)
+        self.content = b'%PDF-1.4 ' + bytes(range(256)) * 4
+        self.notice = Notice.objects.create(
+            condominium=condominium, title='Ata', content='Ata da assembleia', author=self.author,
+            file_complement=SimpleUploadedFile('ata.pdf', self.content, content_type='application/pdf')
+        )
+        self.url = f'/api/v1/core/notices/{self.notice.id}/download/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_download_full_file_with_validators(self):
+        """Testa o download completo com ETag, Last-Modified e revalidação com 304"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn(f'aviso-{self.notice.id}.pdf', response['Content-Disposition'])
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_download_range(self):
+        """Testa que o cabeçalho Range devolve apenas o trecho pedido"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+        invalid = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(invalid.status_code, 416)
+
+    def test_download_outside_scope_not_found(self):
+        """Testa que um administrador de outro condomínio não baixa o arquivo"""
+        other = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Outro Admin',
+            cpf='37373737371',
+            email='outro@download.com'
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_download_offloaded_to_web_server(self):
+        """Testa que no modo x-accel a resposta só indica o arquivo ao nginx"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.notice.file_complement.name}')
+        self.assertEqual(response.content, b'')
+
+
+class ConditionalGETTests(TestCase):
+    """Testes para o ETag das listagens e as respostas 304"""
+
+    def setUp(self):
+        self.author = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Etag',
+            cpf='38383838381',
+            email='admin@etag.com'
+        )
+        address = Address.objects.create(
+            street='Rua Etag',
+            number=97,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='38383000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Etag',
+            cnpj='38383838000138',
+            address=address,
+            created_by=self.author
+        )
+        self.author.managed_condominiums.add(self.condominium)
+        Notice.objects.create(condominium=self.condominium, title='Aviso', content='Conteúdo', author=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_not_modified_skips_queryset(self):
+        """Testa que um If-None-Match válido retorna 304 sem consultar os avisos"""
+        response = self.client.get('/api/v1/core/notices/')
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get('/api/v1/core/notices/', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertFalse([query for query in queries.captured_queries if 'core_notice' in query['sql']])
+
+    def test_etag_changes_after_write(self):
+        """Testa que uma gravação no condomínio invalida o ETag da listagem"""
+        etag = self.client.get('/api/v1/core/notices/')['ETag']
+
+        Notice.objects.create(condominium=self.condominium, title='Novo', content='Novo aviso', author=self.author)
+        response = self.client.get('/api/v1/core/notices/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_etag_depends_on_query(self):
+        """Testa que filtros diferentes geram ETags diferentes"""
+        first = self.client.get('/api/v1/core/notices/')['ETag']
+        filtered = self.client.get('/api/v1/core/notices/', {'title': 'Aviso'})['ETag']
+
+        self.assertNotEqual(first, filtered)
+
+    def test_etag_changes_after_nested_address_edit(self):
+        """Testa que editar o endereço, aninhado no condomínio, invalida o ETag da listagem de condomínios"""
+        etag = self.client.get('/api/v1/core/condominiums/')['ETag']
+
+        self.condominium.address.street = 'Rua Nova'
+        self.condominium.address.save()
+        response = self.client.get('/api/v1/core/condominiums/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['address']['street'], 'Rua Nova')
+
+    def test_login_and_other_admins_keep_etag(self):
+        """Testa que o last_login do login e a edição de um administrador de outro condomínio não mudam o ETag"""
+        from django.contrib.auth.models import update_last_login
+
+        other = Person.objects.create_user(
+            password='pass123', user_type='admin', name='Admin Outro', cpf='38383838382', email='outro@etag.com'
+        )
+        other_address = Address.objects.create(
+            street='Rua Outra', number=98, neighborhood='Centro', city='Cidade', state='ST', zip_code='38383001'
+        )
+        other.managed_condominiums.add(Condominium.objects.create(
+            name='Condo Outro', cnpj='38383838000139', address=other_address, created_by=other
+        ))
+        etag = self.client.get('/api/v1/core/notices/')['ETag']
+
+        update_last_login(None, self.author)
+        other.name = 'Admin Renomeado'
+        other.save()
+
+        response = self.client.get('/api/v1/core/notices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class SyncTests(TestCase):
+    """Testes para a sincronização incremental dos apps"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Sync',
+            cpf='39393939391',
+            email='admin@sync.com'
+        )
+        self.condominium = self.create_condominium('Condo Sync', '39393939000139', self.admin)
+        self.admin.managed_condominiums.add(self.condominium)
+        self.notices = [
+            Notice.objects.create(condominium=self.condominium, title=title, content='Conteúdo', author=self.admin)
+            for title in ('Primeiro', 'Segundo')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_condominium(self, name, cnpj, admin):
+        address = Address.objects.create(
+            street=f'Rua {name}',
+            number=98,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='39393000'
+        )
+        return Condominium.objects.create(name=name, cnpj=cnpj, address=address, created_by=admin)
+
+    def test_sync_returns_changes_and_tombstones(self):
+        """Testa que a sincronização traz apenas o que mudou depois do cursor, inclusive exclusões"""
+        cursor = self.client.get('/api/v1/core/sync/').data['cursor']
+
+        new = Notice.objects.create(condominium=self.condominium, title='Terceiro', content='Novo', author=self.admin)
+        self.notices[0].content = 'Alterado'
+        self.notices[0].save()
+        deleted_id = self.notices[1].id
+        self.notices[1].delete()
+
+        response = self.client.get('/api/v1/core/sync/', {'since': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({notice['id'] for notice in response.data['changes']['notices']}, {new.id, self.notices[0].id})
+        self.assertEqual(response.data['deleted'], {'notices': [deleted_id]})
+        self.assertGreater(response.data['cursor'], cursor)
+
+        empty = self.client.get('/api/v1/core/sync/', {'since': response.data['cursor']})
+        self.assertEqual((empty.data['changes'], empty.data['deleted']), ({}, {}))
+
+    def test_sync_ignores_other_condominiums(self):
+        """Testa que alterações de outro condomínio não aparecem"""
+        cursor = self.client.get('/api/v1/core/sync/').data['cursor']
+        other_admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Outro Sync',
+            cpf='40404040401',
+            email='outro@sync.com'
+        )
+        other = self.create_condominium('Outro Sync', '40404040000140', other_admin)
+        Notice.objects.create(condominium=other, title='Outro', content='Outro', author=other_admin)
+
+        response = self.client.get('/api/v1/core/sync/', {'since': cursor})
+
+        self.assertNotIn('notices', response.data['changes'])
+
+    def test_expired_cursor(self):
+        """Testa que um cursor anterior ao histórico mantido exige sincronização completa"""
+        cursor = self.client.get('/api/v1/core/sync/').data['cursor']
+        Notice.objects.create(condominium=self.condominium, title='Terceiro', content='Novo', author=self.admin)
+        ChangeLog.objects.filter(id__lte=cursor).delete()
+
+        response = self.client.get('/api/v1/core/sync/', {'since': 1})
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_sync_stops_before_uncommitted_change(self):
+        """Testa que o cursor não passa de uma lacuna recente nos ids (transação ainda não confirmada)"""
+        cursor = self.client.get('/api/v1/core/sync/').data['cursor']
+        pending = Notice.objects.create(condominium=self.condominium, title='Lento', content='Lento', author=self.admin)
+        done = Notice.objects.create(condominium=self.condominium, title='Rápido', content='Rápido', author=self.admin)
+        pending_log = ChangeLog.objects.get(model='core.notice', object_id=pending.id)
+        ChangeLog.objects.filter(id=pending_log.id).delete()
+
+        response = self.client.get('/api/v1/core/sync/', {'since': cursor})
+
+        self.assertEqual((response.data['cursor'], response.data['changes']), (cursor, {}))
+        self.assertEqual(self.client.get('/api/v1/core/sync/').data['cursor'], cursor)
+
+        # Confirmada, a alteração do id reservado aparece junto com a seguinte
+        pending_log.save(force_insert=True)
+        response = self.client.get('/api/v1/core/sync/', {'since': cursor})
+        self.assertEqual({notice['id'] for notice in response.data['changes']['notices']}, {pending.id, done.id})
+
+        # Uma lacuna antiga é de transação desfeita e não segura mais o cursor
+        rolled_back = Notice.objects.create(condominium=self.condominium, title='Desfeito', content='-', author=self.admin)
+        after = Notice.objects.create(condominium=self.condominium, title='Depois', content='-', author=self.admin)
+        ChangeLog.objects.filter(model='core.notice', object_id=rolled_back.id).delete()
+        ChangeLog.objects.filter(model='core.notice', object_id=after.id).update(
+            created_at=timezone.now() - timedelta(seconds=settings.SYNC_GAP_TIMEOUT + 1)
+        )
+        response = self.client.get('/api/v1/core/sync/', {'since': response.data['cursor']})
+        self.assertEqual([notice['id'] for notice in response.data['changes']['notices']], [after.id])
+
+    def test_sync_scopes_tombstones_and_reports_lost_access(self):
+        """Testa que exclusões seguem o escopo e que sair do escopo vira exclusão para o morador"""
+        apartments = [
+            Apartment.objects.create(condominium=self.condominium, number=number, block='A', tread=1)
+            for number in (101, 102)
+        ]
+        residents = []
+        for index, apartment in enumerate(apartments):
+            resident = Person.objects.create_user(
+                password='pass123',
+                user_type='resident',
+                name=f'Morador Sync {index}',
+                cpf=f'3939393940{index}',
+                email=f'morador{index}@sync.com',
+                condominium=self.condominium,
+                apartment=apartment
+            )
+            resident.approve_person()
+            residents.append(resident)
+        order = Order.objects.create(
+            condominium=self.condominium, registered_by=self.admin, owner=residents[0], order_code='SYNC1'
+        )
+        communication = Communication.objects.create(
+            condominium=self.condominium,
+            communication_type=Communication.CommunicationTypeChoices.MESSAGE,
+            title='Aviso pessoal',
+            message='Conteúdo',
+            sender=self.admin
+        )
+        communication.recipients.add(residents[0])
+        cursor = self.client.get('/api/v1/core/sync/').data['cursor']
+
+        order_id = order.id
+        order.delete()
+        communication.recipients.remove(residents[0])
+
+        deleted = []
+        for resident in residents:
+            self.client.force_authenticate(resident)
+            deleted.append(self.client.get('/api/v1/core/sync/', {'since': cursor}).data['deleted'])
+        self.assertEqual(deleted[0], {'orders': [order_id], 'communications': [communication.id]})
+        self.assertEqual(deleted[1], {'communications': [communication.id]})
+
+        # O remetente continua vendo a comunicação alterada
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/v1/core/sync/', {'since': cursor})
+        self.assertEqual([item['id'] for item in response.data['changes']['communications']], [communication.id])
+        self.assertEqual(response.data['deleted'], {'orders': [order_id]})
+
+
+class EventStreamTests(TestCase):
+    """Testes para os eventos em tempo real (SSE)"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Eventos',
+            cpf='41414141411',
+            email='admin@eventos.com'
+        )
+        self.condominium = self.create_condominium('Condo Eventos', '41414141000141', self.admin)
+        self.admin.managed_condominiums.add(self.condominium)
+        self.apartments = [
+            Apartment.objects.create(condominium=self.condominium, number=number, block='A', tread=1)
+            for number in (101, 102)
+        ]
+        self.residents = [
+            self.create_person('resident', f'Morador {apartment.number}', f'4242424242{index}', apartment=apartment)
+            for index, apartment in enumerate(self.apartments)
+        ]
+        self.porter = self.create_person('employee', 'Porteiro Eventos', '43434343431', position='Porteiro')
+        self.cursor = latest_event_id()
+
+    def create_condominium(self, name, cnpj, admin):
+        address = Address.objects.create(
+            street=f'Rua {name}',
+            number=41,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='41414000'
+        )
+        return Condominium.objects.create(name=name, cnpj=cnpj, address=address, created_by=admin)
+
+    def create_person(self, user_type, name, cpf, condominium=None, **extra):
+        person = Person.objects.create_user(
+            password='pass123',
+            user_type=user_type,
+            name=name,
+            cpf=cpf,
+            email=f'{cpf}@eventos.com',
+            condominium=condominium or self.condominium,
+            **extra
+        )
+        person.approve_person()
+        return person
+
+    def subscriber(self, user):
+        is_staff = user.user_type in ('admin', 'employee')
+        tenant_ids = [0, *user.managed_condominiums.values_list('id', flat=True)] if user.user_type == 'admin' \
+            else [0, user.condominium_id]
+        return Subscriber(tenant_ids, user.pk, is_staff)
+
+    def create_order(self, owner):
+        return Order.objects.create(
+            condominium=self.condominium, registered_by=self.porter, owner=owner, order_code='EVT1'
+        )
+
+    def test_order_event_reaches_owner_and_staff_only(self):
+        """Testa que a encomenda chega ao dono e à portaria, mas não a outro morador"""
+        order = self.create_order(self.residents[0])
+
+        events, cursor = fetch_events(self.cursor)
+
+        self.assertEqual([(event['event'], event['object_id']) for event in events], [('order.received', order.id)])
+        self.assertGreater(cursor, self.cursor)
+        self.assertTrue(self.subscriber(self.residents[0]).accepts(events[0]))
+        self.assertTrue(self.subscriber(self.porter).accepts(events[0]))
+        self.assertTrue(self.subscriber(self.admin).accepts(events[0]))
+        self.assertFalse(self.subscriber(self.residents[1]).accepts(events[0]))
+
+    def test_event_is_scoped_to_condominium(self):
+        """Testa que funcionários de outro condomínio não recebem o evento"""
+        other = self.create_condominium('Outro Eventos', '44444444000144', self.admin)
+        other_porter = self.create_person('employee', 'Outro Porteiro', '44444444441', condominium=other, position='Porteiro')
+        self.create_order(self.residents[0])
+
+        events, _ = fetch_events(self.cursor)
+
+        self.assertFalse(self.subscriber(other_porter).accepts(events[0]))
+
+    def test_updates_are_not_events(self):
+        """Testa que apenas criações viram eventos"""
+        order = self.create_order(self.residents[0])
+        _, cursor = fetch_events(self.cursor)
+
+        order.status = Order.StatusChoices.COMPLETED
+        order.save()
+
+        self.assertEqual(fetch_events(cursor)[0], [])
+
+    def test_communication_event_reaches_recipients_only(self):
+        """Testa que a comunicação chega apenas aos destinatários"""
+        communication = Communication.objects.create(
+            condominium=self.condominium, title='Aviso', message='Mensagem', sender=self.admin
+        )
+        communication.recipients.set([self.residents[1]])
+
+        events, _ = fetch_events(self.cursor)
+
+        self.assertEqual(events[0]['event'], 'communication.created')
+        self.assertTrue(self.subscriber(self.residents[1]).accepts(events[0]))
+        self.assertFalse(self.subscriber(self.residents[0]).accepts(events[0]))
+        self.assertFalse(self.subscriber(self.porter).accepts(events[0]))
+
+    def test_visit_event_reaches_apartment_resident(self):
+        """Testa que a visita chega ao morador do apartamento visitado"""
+        visitor = Visitor.objects.create(
+            condominium=self.condominium, name='Visitante', cpf='45454545451', registered_by=self.porter
+        )
+        Visit.objects.create(
+            condominium=self.condominium, visitor=visitor, apartment=self.apartments[1], registered_by=self.porter
+        )
+
+        events, _ = fetch_events(self.cursor)
+        visit_event = next(event for event in events if event['event'] == 'visit.registered')
+
+        self.assertTrue(self.subscriber(self.residents[1]).accepts(visit_event))
+        self.assertFalse(self.subscriber(self.residents[0]).accepts(visit_event))
+
+    def test_format_event(self):
+        """Testa o formato SSE com id para o Last-Event-ID"""
+        order = self.create_order(self.residents[0])
+        events, _ = fetch_events(self.cursor)
+
+        self.assertEqual(
+            format_event(events[0]),
+            f'id: {events[0]["id"]}\nevent: order.received\n'
+            f'data: {{"id": {order.id}, "condominium": {self.condominium.id}}}\n\n'
+        )
+
+    @override_settings(EVENTS_POLL_INTERVAL=0.01)
+    async def test_stream_replays_from_last_event_id(self):
+        """Testa que a reconexão reenvia os eventos perdidos"""
+        order = await Order.objects.acreate(
+            condominium=self.condominium, registered_by=self.porter, owner=self.residents[0], order_code='EVT2'
+        )
+        stream = stream_events(self.subscriber(self.residents[0]), str(self.cursor))
+        try:
+            self.assertTrue((await anext(stream)).startswith('retry: '))
+            self.assertIn(f'"id": {order.id}', await anext(stream))
+        finally:
+            await stream.aclose()
+
+    def test_events_wait_for_uncommitted_changes(self):
+        """Testa que o cursor dos eventos não passa de uma lacuna recente nos ids do ChangeLog"""
+        first = self.create_order(self.residents[0])
+        second = self.create_order(self.residents[1])
+        pending_log = ChangeLog.objects.get(model='core.order', object_id=first.id)
+        ChangeLog.objects.filter(id=pending_log.id).delete()
+
+        self.assertEqual(fetch_events(self.cursor), ([], self.cursor))
+
+        pending_log.save(force_insert=True)
+        events, _ = fetch_events(self.cursor)
+        self.assertEqual([event['object_id'] for event in events], [first.id, second.id])
+
+    def test_communication_event_waits_for_recipients(self):
+        """Testa que a comunicação ainda sem destinatários segura o cursor até eles serem gravados"""
+        communication = Communication.objects.create(
+            condominium=self.condominium, title='Aviso', message='Mensagem', sender=self.admin
+        )
+
+        events, cursor = fetch_events(self.cursor)
+        self.assertEqual((events, cursor), ([], self.cursor))
+
+        communication.recipients.add(self.residents[0])
+        events, cursor = fetch_events(cursor)
+        self.assertEqual([event['object_id'] for event in events], [communication.id])
+        self.assertTrue(self.subscriber(self.residents[0]).accepts(events[0]))
+
+    @override_settings(EVENTS_POLL_INTERVAL=0.01)
+    async def test_stream_replays_every_page_once(self):
+        """Testa que a reconexão reenvia todas as páginas e não repete o que chega depois pela fila"""
+        orders = [
+            await Order.objects.acreate(
+                condominium=self.condominium, registered_by=self.porter, owner=self.residents[0], order_code=f'PG{index}'
+            )
+            for index in range(3)
+        ]
+        subscriber = self.subscriber(self.residents[0])
+        with mock.patch('core.events.fetch_events', partial(fetch_events, limit=1)):
+            stream = stream_events(subscriber, str(self.cursor))
+            try:
+                self.assertTrue((await anext(stream)).startswith('retry: '))
+                replayed = [await anext(stream) for _ in orders]
+                for order, chunk in zip(orders, replayed):
+                    self.assertIn(f'"id": {order.id}', chunk)
+
+                # Evento já reenviado que chega atrasado pela fila é ignorado
+                events, _ = await sync_to_async(fetch_events)(self.cursor)
+                subscriber.queue.put_nowait(events[0])
+                new = await Order.objects.acreate(
+                    condominium=self.condominium, registered_by=self.porter, owner=self.residents[0], order_code='PG9'
+                )
+                self.assertIn(f'"id": {new.id}', await anext(stream))
+            finally:
+                await stream.aclose()
+
+    def test_stream_requires_asgi(self):
+        """Testa que o servidor WSGI recusa a conexão longa"""
+        client = APIClient()
+        client.force_authenticate(self.residents[0])
+
+        response = client.get('/api/v1/core/events/')
+
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream_authenticates_with_cookie(self):
+        """Testa que o stream aceita só o cookie do JWT, que é o que o EventSource do navegador envia"""
+        self.async_client.cookies[settings.REST_AUTH['JWT_AUTH_COOKIE']] = str(AccessToken.for_user(self.residents[0]))
+
+        response = await self.async_client.get('/api/v1/core/events/')
+        self.assertEqual(response.status_code, 200)
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(stream)).startswith(b'retry: '))
+        finally:
+            await stream.aclose()
+
+        self.async_client.cookies[settings.REST_AUTH['JWT_AUTH_COOKIE']] = 'invalido'
+        response = await self.async_client.get('/api/v1/core/events/')
+        self.assertEqual(response.status_code, 401)
+
+
+class SearchTests(TestCase):
+    """Testes para a busca textual unificada"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Busca',
+            cpf='46464646461',
+            email='admin@busca.com'
+        )
+        self.condominium = self.create_condominium('Condo Busca', '46464646000146', self.admin)
+        self.admin.managed_condominiums.add(self.condominium)
+        self.apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        self.resident = Person.objects.create_user(
+            password='pass123',
+            user_type='resident',
+            name='Morador Busca',
+            cpf='47474747471',
+            email='morador@busca.com',
+            condominium=self.condominium,
+            apartment=self.apartment
+        )
+        self.resident.approve_person()
+        self.notice = Notice.objects.create(
+            condominium=self.condominium, title='Reunião de condomínio', content='Pauta: obras na piscina',
+            author=self.admin
+        )
+        self.occurrence = Occurrence.objects.create(
+            condominium=self.condominium, title='Vazamento', description='Vazamento perto da piscina',
+            reported_by=self.resident
+        )
+        self.communication = Communication.objects.create(
+            condominium=self.condominium, title='Piscina', message='Piscina fechada para limpeza', sender=self.resident
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_condominium(self, name, cnpj, admin):
+        address = Address.objects.create(
+            street=f'Rua {name}',
+            number=46,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='46464000'
+        )
+        return Condominium.objects.create(name=name, cnpj=cnpj, address=address, created_by=admin)
+
+    def search(self, **params):
+        return self.client.get('/api/v1/core/search/', params)
+
+    def test_search_across_resources(self):
+        """Testa que a busca junta avisos, ocorrências e comunicações que o usuário enxerga"""
+        self.communication.recipients.set([self.admin])
+
+        response = self.search(q='piscina')
+
+        self.assertEqual(response.status_code, 200)
+        hits = {(hit['type'], hit['data']['id']) for hit in response.data['results']}
+        self.assertEqual(hits, {
+            ('notices', self.notice.id),
+            ('occurrences', self.occurrence.id),
+            ('communications', self.communication.id),
+        })
+
+    def test_search_is_tenant_scoped(self):
+        """Testa que registros de outro condomínio e comunicações alheias não aparecem"""
+        other_admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Outro Busca',
+            cpf='48484848481',
+            email='outro@busca.com'
+        )
+        other = self.create_condominium('Outro Busca', '48484848000148', other_admin)
+        Notice.objects.create(condominium=other, title='Piscina', content='Outro condomínio', author=other_admin)
+
+        response = self.search(q='piscina')
+
+        hits = {(hit['type'], hit['data']['id']) for hit in response.data['results']}
+        self.assertEqual(hits, {('notices', self.notice.id), ('occurrences', self.occurrence.id)})
+
+    def test_search_filters_types_and_limit(self):
+        """Testa o filtro por recurso e o limite de resultados"""
+        response = self.search(q='piscina', types='occurrences')
+        self.assertEqual([hit['type'] for hit in response.data['results']], ['occurrences'])
+
+        response = self.search(q='piscina', limit=1)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_search_requires_terms(self):
+        """Testa que a busca exige ao menos 2 caracteres"""
+        self.assertEqual(self.search(q='a').status_code, 400)
+
+    @skipUnless(connection.vendor == 'postgresql', 'A busca textual com tsvector exige PostgreSQL.')
+    @override_settings(SEARCH_INDEX_ASYNC=False)
+    def test_search_ranks_and_ignores_accents(self):
+        """Testa que a busca ignora acentos e dá mais peso ao título"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Notice.objects.create(
+                condominium=self.condominium, title='Obras', content='Nova reuniao marcada', author=self.admin
+            )
+            self.notice.save()
+
+        response = self.search(q='reuniao', types='notices')
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['data']['id'], self.notice.id)
+
+
+class AutocompleteTests(TestCase):
+    """Testes para o autocompletar de nomes da portaria"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Autocompletar',
+            cpf='49494949491',
+            email='admin@autocompletar.com'
+        )
+        self.condominium = self.create_condominium('Condo Autocompletar', '49494949000149', self.admin)
+        self.admin.managed_condominiums.add(self.condominium)
+        self.apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            name='João Porteiro',
+            cpf='50505050501',
+            email='porteiro@autocompletar.com',
+            position='Porteiro',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.visitor = Visitor.objects.create(
+            condominium=self.condominium, name='José da Conceição', cpf='51515151511', registered_by=self.porter
+        )
+        self.resident = Resident.objects.create(
+            condominium=self.condominium, name='Maria Conceição', cpf='52525252521',
+            registered_by=self.porter, apartment=self.apartment
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.porter)
+
+    def create_condominium(self, name, cnpj, admin):
+        address = Address.objects.create(
+            street=f'Rua {name}',
+            number=49,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='49494000'
+        )
+        return Condominium.objects.create(name=name, cnpj=cnpj, address=address, created_by=admin)
+
+    def autocomplete(self, **params):
+        return self.client.get('/api/v1/core/autocomplete/', params)
+
+    def test_name_key_ignores_accents_and_case(self):
+        """Testa a chave de busca normalizada mantida no save"""
+        self.assertEqual(self.visitor.name_key, 'jose da conceicao')
+        self.assertEqual(self.porter.name_key, 'joao porteiro')
+
+    def test_autocomplete_matches_without_accents(self):
+        """Testa que o trecho sem acento encontra visitantes e dependentes"""
+        response = self.autocomplete(q='conceicao')
+
+        self.assertEqual(response.status_code, 200)
+        hits = {(hit['type'], hit['id']) for hit in response.data['results']}
+        self.assertEqual(hits, {('visitors', self.visitor.id), ('residents', self.resident.id)})
+
+        response = self.autocomplete(q='JOÃO', types='people')
+        self.assertEqual([hit['id'] for hit in response.data['results']], [self.porter.id])
+
+    def test_autocomplete_is_tenant_scoped(self):
+        """Testa que nomes de outro condomínio não aparecem"""
+        other = self.create_condominium('Outro Autocompletar', '53535353000153', self.admin)
+        Visitor.objects.create(condominium=other, name='José Conceição', cpf='54545454541', registered_by=self.admin)
+
+        response = self.autocomplete(q='conceicao', types='visitors')
+
+        self.assertEqual([hit['id'] for hit in response.data['results']], [self.visitor.id])
+
+    def test_autocomplete_results_are_cached(self):
+        """Testa que a mesma consulta vem do cache e que um novo cadastro invalida o resultado"""
+        self.autocomplete(q='conceicao')
+        with self.assertNumQueries(1):
+            self.autocomplete(q='conceicao')
+
+        Visitor.objects.create(
+            condominium=self.condominium, name='Ana Conceição', cpf='55555555551', registered_by=self.porter
+        )
+        response = self.autocomplete(q='conceicao')
+
+        self.assertEqual(response.data['count'], 3)
+
+    def test_name_filters_use_search_key(self):
+        """Testa que os filtros de nome das listagens também ignoram acentos"""
+        response = self.client.get('/api/v1/core/visitors/', {'name': 'jose'})
+
+        self.assertEqual([visitor['id'] for visitor in response.data['results']], [self.visitor.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'A similaridade por trigramas exige PostgreSQL.')
+    def test_autocomplete_tolerates_typos(self):
+        """Testa que um erro de digitação ainda encontra o nome"""
+        response = self.autocomplete(q='conseicao', types='visitors')
+
+        self.assertEqual([hit['id'] for hit in response.data['results']], [self.visitor.id])
+
+
+class RequestInstrumentationTests(TestCase):
+    """Testes para a instrumentação das requisições (Server-Timing e log estruturado)"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Métricas',
+            cpf='56565656561',
+            email='admin@metricas.com'
+        )
+        address = Address.objects.create(
+            street='Rua Métricas',
+            number=56,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='56565000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Métricas', cnpj='56565656000156', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        for number in (101, 102, 103):
+            Apartment.objects.create(condominium=self.condominium, number=number, block='A', tread=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_header(self):
+        """Testa que a resposta traz os tempos do banco, do serializer, da view e o total"""
+        response = self.client.get('/api/v1/core/apartments/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'serializer;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    def test_request_is_logged(self):
+        """Testa a linha de log estruturada de cada requisição"""
+        with self.assertLogs('core.metrics', level='INFO') as logs:
+            self.client.get('/api/v1/core/apartments/')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['method'], record['status'], record['user']), ('GET', 200, self.admin.pk))
+        self.assertGreater(record['db_queries'], 0)
+        self.assertNotIn('slow_queries', record)
+
+    @override_settings(REQUEST_SLOW_QUERIES=1)
+    def test_slow_request_logs_statements(self):
+        """Testa que a requisição acima do limite sai como WARNING com o SQL que mais pesou"""
+        with self.assertLogs('core.metrics', level='WARNING') as logs:
+            self.client.get('/api/v1/core/apartments/')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(logs.records[-1].levelname, 'WARNING')
+        self.assertTrue(record['slow_queries'])
+        self.assertIn('SELECT', record['slow_queries'][0]['sql'])
+        self.assertEqual(sum(query['count'] for query in record['slow_queries']), record['db_queries'])
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_instrumentation_can_be_disabled(self):
+        """Testa que, desligada, a instrumentação não altera a resposta"""
+        response = self.client.get('/api/v1/core/apartments/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTests(TestCase):
+    """Testes para o endpoint /metrics do Prometheus"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Prometheus',
+            cpf='57575757571',
+            email='admin@prometheus.com'
+        )
+        address = Address.objects.create(
+            street='Rua Prometheus',
+            number=57,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='57575000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Prometheus', cnpj='57575757000157', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        self.client = APIClient()
+
+    def scrape(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    @staticmethod
+    def sample(text, line_prefix):
+        for line in text.splitlines():
+            if line.startswith(line_prefix + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_requires_token_or_superuser(self):
+        """Testa que o endpoint recusa acessos sem o token e sem sessão de superusuário"""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        superuser = Person.objects.create_superuser(
+            password='pass123', user_type='admin', name='Super Prometheus', cpf='57575757572',
+            email='super@prometheus.com'
+        )
+        self.client.force_login(superuser)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_request_histogram_by_viewset_action(self):
+        """Testa que as requisições são agregadas por ViewSet e ação, e não pelo caminho com ids"""
+        self.client.force_authenticate(self.admin)
+        apartment = Apartment.objects.create(condominium=self.condominium, number=101, block='A', tread=1)
+        prefix = (
+            'condomineo_http_request_duration_seconds_count'
+            '{view="ApartmentViewSet",action="retrieve",method="GET",status="200"}'
+        )
+        before = self.sample(self.scrape(), prefix)
+
+        self.client.get(f'/api/v1/core/apartments/{apartment.pk}/')
+        self.client.get(f'/api/v1/core/apartments/{apartment.pk}/')
+
+        text = self.scrape()
+        self.assertEqual(self.sample(text, prefix), before + 2)
+        self.assertIn('# TYPE condomineo_http_request_duration_seconds histogram', text)
+        self.assertIn('condomineo_http_request_db_queries_bucket{view="ApartmentViewSet",action="retrieve",le="+Inf"}', text)
+        self.assertNotIn(f'/apartments/{apartment.pk}', text)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_email_counter(self):
+        """Testa a contagem de e-mails enviados por template"""
+        from utils.utils import send_custom_email
+
+        prefix = 'condomineo_emails_total{template="emails/new_user_email.html",status="sent"}'
+        before = self.sample(self.scrape(), prefix)
+        with mock.patch.dict(os.environ, {'EMAIL_HOST_USER': 'sistema@condomineo.com'}):
+            send_custom_email('Assunto', 'emails/new_user_email.html', {'name': 'Fulano'}, ['admin@prometheus.com'])
+
+        self.assertEqual(self.sample(self.scrape(), prefix), before + 1)
+
+    def test_workers_are_aggregated(self):
+        """Testa que o endpoint soma os arquivos gravados pelos demais workers"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other_worker = {
+            'counters': [['condomineo_recaptcha_verifications', [['result', 'success']], 5]],
+            'histograms': [],
+        }
+        with open(os.path.join(directory, f'{os.getppid()}-1.json'), 'w') as file:
+            json.dump(other_worker, file)
+
+        with override_settings(METRICS_DIR=directory, METRICS_TOKEN='segredo'):
+            prefix = 'condomineo_recaptcha_verifications_total{result="success"}'
+            own = registry.snapshot()['counters']
+            local = sum(value for name, labels, value in own
+                        if name == 'condomineo_recaptcha_verifications' and labels == [['result', 'success']])
+
+            self.assertEqual(self.sample(self.scrape(), prefix), local + 5)
+
+            registry.flush()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}-{registry.started}.json')))
+            # O arquivo do próprio processo não é somado duas vezes
+            self.assertEqual(self.sample(self.scrape(), prefix), local + 5)
+
+    def test_dead_workers_are_merged(self):
+        """Testa que os arquivos de workers encerrados viram uma soma só, sem perder os contadores"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # Dois workers encerrados, o segundo com o mesmo pid reaproveitado
+        for started, value in ((1, 5), (2, 3)):
+            with open(os.path.join(directory, f'999999999-{started}.json'), 'w') as file:
+                json.dump({
+                    'counters': [['condomineo_recaptcha_verifications', [['result', 'success']], value]],
+                    'histograms': [['condomineo_recaptcha_duration_seconds', [['result', 'success']],
+                                    [1] + [0] * 11, 0.004, 1]],
+                }, file)
+
+        with override_settings(METRICS_DIR=directory, METRICS_TOKEN='segredo'):
+            prefix = 'condomineo_recaptcha_verifications_total{result="success"}'
+            count = 'condomineo_recaptcha_duration_seconds_count{result="success"}'
+            before = self.scrape()
+            self.assertEqual(os.listdir(directory).count(Registry.DEAD_WORKERS_FILE), 1)
+            self.assertFalse([name for name in os.listdir(directory) if name.startswith('999999999-')])
+            with open(os.path.join(directory, Registry.DEAD_WORKERS_FILE)) as file:
+                self.assertEqual(json.load(file)['counters'][0][2], 8)
+
+            # Novos encerramentos entram na mesma soma
+            with open(os.path.join(directory, '999999999-3.json'), 'w') as file:
+                json.dump({'counters': [['condomineo_recaptcha_verifications', [['result', 'success']], 2]],
+                           'histograms': []}, file)
+            after = self.scrape()
+        self.assertEqual(self.sample(after, prefix), self.sample(before, prefix) + 2)
+        self.assertEqual(self.sample(after, count), self.sample(before, count))
+
+
+class RequestProfilingTests(TestCase):
+    """Testes para o perfil de requisições sob demanda (X-Profile)"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.directory, PROFILING_SAMPLE_INTERVAL=0.0005
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.superuser = Person.objects.create_superuser(
+            password='pass123', user_type='admin', name='Super Perfil', cpf='58585858581',
+            email='super@perfil.com'
+        )
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Perfil',
+            cpf='58585858582',
+            email='admin@perfil.com'
+        )
+        address = Address.objects.create(
+            street='Rua Perfil',
+            number=58,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='58585000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Perfil', cnpj='58585858000158', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        for number in (101, 102):
+            Apartment.objects.create(condominium=self.condominium, number=number, block='A', tread=1)
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        """O perfil é decidido antes do DRF, então o usuário precisa vir de um JWT de verdade"""
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_sampling_profile_with_sql_trace(self):
+        """Testa o perfil por amostragem e o trace das consultas com a origem no código do projeto"""
+        self.authenticate(self.superuser)
+        response = self.client.get('/api/v1/core/apartments/', HTTP_X_PROFILE='sample')
+
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f'{profile_id}.folded')))
+
+        report = self.client.get(f'/profiles/{profile_id}.json')
+        self.assertEqual(report.status_code, 200)
+        data = json.loads(b''.join(report.streaming_content))
+        self.assertEqual((data['mode'], data['path'], data['status']), ('sample', '/api/v1/core/apartments/', 200))
+        self.assertEqual(data['db_queries'], len(data['queries']))
+        self.assertTrue(any(
+            origin.startswith('core/') for query in data['queries'] for origin in query['origin']
+        ))
+
+    def test_sql_params_are_redacted(self):
+        """Testa que os valores dos parâmetros só entram no trace com PROFILING_SQL_PARAMS"""
+        self.authenticate(self.superuser)
+        reports = {}
+        for enabled in (False, True):
+            cache.clear()
+            with override_settings(PROFILING_SQL_PARAMS=enabled):
+                response = self.client.get('/api/v1/core/apartments/', {'number': '101'}, HTTP_X_PROFILE='sample')
+            with open(os.path.join(self.directory, f"{response['X-Profile-Id']}.json")) as file:
+                reports[enabled] = [param for query in json.load(file)['queries'] for param in query['params']]
+
+        self.assertIn('101', reports[True])
+        self.assertNotIn('101', reports[False])
+        self.assertIn('<str>', reports[False])
+
+    def test_cprofile_mode(self):
+        """Testa o modo determinístico, que grava as estatísticas do cProfile"""
+        self.authenticate(self.superuser)
+        response = self.client.get('/api/v1/core/apartments/?_profile=cprofile')
+
+        profile_id = response['X-Profile-Id']
+        stats = pstats.Stats(os.path.join(self.directory, f'{profile_id}.prof'))
+        filenames = {filename for filename, _, _ in stats.stats}
+        self.assertTrue(any(filename.endswith(os.path.join('core', 'views.py')) for filename in filenames))
+
+    def test_ignored_for_other_users(self):
+        """Testa que o pedido de perfil de quem não é superusuário é ignorado"""
+        self.authenticate(self.admin)
+        response = self.client.get('/api/v1/core/apartments/', HTTP_X_PROFILE='sample')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+        self.assertEqual(self.client.get('/profiles/20250101000000-abcdef12.json').status_code, 403)
+
+    @override_settings(PROFILING_KEEP=1)
+    def test_old_profiles_are_pruned(self):
+        """Testa que apenas os perfis mais recentes são mantidos"""
+        self.authenticate(self.superuser)
+        self.client.get('/api/v1/core/apartments/', HTTP_X_PROFILE='sample')
+        latest = self.client.get('/api/v1/core/apartments/', HTTP_X_PROFILE='sample')['X-Profile-Id']
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)), [f'{latest}.folded', f'{latest}.json']
+        )
+
+
+class DatasetBenchmarkTests(TestCase):
+    """Testes para a massa de dados sintética e o benchmark da API"""
+
+    def generate(self, **options):
+        options = {'condominiums': 2, 'persons': 40, 'visits': 300, 'seed': 7, 'batch_size': 100, **options}
+        call_command('generate_dataset', stdout=StringIO(), **options)
+
+    def test_generate_dataset(self):
+        """Testa os volumes, as relações e os campos que os sinais preencheriam"""
+        self.generate()
+
+        self.assertEqual(Condominium.objects.count(), 2)
+        self.assertEqual(Person.objects.count(), 40)
+        self.assertEqual(Visit.objects.count(), 300)
+        residents = Person.objects.filter(user_type=Person.UserType.RESIDENT)
+        self.assertFalse(residents.filter(apartment__isnull=True).exists())
+        self.assertFalse(Person.objects.filter(groups__isnull=True).exists())
+        self.assertFalse(Visitor.objects.filter(name_key='').exists())
+        self.assertEqual(Condominium.objects.filter(managers__isnull=False).distinct().count(), 2)
+        # As datas ficam espalhadas no período, e não todas no momento da geração
+        self.assertTrue(Visit.objects.filter(entry_date__lt=timezone.now() - timedelta(days=30)).exists())
+        self.assertFalse(Visit.objects.exclude(apartment__condominium=F('condominium')).exists())
+
+        with self.assertRaises(CommandError):
+            self.generate()
+
+    def test_same_seed_same_data(self):
+        """Testa que a mesma semente gera os mesmos dados"""
+        def names():
+            with transaction.atomic():
+                self.generate(visits=20)
+                generated = list(Visitor.objects.order_by('cpf').values_list('name', 'cpf'))
+                transaction.set_rollback(True)
+            return generated
+
+        self.assertEqual(names(), names())
+
+    def test_benchmark_report(self):
+        """Testa o relatório do benchmark e a comparação com a referência"""
+        self.generate()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'report.json')
+
+        call_command('benchmark_api', iterations=2, warmup=0, output=output, stdout=StringIO())
+
+        with open(output) as file:
+            report = json.load(file)
+        self.assertEqual(report['dataset']['core.visit'], 300)
+        visits = report['results']['core/visits list']
+        self.assertEqual(visits['status'], 200)
+        self.assertGreater(visits['queries'], 0)
+        self.assertGreaterEqual(visits['p95_ms'], visits['p50_ms'])
+        self.assertGreater(visits['peak_memory_kb'], 0)
+        self.assertEqual(report['results']['core/visits list (resident)']['status'], 200)
+        self.assertEqual(report['results']['core/orders create']['status'], 201)
+        # As criações são desfeitas: a massa de dados continua igual
+        self.assertEqual(Visit.objects.count(), 300)
+
+        baseline = json.loads(json.dumps(report))
+        baseline['results']['core/visits list']['queries'] -= 1
+        self.assertEqual(
+            compare_reports(baseline, report),
+            [f"core/visits list: consultas {visits['queries'] - 1} -> {visits['queries']}"]
+        )
+        baseline['results']['core/visits list']['queries'] = 0
+        with open(os.path.join(directory, 'baseline.json'), 'w') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_api', iterations=1, warmup=0, only='core/visits list',
+                baseline=os.path.join(directory, 'baseline.json'), stdout=StringIO()
+            )
+
+
+# Consultas permitidas em cada rota GET dos routers; a contagem também tem de ser igual com poucos e
+# com muitos registros, ou seja, não pode crescer com a quantidade de itens da página
+QUERY_BUDGETS = {
+    'core/visitors list': 5,
+    'core/visitors detail': 4,
+    'core/reservations list': 5,
+    'core/reservations detail': 4,
+    'core/apartments list': 4,
+    'core/apartments detail': 3,
+    'core/finances list': 5,
+    'core/finances detail': 4,
+    'core/finances export': 1,
+    'core/notices list': 5,
+    'core/notices detail': 4,
+    'core/vehicles list': 5,
+    'core/vehicles detail': 4,
+    'core/vehicles lookup': 1,
+    'core/orders list': 6,
+    'core/orders detail': 5,
+    'core/orders export': 1,
+    'core/visits list': 6,
+    'core/visits detail': 5,
+    'core/visits export': 1,
+    'core/visits presence': 3,
+    'core/residents list': 5,
+    'core/residents detail': 4,
+    'core/condominiums list': 4,
+    'core/condominiums detail': 3,
+    'core/communications list': 7,
+    'core/communications detail': 6,
+    'core/occurrences list': 5,
+    'core/occurrences detail': 4,
+    'core/occurrences export': 1,
+    'core/sync list': 31,
+    'core/search list': 8,
+    'core/autocomplete list': 5,
+    'users/persons list': 5,
+    'users/persons detail': 4,
+    'users/persons me': 2,
+}
+
+# Consultas permitidas para apagar um condomínio com tudo o que está nele (a cascata do Collector)
+CONDOMINIUM_DELETE_QUERY_BUDGET = 57
+
+# Rotas GET fora do orçamento, com o motivo
+QUERY_BUDGET_EXEMPT = {
+    'core/notices summarize': 'Chama a API externa de sumarização.',
+    'core/notices download': 'Depende de um arquivo no storage.',
+    'core/orders download': 'Depende de um arquivo no storage.',
+    'core/finances download': 'Depende de um arquivo no storage.',
+}
+
+# Parâmetros obrigatórios de algumas rotas
+QUERY_BUDGET_PARAMS = {
+    'core/vehicles lookup': '?plate=QBA1000',
+    'core/sync list': '?since=0',
+    'core/search list': '?q=vazamento',
+    'core/autocomplete list': '?q=silva',
+}
+
+
+def api_routes():
+    """
+    Rotas GET registradas nos DefaultRouter de core/urls.py e users/urls.py.
+
+    Returns:
+        Lista de (nome, ViewSet, se a rota é de detalhe, caminho sem o id).
+    """
+    from core.urls import router as core_router
+    from users.urls import router as users_router
+
+    routes = []
+    for app, router in (('core', core_router), ('users', users_router)):
+        for prefix, viewset, _ in router.registry:
+            base = f'/api/v1/{app}/{prefix}/'
+            if hasattr(viewset, 'list'):
+                routes.append((f'{app}/{prefix} list', viewset, False, base))
+            if hasattr(viewset, 'retrieve'):
+                routes.append((f'{app}/{prefix} detail', viewset, True, base))
+            for extra in viewset.get_extra_actions():
+                if 'get' in extra.mapping:
+                    path = f'{base}{{id}}/{extra.url_path}/' if extra.detail else f'{base}{extra.url_path}/'
+                    routes.append((f'{app}/{prefix} {extra.url_path}', viewset, extra.detail, path))
+    return routes
+
+
+def describe_queries(captured):
+    """SQL executado, com as instruções repetidas (o N+1) primeiro."""
+    shapes = {}
+    for query in captured:
+        shape = re.sub(r"'[^']*'|\b\d+\b", '?', query['sql'])
+        shapes.setdefault(shape, []).append(query['sql'])
+    lines = []
+    for statements in sorted(shapes.values(), key=len, reverse=True):
+        lines.append(f'  {len(statements)}x {statements[0][:400]}')
+    return '\n'.join(lines)
+
+
+class QueryBudgetTests(TestCase):
+    """Testes do orçamento de consultas de todas as rotas GET da API"""
+
+    # Tamanhos comparados; o maior ainda cabe em uma página (PAGE_SIZE)
+    SMALL = 2
+    LARGE = 10
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Orçamento',
+            cpf='59595959591',
+            email='admin@orcamento.com'
+        )
+        address = Address.objects.create(
+            street='Rua Orçamento',
+            number=59,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='59595000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Orçamento', cnpj='59595959000159', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        self.porter = Person.objects.create_user(
+            password='pass123',
+            user_type='employee',
+            position='Porteiro',
+            name='Porteiro Orçamento',
+            cpf='59595959592',
+            email='porteiro@orcamento.com',
+            condominium=self.condominium
+        )
+        self.porter.approve_person()
+        self.created = 0
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_records(self, total):
+        """Completa 'total' registros de cada modelo no condomínio."""
+        now = timezone.now()
+        while self.created < total:
+            index = self.created
+            self.created += 1
+            apartment = Apartment.objects.create(
+                condominium=self.condominium, number=100 + index, block='A', tread=1
+            )
+            resident = Person.objects.create_user(
+                password='pass123',
+                user_type='resident',
+                name=f'Morador Silva {index}',
+                cpf=f'5959{index:07d}',
+                email=f'morador{index}@orcamento.com',
+                condominium=self.condominium,
+                apartment=apartment
+            )
+            Resident.objects.create(
+                condominium=self.condominium, name=f'Dependente Silva {index}', cpf=f'5858{index:07d}',
+                registered_by=resident, apartment=apartment
+            )
+            visitor = Visitor.objects.create(
+                condominium=self.condominium, name=f'Visitante Silva {index}', cpf=f'5757{index:07d}',
+                registered_by=self.porter
+            )
+            Visit.objects.create(
+                condominium=self.condominium, visitor=visitor, apartment=apartment, registered_by=self.porter
+            )
+            Vehicle.objects.create(
+                condominium=self.condominium, registered_by=self.porter, plate=f'QBA{1000 + index}',
+                model='Onix', color='Prata', owner=resident
+            )
+            Order.objects.create(
+                condominium=self.condominium, registered_by=self.porter, order_code=f'BR{index}', owner=resident
+            )
+            Notice.objects.create(
+                condominium=self.condominium, title=f'Vazamento {index}', content='Conteúdo', author=self.admin
+            )
+            communication = Communication.objects.create(
+                condominium=self.condominium, title=f'Vazamento {index}', message='Mensagem', sender=self.admin
+            )
+            communication.recipients.add(resident, self.porter)
+            Occurrence.objects.create(
+                condominium=self.condominium, title=f'Vazamento {index}', description='Descrição',
+                reported_by=resident
+            )
+            start = now + timedelta(days=index + 1)
+            Reservation.objects.create(
+                condominium=self.condominium, resident=resident, start_time=start, end_time=start + timedelta(hours=2)
+            )
+            Finance.objects.create(
+                condominium=self.condominium, creator=self.admin, value=Decimal('100.00'), description='Taxa'
+            )
+
+    def measure(self, viewset, detail, path, name):
+        if detail:
+            model = viewset.serializer_class.Meta.model
+            object_id = (
+                self.condominium.pk if model is Condominium
+                else model.objects.filter(user_type='resident').order_by('pk').values_list('pk', flat=True).first()
+                if model is Person
+                else model.objects.filter(condominium=self.condominium).order_by('pk').values_list('pk', flat=True).first()
+            )
+            path = path.format(id=object_id) if '{id}' in path else f'{path}{object_id}/'
+        path += QUERY_BUDGET_PARAMS.get(name, '')
+
+        # Sem cache, para medir o caminho completo da consulta
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f'{name}: {path} respondeu {response.status_code}')
+        return captured.captured_queries
+
+    def test_every_route_has_a_budget(self):
+        """Testa que toda rota GET dos routers tem orçamento declarado ou está isenta"""
+        undeclared = [
+            name for name, *_ in api_routes() if name not in QUERY_BUDGETS and name not in QUERY_BUDGET_EXEMPT
+        ]
+        self.assertEqual(undeclared, [], 'Declare o orçamento de consultas em QUERY_BUDGETS.')
+
+    def test_query_count_is_constant(self):
+        """Testa que nenhuma rota faz mais consultas com mais registros nem passa do orçamento"""
+        routes = [route for route in api_routes() if route[0] in QUERY_BUDGETS]
+        self.add_records(self.SMALL)
+        small = {name: self.measure(viewset, detail, path, name) for name, viewset, detail, path in routes}
+        self.add_records(self.LARGE)
+        large = {name: self.measure(viewset, detail, path, name) for name, viewset, detail, path in routes}
+
+        for name, *_ in routes:
+            with self.subTest(route=name):
+                budget = QUERY_BUDGETS[name]
+                self.assertTrue(
+                    len(small[name]) == len(large[name]) and len(large[name]) <= budget,
+                    f'{name}: {len(small[name])} consultas com {self.SMALL} registros, {len(large[name])} com '
+                    f'{self.LARGE} (orçamento: {budget})\n{describe_queries(large[name])}'
+                )
+
+    def measure_condominium_delete(self, total):
+        """Consultas para apagar o condomínio com 'total' registros de cada modelo; a exclusão é desfeita."""
+        with transaction.atomic():
+            self.created = 0
+            self.add_records(total)
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                Condominium.objects.get(pk=self.condominium.pk).delete()
+            tombstones = ChangeLog.objects.filter(condominium_id=self.condominium.pk, action=ChangeLog.Action.DELETE)
+            audiences = dict(tombstones.filter(model='core.communication').values_list('object_id', 'audience'))
+            self.assertEqual(tombstones.filter(model='core.visit').count(), total)
+            self.assertEqual(len(audiences), total)
+            self.assertTrue(all(f'person:{self.porter.pk}' in audience for audience in audiences.values()))
+            transaction.set_rollback(True)
+        return captured.captured_queries
+
+    def test_condominium_delete_query_count_is_constant(self):
+        """Testa que apagar o condomínio registra as exclusões em cascata em lote, sem consultas por registro"""
+        small = self.measure_condominium_delete(self.SMALL)
+        large = self.measure_condominium_delete(self.LARGE)
+        self.assertTrue(
+            len(small) == len(large) and len(large) <= CONDOMINIUM_DELETE_QUERY_BUDGET,
+            f'{len(small)} consultas com {self.SMALL} registros, {len(large)} com {self.LARGE} '
+            f'(orçamento: {CONDOMINIUM_DELETE_QUERY_BUDGET})\n{describe_queries(large)}'
+        )
+
+
+class RendererTests(TestCase):
+    """Testes dos renderers e parsers orjson e MessagePack"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Renderer',
+            cpf='61616161611',
+            email='admin@renderer.com'
+        )
+        address = Address.objects.create(
+            street='Rua Renderer',
+            number=61,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='61616000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Renderer', cnpj='61616161000161', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        Notice.objects.create(
+            condominium=self.condominium, title='Aviso', content='Conteúdo com acentuação', author=self.admin
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_orjson_matches_drf_json(self):
+        """Testa que o orjson gera o mesmo JSON do renderer do DRF para Decimal, datas, UUID e textos traduzíveis"""
+        data = {
+            'value': Decimal('1234.56'),
+            'created_at': timezone.now(),
+            'day': date(2026, 1, 31),
+            'id': uuid.uuid4(),
+            'message': gettext_lazy('Não encontrado.'),
+            'nested': [{'duration': timedelta(minutes=5)}],
+        }
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertTrue(json.loads(ORJSONRenderer().render(data))['created_at'].endswith('Z'))
+
+    def test_json_is_default(self):
+        """Testa que a API responde JSON sem Accept e lê corpos JSON com o orjson"""
+        response = self.client.get('/api/v1/core/notices/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'][0]['content'], 'Conteúdo com acentuação')
+
+        response = self.client.post(
+            '/api/v1/core/notices/', data='{"title": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(msgpack is not None, 'O formato MessagePack exige o pacote msgpack.')
+    def test_msgpack_negotiation(self):
+        """Testa que Accept: application/msgpack devolve o mesmo conteúdo do JSON em MessagePack"""
+        as_json = self.client.get('/api/v1/core/notices/').json()
+        response = self.client.get('/api/v1/core/notices/', HTTP_ACCEPT=MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response['Content-Type'], MSGPACK_MEDIA_TYPE)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), as_json)
+
+    @skipUnless(msgpack is not None, 'O formato MessagePack exige o pacote msgpack.')
+    def test_msgpack_request_body(self):
+        """Testa a criação de um aviso com o corpo em MessagePack"""
+        body = msgpack.packb({
+            'code_condominium': self.condominium.code_condominium, 'title': 'Aviso binário', 'content': 'Conteúdo'
+        })
+        response = self.client.post('/api/v1/core/notices/', data=body, content_type=MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['title'], 'Aviso Binário')
+
+        response = self.client.post('/api/v1/core/notices/', data=b'\xc1', content_type=MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCompressionTests(TestCase):
+    """Testes da compressão das respostas da API"""
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Compressão',
+            cpf='62626262621',
+            email='admin@compressao.com'
+        )
+        address = Address.objects.create(
+            street='Rua Compressão',
+            number=62,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='62626000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Compressão', cnpj='62626262000162', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        for index in range(5):
+            Notice.objects.create(
+                condominium=self.condominium, title=f'Aviso {index}', content='Manutenção do elevador', author=self.admin
+            )
+            Finance.objects.create(
+                condominium=self.condominium, creator=self.admin, value=Decimal('100.00'), description='Taxa'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_negotiation(self):
+        """Testa a escolha da codificação pelo Accept-Encoding"""
+        self.assertEqual(negotiate_encoding('gzip'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=1.0, deflate'), 'gzip')
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+        self.assertIsNone(negotiate_encoding('identity'))
+        self.assertIsNone(negotiate_encoding(None))
+        with override_settings(COMPRESSION_ENCODINGS=['gzip']):
+            self.assertEqual(negotiate_encoding('zstd, br, *;q=0.1'), 'gzip')
+
+    @skipUnless(zstandard is not None, 'A codificação zstd exige o pacote zstandard.')
+    def test_server_preference_on_ties(self):
+        """Testa que, no empate de pesos, vale a preferência do servidor"""
+        self.assertEqual(negotiate_encoding('gzip, zstd'), 'zstd')
+        self.assertEqual(negotiate_encoding('gzip, zstd;q=0.5'), 'gzip')
+
+    def test_large_response_is_compressed(self):
+        """Testa que a listagem acima do tamanho mínimo sai em gzip e com Vary: Accept-Encoding"""
+        plain = self.client.get('/api/v1/core/notices/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/v1/core/notices/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    def test_small_response_is_not_compressed(self):
+        """Testa que respostas abaixo de COMPRESSION_MIN_SIZE saem sem compressão"""
+        with override_settings(COMPRESSION_MIN_SIZE=1024 * 1024):
+            response = self.client.get('/api/v1/core/notices/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_export_is_compressed(self):
+        """Testa a compressão pedaço a pedaço da exportação CSV em streaming"""
+        plain = b''.join(self.client.get('/api/v1/core/finances/export/').streaming_content)
+        response = self.client.get('/api/v1/core/finances/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_exempt_view(self):
+        """Testa que um ViewSet marcado com compression_exempt responde sem compressão"""
+        with mock.patch.object(NoticeViewSet, 'compression_exempt', True, create=True):
+            response = self.client.get('/api/v1/core/notices/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    """Testes do cache de respostas dos ViewSets de leitura"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Cache',
+            cpf='63636363631',
+            email='admin@cache.com'
+        )
+        address = Address.objects.create(
+            street='Rua Cache',
+            number=63,
+            neighborhood='Centro',
+            city='Cidade',
+            state='ST',
+            zip_code='63636000'
+        )
+        self.condominium = Condominium.objects.create(
+            name='Condo Cache', cnpj='63636363000163', address=address, created_by=self.admin
+        )
+        self.admin.managed_condominiums.add(self.condominium)
+        self.residents = []
+        for index in range(2):
+            apartment = Apartment.objects.create(condominium=self.condominium, number=10 + index, block='A', tread=1)
+            resident = Person.objects.create_user(
+                password='pass123',
+                user_type='resident',
+                name=f'Morador Cache {index}',
+                cpf=f'6363636364{index}',
+                email=f'morador{index}@cache.com',
+                condominium=self.condominium,
+                apartment=apartment
+            )
+            resident.approve_person()
+            self.residents.append(resident)
+        Notice.objects.create(condominium=self.condominium, title='Aviso', content='Conteúdo', author=self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_second_read_is_a_hit(self):
+        """Testa que a segunda leitura vem do cache, com os mesmos dados e menos consultas"""
+        first = self.client.get('/api/v1/core/notices/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as hit_queries:
+            second = self.client.get('/api/v1/core/notices/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertNotIn('"core_notice"', ' '.join(query['sql'] for query in hit_queries.captured_queries))
+
+        # Outros parâmetros são outra entrada
+        self.assertEqual(self.client.get('/api/v1/core/notices/', {'title': 'Aviso'})['X-Cache'], 'MISS')
+
+    def test_write_invalidates(self):
+        """Testa que gravar ou excluir um registro do condomínio invalida as respostas guardadas"""
+        self.client.get('/api/v1/core/notices/')
+        notice = Notice.objects.create(
+            condominium=self.condominium, title='Novo aviso', content='Conteúdo', author=self.admin
+        )
+        response = self.client.get('/api/v1/core/notices/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 2)
+
+        notice_id = notice.pk
+        self.client.get(f'/api/v1/core/notices/{notice_id}/')
+        notice.delete()
+        self.assertEqual(self.client.get(f'/api/v1/core/notices/{notice_id}/').status_code, 404)
+
+        # Alterações em modelos aninhados (o endereço vem com o condomínio) também invalidam
+        self.client.get(f'/api/v1/core/condominiums/{self.condominium.pk}/')
+        self.condominium.name = 'Condo Renomeado'
+        self.condominium.save()
+        response = self.client.get(f'/api/v1/core/condominiums/{self.condominium.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Condo Renomeado')
+
+    def test_address_invalidates_and_login_does_not(self):
+        """Testa que editar o endereço aninhado invalida e que o last_login gravado no login não invalida"""
+        from django.contrib.auth.models import update_last_login
+
+        url = f'/api/v1/core/condominiums/{self.condominium.pk}/'
+        self.client.get(url)
+        update_last_login(None, self.residents[0])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.condominium.address.street = 'Rua Nova'
+        self.condominium.address.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['address']['street'], 'Rua Nova')
+
+    def test_scope_isolation(self):
+        """Testa que moradores de apartamentos diferentes não compartilham respostas"""
+        seen = []
+        for resident in self.residents:
+            self.client.force_authenticate(resident)
+            response = self.client.get('/api/v1/core/apartments/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            seen.append([apartment['id'] for apartment in response.json()['results']])
+        self.assertEqual(seen, [[self.residents[0].apartment_id], [self.residents[1].apartment_id]])
+
+        # Avisos são do condomínio inteiro, mas o escopo do morador inclui o apartamento
+        self.client.force_authenticate(self.residents[0])
+        self.assertEqual(self.client.get('/api/v1/core/notices/')['X-Cache'], 'MISS')
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/v1/core/notices/')['X-Cache'], 'MISS')
+
+    def test_hit_ratio_metrics(self):
+        """Testa que hits e misses entram no contador do /metrics"""
+        def count(result):
+            labels = RESPONSE_CACHE.label_values({'view': 'NoticeViewSet', 'action': 'list', 'result': result})
+            return registry.counters.get((RESPONSE_CACHE.name, labels), 0)
+
+        hits, misses = count('hit'), count('miss')
+        for _ in range(3):
+            self.client.get('/api/v1/core/notices/')
+        self.assertEqual(count('miss') - misses, 1)
+        self.assertEqual(count('hit') - hits, 2)
+
+    def test_file_backend(self):
+        """Testa o cache com o backend em arquivos, que serializa as respostas com pickle"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+        with override_settings(CACHES=backend):
+            first = self.client.get(f'/api/v1/core/condominiums/{self.condominium.pk}/')
+            second = self.client.get(f'/api/v1/core/condominiums/{self.condominium.pk}/')
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(second.json(), first.json())
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """Testa que, desligado, o cache não é consultado"""
+        self.client.get('/api/v1/core/notices/')
+        self.assertNotIn('X-Cache', self.client.get('/api/v1/core/notices/'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5, CACHE_PER_PROCESS=False)
+class ReplicaRoutingTests(TestCase):
+    """Testes do encaminhamento das leituras para as réplicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Admin Réplica',
+            cpf='64646464641',
+            email='admin@replica.com'
+        )
+        self.other = Person.objects.create_user(
+            password='pass123',
+            user_type='admin',
+            name='Outro Admin Réplica',
+            cpf='64646464642',
+            email='outro@replica.com'
+        )
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        # Os testes rodam dentro de uma transação, e leituras em transação ficam no principal
+        patcher = mock.patch.object(connection, 'in_atomic_block', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method='get', user=None, view=None, **extra):
+        """Passa uma requisição pelo middleware; a view devolve o banco escolhido para uma leitura."""
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        request = getattr(self.factory, method)('/api/v1/core/notices/', **extra)
+        seen = {}
+
+        def get_response(request):
+            if view:
+                view()
+            seen['read'] = self.router.db_for_read(Notice)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen['read'], response
+
+    def test_safe_reads_go_to_replica(self):
+        """Testa que GETs leem da réplica e gravações vão ao principal"""
+        self.assertEqual(self.request()[0], 'replica1')
+        self.assertEqual(self.request(user=self.user)[0], 'replica1')
+        self.assertEqual(self.request('post', user=self.user)[0], DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(Notice), DEFAULT_DB_ALIAS)
+        # Fora de uma requisição, o Django decide sozinho
+        self.assertIsNone(self.router.db_for_read(Notice))
+
+    def test_read_your_writes(self):
+        """Testa que, depois de uma gravação, o usuário lê do principal durante a janela configurada"""
+        def write():
+            self.router.db_for_write(Notice)
+
+        read, response = self.request('post', user=self.user, view=write)
+        self.assertEqual(read, DEFAULT_DB_ALIAS)
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.request(user=self.user)[0], DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request(user=self.other)[0], 'replica1')
+        # Navegador: o cookie mantém o principal mesmo sem JWT
+        self.assertEqual(self.request(HTTP_COOKIE=f'{PRIMARY_PIN_COOKIE}=1')[0], DEFAULT_DB_ALIAS)
+
+        cache.clear()
+        self.assertEqual(self.request(user=self.user)[0], 'replica1')
+
+        # POST sem gravação (ex.: validação recusada) não fixa o usuário no principal
+        self.assertNotIn(PRIMARY_PIN_COOKIE, self.request('post', user=self.other)[1].cookies)
+
+    def test_write_during_read_pins_request(self):
+        """Testa que uma gravação no meio de um GET leva o resto da requisição ao principal"""
+        def write():
+            self.router.db_for_write(Notice)
+
+        self.assertEqual(self.request(view=write)[0], DEFAULT_DB_ALIAS)
+
+    def test_primary_inside_transactions_and_blocks(self):
+        """Testa as leituras no principal dentro de transações, de use_primary e dos apps de login"""
+        seen = []
+
+        def view():
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                seen.append(self.router.db_for_read(Notice))
+            with use_primary():
+                seen.append(self.router.db_for_read(Notice))
+            seen.append(self.router.db_for_read(Session))
+            seen.append(self.router.db_for_read(Notice))
+
+        self.request(view=view)
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS, 'replica1'])
+
+    def test_migrations_skip_replicas(self):
+        """Testa que as migrações não rodam nas réplicas"""
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'core'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Testa que, sem réplicas, o middleware não interfere"""
+        self.assertIsNone(self.request(user=self.user)[0])
+
+    @override_settings(CACHE_PER_PROCESS=True)
+    def test_requires_shared_cache(self):
+        """Testa que, com o cache de cada processo, a marcação do JWT não valeria entre workers e nada vai à réplica"""
+        with self.assertLogs('core.db_routers', 'WARNING'):
+            self.assertIsNone(self.request(user=self.user)[0])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Exige uma réplica configurada (DATABASE_REPLICA_URLS).')
+@override_settings(CACHE_PER_PROCESS=False)
+class ReplicaIntegrationTests(TransactionTestCase):
+    """Testes do encaminhamento com dois bancos de verdade (a réplica espelha o banco de testes)"""
+    databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+
+    def test_reads_go_to_replica_until_user_writes(self):
+        """Testa que a listagem lê da réplica e, depois de criar um aviso, o usuário lê do principal"""
+        cache.clear()
+        admin = Person.objects.create_user(
+            password='pass123', user_type='admin', name='Admin Integração', cpf='65656565651',
+            email='admin@integracao.com'
+        )
+        address = Address.objects.create(
+            street='Rua Integração', number=65, neighborhood='Centro', city='Cidade', state='ST', zip_code='65656000'
+        )
+        condominium = Condominium.objects.create(
+            name='Condo Integração', cnpj='65656565000165', address=address, created_by=admin
+        )
+        admin.managed_condominiums.add(condominium)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+
+        def notice_queries(alias, method, *args, **kwargs):
+            with CaptureQueriesContext(connections[alias]) as captured:
+                response = method(*args, **kwargs)
+            self.assertLess(response.status_code, 400)
+            return [query for query in captured.captured_queries if '"core_notice"' in query['sql']]
+
+        replica = settings.DATABASE_REPLICAS[0]
+        with override_settings(RESPONSE_CACHE_ENABLED=False, DATABASE_REPLICAS=[replica]):
+            self.assertTrue(notice_queries(replica, client.get, '/api/v1/core/notices/'))
+            self.assertTrue(notice_queries('default', client.post, '/api/v1/core/notices/', {
+                'code_condominium': condominium.code_condominium, 'title': 'Aviso', 'content': 'Conteúdo'
+            }))
+            self.assertTrue(notice_queries('default', client.get, '/api/v1/core/notices/'))
+            self.assertFalse(notice_queries(replica, client.get, '/api/v1/core/notices/'))
+
+
+class ConnectionPoolTests(TestCase):
+    """Testes para o pool de conexões e a medição da espera por conexões (core/db_backends/postgresql)"""
+
+    def wrapper(self, alias, **options):
+        from core.db_backends.postgresql.base import DatabaseWrapper
+
+        # Porta sem servidor: as tentativas de conexão falham na hora, sem depender de um PostgreSQL
+        settings_dict = connections.configure_settings({DEFAULT_DB_ALIAS: {
+            'ENGINE': 'core.db_backends.postgresql', 'NAME': 'condomineo', 'USER': 'condomineo',
+            'HOST': '127.0.0.1', 'PORT': '1', 'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 1, **options},
+        }})[DEFAULT_DB_ALIAS]
+        wrapper = DatabaseWrapper(settings_dict, alias=alias)
+        self.addCleanup(wrapper.close_pool)
+        return wrapper
+
+    @staticmethod
+    def waits(alias, pooled, result):
+        labels = DB_CONNECTION_WAIT.label_values({'alias': alias, 'pooled': pooled, 'result': result})
+        state = registry.histograms.get((DB_CONNECTION_WAIT.name, labels))
+        return state[2] if state else 0
+
+    def test_pool_uses_configured_sizes_and_health_checks(self):
+        """Testa que o pool de cada worker respeita os tamanhos e o tempo de espera e testa as conexões"""
+        from psycopg_pool import ConnectionPool
+
+        wrapper = self.wrapper('pool_sizes', pool={'min_size': 2, 'max_size': 6, 'timeout': 3})
+
+        self.assertEqual((wrapper.pool.min_size, wrapper.pool.max_size, wrapper.pool.timeout), (2, 6, 3))
+        self.assertEqual(wrapper.pool._check, ConnectionPool.check_connection)
+
+    def test_pool_checkout_timeout_is_measured(self):
+        """Testa que a espera que estoura o timeout do pool entra no histograma como 'timeout'"""
+        from django.db import OperationalError
+
+        wrapper = self.wrapper('pool_timeout', pool={'min_size': 1, 'max_size': 1, 'timeout': 0.2})
+        before = self.waits('pool_timeout', 'true', 'timeout')
+
+        # Os workers do pool registram cada tentativa que falha; aqui as falhas são esperadas
+        with mock.patch('psycopg_pool.pool.logger'), self.assertRaises(OperationalError):
+            wrapper.ensure_connection()
+        self.assertEqual(self.waits('pool_timeout', 'true', 'timeout'), before + 1)
+
+    def test_direct_connection_is_measured(self):
+        """Testa que, sem o pool, a tentativa de abrir a conexão também é medida"""
+        from django.db import OperationalError
+
+        wrapper = self.wrapper('pool_direct')
+        before = self.waits('pool_direct', 'false', 'error')
+
+        with self.assertRaises(OperationalError):
+            wrapper.ensure_connection()
+        self.assertEqual(self.waits('pool_direct', 'false', 'error'), before + 1)
+        self.assertIsNone(wrapper.pool)
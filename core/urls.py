@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     VisitorViewSet, ReservationViewSet, ApartmentViewSet,
     FinanceViewSet, VehicleViewSet, OrderViewSet, VisitViewSet,
-    CondominiumViewSet, ResidentViewSet, NoticeViewSet, CommunicationViewSet, OccurrenceViewSet
+    CondominiumViewSet, ResidentViewSet, NoticeViewSet, CommunicationViewSet, OccurrenceViewSet, SyncViewSet,
+    SearchViewSet, AutocompleteViewSet, event_stream
 )
 
 router = DefaultRouter()
@@ -20,7 +21,11 @@ router.register(r'residents', ResidentViewSet, basename='resident')
 router.register(r'condominiums', CondominiumViewSet, basename='condominium')
 router.register(r'communications', CommunicationViewSet, basename='communication')
 router.register(r"occurrences", OccurrenceViewSet, basename="occurrence")
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
 
 urlpatterns = [
+    path('events/', event_stream, name='events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,7 +1,20 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Max, Value, When, Window
+from django.db.models.functions import Greatest, Lag, Upper
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from core.filters import getuser
-from core.models import Condominium
+from core.models import (
+    Condominium, Apartment, Visit, Vehicle, Notice, Finance, StoredBlob, TenantVersion, ChangeLog
+)
+from core.storage import BLOB_PREFIX, blob_digest, get_document_storage, is_blob_name
 from users.models import Person
 
 
@@ -78,3 +91,423 @@ def get_user_condo_apartment(context, validated_data):
 
     return user, condominium, apartment
 
+
+def apartment_grid_numbers(floors, units_per_floor, numbering, start_floor=1):
+    """
+    Retorna a lista (número, piso) dos apartamentos de um bloco.
+
+    'floor_unit' numera pelo andar seguido da unidade (andar 12, unidade 3 -> 1203);
+    'sequential' numera de 1 até o total de unidades do bloco.
+    """
+    numbers = []
+    for index, floor in enumerate(range(start_floor, start_floor + floors)):
+        for unit in range(1, units_per_floor + 1):
+            if numbering == 'floor_unit':
+                numbers.append((floor * 100 + unit, floor))
+            else:
+                numbers.append((index * units_per_floor + unit, floor))
+    return numbers
+
+
+def generate_apartment_grid(condominium, blocks, floors, units_per_floor, numbering, start_floor=1, skip_existing=False):
+    """
+    Cria todos os apartamentos de um condomínio a partir do layout informado.
+
+    A unicidade (unique_apartment_per_condo) é verificada em uma única consulta e a gravação
+    é feita com bulk_create dentro de uma transação.
+
+    Returns:
+        Tupla (quantidade criada, quantidade ignorada por já existir).
+    """
+    numbers = apartment_grid_numbers(floors, units_per_floor, numbering, start_floor)
+    planned = [(number, block, tread) for block in blocks for number, tread in numbers]
+
+    # Blocos comparados sem diferenciar maiúsculas, como em get_apartment_number ('a' e 'A' são o mesmo bloco)
+    existing = set(
+        Apartment.objects.annotate(block_key=Upper('block')).filter(
+            condominium=condominium,
+            block_key__in={block.upper() for block in blocks},
+            number__in={number for number, _ in numbers}
+        ).values_list('number', 'block_key')
+    )
+    if existing and not skip_existing:
+        conflicts = ', '.join(f'{number}/{block}' for number, block in sorted(existing)[:10])
+        raise ValidationError(
+            f"Já existem {len(existing)} apartamentos deste layout no condomínio (número/bloco: {conflicts})."
+        )
+
+    apartments = [
+        Apartment(condominium=condominium, number=number, block=block, tread=tread)
+        for number, block, tread in planned
+        if (number, block.upper()) not in existing
+    ]
+    with transaction.atomic():
+        Apartment.objects.bulk_create(apartments, batch_size=1000)
+        record_changes(
+            Apartment, [(condominium.id, apartment.pk) for apartment in apartments], ChangeLog.Action.CREATE
+        )
+
+    return len(apartments), len(planned) - len(apartments)
+
+
+def apartment_lookup_version(condominium_id):
+    """
+    Versão do cache de apartamentos de um condomínio. Ela entra na chave de cada apartamento,
+    então trocar a versão invalida de uma vez todos os ids guardados daquele condomínio.
+    """
+    key = f'gate:apartment-version:{condominium_id}'
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, None)
+    return version
+
+
+def bump_apartment_lookup_version(condominium_id):
+    cache.set(f'gate:apartment-version:{condominium_id}', time.time_ns(), None)
+
+
+def apartment_cache_key(condominium_id, number, block):
+    version = apartment_lookup_version(condominium_id)
+    return f'gate:apartment:{condominium_id}:{version}:{number}:{block.strip().upper()}'
+
+
+def condominium_cache_key(code):
+    return f'gate:condominium:{code.strip().upper()}'
+
+
+def get_condominium_id_cached(code):
+    """Retorna o id do condomínio pelo código, consultando o cache antes do banco."""
+    key = condominium_cache_key(code)
+    condominium_id = cache.get(key)
+    if condominium_id is None:
+        condominium_id = get_condominium_to_code(code).id
+        cache.set(key, condominium_id, settings.GATE_LOOKUP_CACHE_TIMEOUT)
+    return condominium_id
+
+
+def get_apartment_id_cached(condominium_id, number, block):
+    """
+    Retorna o id do apartamento pelo número e bloco, consultando o cache antes do banco.
+    Os signals trocam a versão do cache do condomínio quando um apartamento muda ou é excluído.
+    """
+    key = apartment_cache_key(condominium_id, number, block)
+    apartment_id = cache.get(key)
+    if apartment_id is None:
+        apartment_id = (
+            Apartment.objects.filter(condominium_id=condominium_id, number=number, block__iexact=block.strip())
+            .values_list('id', flat=True)
+            .first()
+        )
+        if apartment_id is None:
+            raise ValidationError("Apartamento não encontrado no condomínio especificado.")
+        cache.set(key, apartment_id, settings.GATE_LOOKUP_CACHE_TIMEOUT)
+    return apartment_id
+
+
+def presence_cache_key(condominium_id):
+    return f'presence:open-visits:{condominium_id}'
+
+
+def get_open_visits_count(condominium_id):
+    """
+    Quantidade de visitas em aberto (sem data de saída) no condomínio.
+    O valor fica em cache; os signals incrementam na entrada e descartam o valor nas saídas.
+    """
+    key = presence_cache_key(condominium_id)
+    count = cache.get(key)
+    if count is None:
+        # Usa o índice parcial open_visits_idx
+        count = Visit.objects.filter(condominium_id=condominium_id, exit_date__isnull=True).count()
+        cache.set(key, count, settings.PRESENCE_CACHE_TIMEOUT)
+    return count
+
+
+def increment_open_visits_count(condominium_id):
+    try:
+        cache.incr(presence_cache_key(condominium_id))
+    except ValueError:
+        # Contador ainda não calculado: será lido do banco na próxima consulta
+        pass
+
+
+def clear_open_visits_count(*condominium_ids):
+    cache.delete_many([presence_cache_key(condominium_id) for condominium_id in condominium_ids])
+
+
+def plate_index_cache_key(condominium_id):
+    return f'plates:{condominium_id}'
+
+
+def get_plate_index(condominium_id):
+    """
+    Retorna a lista (chave da placa, id do veículo) de um condomínio, guardada em cache.
+    Os signals descartam a lista quando um veículo do condomínio muda ou é excluído.
+    """
+    key = plate_index_cache_key(condominium_id)
+    index = cache.get(key)
+    if index is None:
+        index = list(Vehicle.objects.filter(condominium_id=condominium_id).values_list('plate_key', 'id'))
+        cache.set(key, index, settings.PLATE_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Distância de Levenshtein entre duas placas, interrompida assim que passa de max_distance.
+    Retorna max_distance + 1 quando o limite é ultrapassado.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def fuzzy_plate_candidates(condominium_id, plate_key, max_distance=2, limit=10):
+    """Retorna [(id do veículo, distância)] das placas mais próximas, da menor para a maior distância."""
+    candidates = []
+    for candidate_key, vehicle_id in get_plate_index(condominium_id):
+        distance = edit_distance(plate_key, candidate_key, max_distance)
+        if distance <= max_distance:
+            candidates.append((distance, candidate_key, vehicle_id))
+    candidates.sort()
+    return [(vehicle_id, distance) for distance, _, vehicle_id in candidates[:limit]]
+
+
+# Campos gravados pelo ContentAddressedStorage; usados na contagem de referências e na coleta de órfãos
+BLOB_FIELDS = {
+    Notice: 'file_complement',
+    Finance: 'document',
+}
+
+
+def retain_blob(name):
+    """Soma uma referência ao conteúdo, registrando-o na primeira vez."""
+    if not is_blob_name(name):
+        return
+    blob, _ = StoredBlob.objects.get_or_create(
+        name=name,
+        defaults={'digest': blob_digest(name), 'size': get_document_storage().size(name)}
+    )
+    StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+
+
+def release_blob(name):
+    """Remove uma referência; o arquivo só é apagado pela coleta de órfãos."""
+    release_blobs([name])
+
+
+def release_blobs(names):
+    """release_blob de vários nomes (exclusão em lote) em um único UPDATE; nomes repetidos liberam várias referências."""
+    counts = Counter(name for name in names if is_blob_name(name))
+    if not counts:
+        return
+    released = Case(*(When(name=name, then=Value(count)) for name, count in counts.items()))
+    StoredBlob.objects.filter(name__in=counts, ref_count__gt=0).update(
+        ref_count=Greatest(F('ref_count') - released, Value(0)), updated_at=timezone.now()
+    )
+
+
+def blob_is_referenced(name):
+    return any(model.objects.filter(**{field_name: name}).exists() for model, field_name in BLOB_FIELDS.items())
+
+
+def collect_orphan_blobs(grace_seconds=None):
+    """
+    Apaga os conteúdos sem referências há mais de 'grace_seconds'.
+
+    A carência protege uploads em andamento: o arquivo é gravado antes de o registro ser salvo, e o
+    storage renova a data do arquivo quando o mesmo conteúdo é enviado de novo. Também são apagados
+    arquivos sem StoredBlob, que sobram quando a transação do upload é desfeita.
+
+    Returns:
+        Quantidade de arquivos apagados.
+    """
+    storage = get_document_storage()
+    grace_seconds = settings.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    limit = timezone.now() - timedelta(seconds=grace_seconds)
+    deleted = 0
+
+    def expired(name):
+        return storage.exists(name) and storage.get_modified_time(name) <= limit
+
+    for blob in StoredBlob.objects.filter(ref_count=0, updated_at__lte=limit).iterator():
+        if blob_is_referenced(blob.name):
+            continue
+        if expired(blob.name):
+            storage.delete(blob.name)
+            deleted += 1
+        if not storage.exists(blob.name):
+            blob.delete()
+
+    if not storage.exists(BLOB_PREFIX):
+        return deleted
+
+    known = set(StoredBlob.objects.values_list('name', flat=True))
+    directories, _ = storage.listdir(BLOB_PREFIX)
+    for directory in directories:
+        for filename in storage.listdir(f'{BLOB_PREFIX}{directory}')[1]:
+            name = f'{BLOB_PREFIX}{directory}/{filename}'
+            if name not in known and expired(name) and not blob_is_referenced(name):
+                storage.delete(name)
+                deleted += 1
+    return deleted
+
+
+def response_generation_key(label, condominium_id):
+    return f'response:generation:{label}:{condominium_id}'
+
+
+def get_response_generations(labels, condominium_ids):
+    """
+    Gerações do cache de respostas dos modelos nos condomínios, lidas do cache em uma só chamada.
+
+    Como na versão do cache da portaria, uma geração ausente (nunca criada ou descartada pelo backend)
+    recebe um valor novo, que não coincide com o de nenhuma resposta guardada antes.
+    """
+    keys = [
+        response_generation_key(label, condominium_id)
+        for label in sorted(labels) for condominium_id in sorted(condominium_ids)
+    ]
+    generations = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def bump_response_generations(label, condominium_ids):
+    keys = [response_generation_key(label, condominium_id) for condominium_id in condominium_ids]
+
+    def bump():
+        cache.set_many({key: time.time_ns() for key in keys}, None)
+
+    bump()
+    # De novo no commit: uma leitura concorrente pode ter guardado os dados de antes da transação
+    transaction.on_commit(bump)
+
+
+def bump_tenant_versions(model, condominium_ids):
+    """
+    Incrementa o contador de alterações do modelo nos condomínios informados e troca a geração do
+    cache de respostas.
+
+    Chamado pelos sinais de gravação e exclusão e, explicitamente, pelas operações em lote
+    (bulk_create, update) que não disparam sinais.
+    """
+    label = model._meta.label_lower
+    bump_response_generations(label, {condominium_id or 0 for condominium_id in condominium_ids})
+    for condominium_id in {condominium_id or 0 for condominium_id in condominium_ids}:
+        versions = TenantVersion.objects.filter(model=label, condominium_id=condominium_id)
+        if not versions.update(version=F('version') + 1):
+            _, created = TenantVersion.objects.get_or_create(model=label, condominium_id=condominium_id)
+            if not created:
+                versions.update(version=F('version') + 1)
+
+
+def user_tenant_ids(user):
+    """Condomínios cujos dados o usuário enxerga; 0 cobre os registros sem condomínio."""
+    if user.user_type == Person.UserType.ADMIN:
+        return [0, *user.managed_condominiums.values_list('id', flat=True)]
+    return [0, user.condominium_id or 0]
+
+
+def person_tenant_ids(person):
+    """
+    Condomínios em cujas respostas a pessoa aparece. O administrador aparece nos condomínios que gerencia,
+    e não no 0, que todo usuário enxerga; sem nenhum, só nas respostas dele mesmo, cobertas pelo 0.
+    """
+    if person.user_type == Person.UserType.ADMIN:
+        return list(person.managed_condominiums.values_list('id', flat=True)) or [0]
+    return [person.condominium_id or 0]
+
+
+def get_tenant_versions(labels, condominium_ids):
+    """Contadores atuais dos modelos nos condomínios, em uma única consulta."""
+    return sorted(
+        TenantVersion.objects.filter(model__in=labels, condominium_id__in=condominium_ids)
+        .values_list('model', 'condominium_id', 'version')
+    )
+
+
+def record_changes(model, changes, action=ChangeLog.Action.UPSERT, audiences=None):
+    """
+    Registra alterações para a sincronização incremental e atualiza os contadores dos ETags.
+
+    Args:
+        model: Classe do modelo alterado.
+        changes: Pares (id do condomínio, id do registro).
+        action: ChangeLog.Action (CREATE, UPSERT ou DELETE); criações também viram eventos em tempo real.
+        audiences: Nas exclusões, id do registro -> quem o enxergava (core.filters.record_audiences).
+    """
+    changes = [(condominium_id or 0, object_id) for condominium_id, object_id in changes]
+    if not changes:
+        return
+
+    label = model._meta.label_lower
+    ChangeLog.objects.bulk_create([
+        ChangeLog(
+            model=label, condominium_id=condominium_id, object_id=object_id, action=action,
+            audience=audiences.get(object_id) if audiences else None
+        )
+        for condominium_id, object_id in changes
+        if object_id is not None
+    ])
+    bump_tenant_versions(model, [condominium_id for condominium_id, _ in changes])
+
+
+def change_log_horizon(after, upto):
+    """
+    Maior id do ChangeLog entre 'after' e 'upto' que pode ser entregue sem pular alterações.
+
+    Os ids são reservados no INSERT, mas só aparecem no commit: uma transação longa (importação CSV,
+    geração de apartamentos) pode gravar o id N depois que outra já gravou N+1, e quem levasse o cursor
+    até N+1 nunca receberia N. Por isso a entrega para antes da primeira lacuna recente na sequência;
+    lacunas mais antigas que SYNC_GAP_TIMEOUT segundos são de transações desfeitas e ficam para trás.
+    """
+    if upto <= after:
+        return upto
+    rows = ChangeLog.objects.filter(id__gt=after, id__lte=upto)
+    if rows.count() == upto - after:
+        return upto
+
+    recent = timezone.now() - timedelta(seconds=settings.SYNC_GAP_TIMEOUT)
+    gaps = (
+        rows.annotate(previous=Window(Lag('id', default=Value(after)), order_by=F('id').asc()))
+        .filter(id__gt=F('previous') + 1)
+        .order_by('id')
+        .values_list('previous', 'created_at')
+    )
+    for previous, created_at in gaps:
+        if created_at >= recent:
+            return previous
+    return upto
+
+
+def change_log_cursor():
+    """Cursor atual do ChangeLog (para depois da carga completa), sem passar de uma alteração ainda não confirmada."""
+    latest = ChangeLog.objects.aggregate(cursor=Max('id'))['cursor'] or 0
+    recent = timezone.now() - timedelta(seconds=settings.SYNC_GAP_TIMEOUT)
+    settled = ChangeLog.objects.filter(created_at__lt=recent).aggregate(cursor=Max('id'))['cursor'] or 0
+    return change_log_horizon(settled, latest)
+
+
+def prune_change_log(retention_days=None):
+    """Apaga o histórico mais antigo que SYNC_RETENTION_DAYS; cursores anteriores passam a exigir sincronização completa."""
+    retention_days = settings.SYNC_RETENTION_DAYS if retention_days is None else retention_days
+    limit = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = ChangeLog.objects.filter(created_at__lt=limit).delete()
+    return deleted
@@ -1,20 +1,34 @@
+import hashlib
+import hmac
 import os
-import pdfplumber
-import docx
 import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Max
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
+from rest_framework.settings import api_settings
 from .models import (
     Condominium, Visitor, Reservation, Apartment,
-    Vehicle, Finance, Order, Visit, Resident, Notice, Communication, Occurrence
+    Vehicle, Finance, Order, Visit, Resident, Notice, Communication, Occurrence, StoredBlob, ChangeLog
 )
 
 from .serializers import (
     VisitorSerializer, ReservationSerializer, ApartmentSerializer,
     VehicleSerializer, FinanceSerializer, OrderSerializer, VisitSerializer,
-    CondominiumSerializer, ResidentSerializer,
+    CondominiumSerializer, ResidentSerializer, ApartmentGridSerializer, VisitCheckInSerializer,
+    VisitCheckoutSerializer, OrderDeliverySerializer,
     NoticeSerializer, CommunicationSerializer, OccurrenceSerializer
 )
 from .filters import (
@@ -23,13 +37,33 @@ from .filters import (
     queryset_filter_condominium, queryset_filter_apartment, queryset_filter_vehicle, queryset_filter_visitor,
     queryset_filter_visit, queryset_filter_reservation, queryset_filter_resident, queryset_filter_finance,
     queryset_filter_order, queryset_filter_notice, queryset_filter_communication, queryset_filter_occurrence,
-    NoticeFilter, ResidentFilter, CommunicationFilter, OccurrenceFilter
+    NoticeFilter, ResidentFilter, CommunicationFilter, OccurrenceFilter, audience_includes
+)
+from .compression import compression_exempt
+from .conditional import CONDOMINIUM_DEPENDENT_MODELS, DEFAULT_DEPENDENT_MODELS, ConditionalGETMixin, request_tenant_ids
+from .response_cache import CachedResponseMixin
+from .instrumentation import SerializerTimingMixin
+from .metrics import registry
+from .profiling import PROFILE_FILES, profile_path, profiling_user
+from .events import Subscriber, stream_events
+from .exports import ExportCSVMixin
+from .downloads import ProtectedDownloadMixin
+from .imports import CSV_IMPORTERS
+from .images import schedule_renditions
+from .search import autocomplete_queryset, extract_document_text, search_queryset
+from .utils import (
+    clear_open_visits_count, get_open_visits_count, fuzzy_plate_candidates, record_changes, user_tenant_ids,
+    get_tenant_versions, change_log_cursor, change_log_horizon
 )
 from core.services_ia import summarize_text
+from users.models import Person
+from users.serializers import person_prefetch, with_person_relations
+from users.views import PersonView
+from utils.validators import plate_lookup_key
 
 logger = logging.getLogger(__name__)
 
-class VisitorViewSet(viewsets.ModelViewSet):
+class VisitorViewSet(SerializerTimingMixin, ConditionalGETMixin, viewsets.ModelViewSet):
     serializer_class = VisitorSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     filterset_class = VisitorFilter
@@ -38,11 +72,11 @@ class VisitorViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Visitor.objects.select_related('condominium', 'registered_by')
+        query_base = with_person_relations(Visitor.objects.select_related('condominium__address'), 'registered_by')
         return queryset_filter_visitor(query_base, user)
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(SerializerTimingMixin, ConditionalGETMixin, viewsets.ModelViewSet):
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     filterset_class = ReservationFilter
@@ -51,23 +85,24 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Reservation.objects.select_related('resident__apartment')
+        query_base = with_person_relations(Reservation.objects.select_related('condominium__address'), 'resident')
         return queryset_filter_reservation(query_base, user)
 
 
-class ApartmentViewSet(viewsets.ModelViewSet):
+class ApartmentViewSet(SerializerTimingMixin, ConditionalGETMixin, CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = ApartmentSerializer
     filterset_class = ApartmentFilter
+    etag_dependent_models = CONDOMINIUM_DEPENDENT_MODELS
     search_fields = ('number', 'block')
     ordering_fields = ('number', 'block', 'tread')
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Apartment.objects.select_related('condominium')
+        query_base = Apartment.objects.select_related('condominium__address')
         return queryset_filter_apartment(query_base, user)
 
-class ResidentViewSet(viewsets.ModelViewSet):
+class ResidentViewSet(SerializerTimingMixin, ConditionalGETMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = ResidentSerializer
     filterset_class = ResidentFilter
@@ -75,22 +110,106 @@ class ResidentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Resident.objects.select_related('registered_by', 'apartment')
+        query_base = with_person_relations(
+            Resident.objects.select_related('apartment__condominium__address', 'condominium__address'), 'registered_by'
+        )
         return queryset_filter_resident(query_base, user)
 
-class VisitViewSet(viewsets.ModelViewSet):
+class PresencePagination(PageNumberPagination):
+    """Paginação da presença: com o total já conhecido (contador em cache), o Paginator não faz o COUNT."""
+    known_count = None
+
+    def django_paginator_class(self, object_list, per_page, **kwargs):
+        paginator = Paginator(object_list, per_page, **kwargs)
+        if self.known_count is not None:
+            paginator.count = self.known_count
+        return paginator
+
+
+class VisitViewSet(SerializerTimingMixin, ConditionalGETMixin, ExportCSVMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = VisitSerializer
     filterset_class = VisitFilter
+    etag_dependent_models = (*DEFAULT_DEPENDENT_MODELS, 'core.visitor')
     search_fields = ('visitor__name',)
     ordering_fields = ('entry_date',)
+    export_filename = 'visitas'
+    export_columns = (
+        ('ID', 'id'),
+        ('Visitante', 'visitor__name'),
+        ('CPF', 'visitor__cpf'),
+        ('Apartamento', 'apartment__number'),
+        ('Bloco', 'apartment__block'),
+        ('Entrada', 'entry_date'),
+        ('Saída', 'exit_date'),
+        ('Observação', 'observation'),
+        ('Cadastrado por', 'registered_by__name'),
+    )
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Visit.objects.select_related('visitor', 'apartment', 'registered_by')
+        query_base = with_person_relations(
+            Visit.objects.select_related('visitor__condominium__address', 'apartment__condominium__address'),
+            'registered_by', 'visitor__registered_by'
+        )
         return queryset_filter_visit(query_base, user)
 
-class VehicleViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='check-in')
+    def check_in(self, request):
+        serializer = VisitCheckInSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='presence')
+    def presence(self, request):
+        """Lista, paginada, quem está dentro do condomínio agora (visitas sem data de saída)."""
+        queryset = self.filter_queryset(self.get_queryset()).filter(exit_date__isnull=True).values(
+            'id', 'entry_date', 'observation', 'condominium_id',
+            'visitor__name', 'visitor__cpf', 'apartment__number', 'apartment__block'
+        )
+        paginator = PresencePagination()
+        paginator.known_count = self.cached_presence_count(request)
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(page)
+
+    def cached_presence_count(self, request):
+        """
+        Total do contador em cache (get_open_visits_count) quando a lista é a presença inteira de um único
+        condomínio: administração ou portaria, sem filtros. Com filtros, o total vem do COUNT da lista.
+        """
+        if set(request.query_params) - {PresencePagination.page_query_param, 'ordering'}:
+            return None
+        if request.user.user_type not in (Person.UserType.ADMIN, Person.UserType.EMPLOYEE):
+            return None
+        condominium_ids = [condominium_id for condominium_id in request_tenant_ids(request) if condominium_id]
+        if len(condominium_ids) != 1:
+            return None
+        return get_open_visits_count(condominium_ids[0])
+
+    @action(detail=False, methods=['post'], url_path='checkout')
+    def checkout(self, request):
+        """Registra a saída de várias visitas com um único UPDATE."""
+        if not request.user.has_perm('core.change_visit'):
+            return Response(
+                {"detail": "Você não tem permissão para registrar saídas."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = VisitCheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        open_visits = self.get_queryset().filter(id__in=serializer.validated_data['ids'], exit_date__isnull=True)
+        changes = list(open_visits.values_list('condominium_id', 'id'))
+        checked_out = Visit.objects.filter(
+            id__in=[visit_id for _, visit_id in changes], exit_date__isnull=True
+        ).update(exit_date=timezone.now())
+        clear_open_visits_count(*{condominium_id for condominium_id, _ in changes})
+        record_changes(Visit, changes)
+
+        return Response({'checked_out': checked_out})
+
+class VehicleViewSet(SerializerTimingMixin, ConditionalGETMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = VehicleSerializer
     filterset_class = VehicleFilter
@@ -99,60 +218,197 @@ class VehicleViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Vehicle.objects.select_related('owner', 'condominium', 'registered_by')
+        query_base = with_person_relations(Vehicle.objects.select_related('condominium__address', 'registered_by'), 'owner')
         return queryset_filter_vehicle(query_base, user)
 
-class FinanceViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='lookup')
+    def lookup(self, request):
+        """
+        Busca de placa para a portaria e integrações com câmeras.
+
+        Sem 'fuzzy', faz a busca exata pela chave normalizada. Com 'fuzzy=true', compara a placa com a
+        lista de placas do condomínio em memória e retorna os candidatos ordenados pela distância.
+        """
+        plate = request.query_params.get('plate', '')
+        key = plate_lookup_key(plate)
+        if len(key) < 5:
+            return Response({"error": "Informe a placa no parâmetro 'plate'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        fields = ('id', 'plate', 'model', 'color', 'condominium_id', 'owner__name', 'owner__apartment__number',
+                  'owner__apartment__block')
+
+        if request.query_params.get('fuzzy', '').lower() not in ('1', 'true'):
+            return Response({'results': list(queryset.filter(plate_key=key).values(*fields))})
+
+        user = request.user
+        condominium_id = request.query_params.get('condominium') or user.condominium_id
+        if not condominium_id or not str(condominium_id).isdigit():
+            return Response(
+                {"error": "Informe o condomínio no parâmetro 'condominium'."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        candidates = dict(fuzzy_plate_candidates(int(condominium_id), key))
+        # A consulta final passa pelo escopo do usuário, então placas de fora dele não aparecem
+        vehicles = queryset.filter(id__in=candidates).values(*fields)
+        results = sorted(
+            ({**vehicle, 'distance': candidates[vehicle['id']]} for vehicle in vehicles),
+            key=lambda vehicle: (vehicle['distance'], vehicle['plate'])
+        )
+        return Response({'results': results})
+
+class FinanceViewSet(SerializerTimingMixin, ConditionalGETMixin, ExportCSVMixin, ProtectedDownloadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = FinanceSerializer
     filterset_class = FinanceFilter
     search_fields = ('description',)
     ordering_fields = ('date',)
+    download_field = 'document'
+    download_filename = 'comprovante'
+    export_filename = 'financeiro'
+    export_columns = (
+        ('ID', 'id'),
+        ('Data', 'date'),
+        ('Valor', 'value'),
+        ('Descrição', 'description'),
+        ('Comprovante', 'document'),
+        ('Criador', 'creator__name'),
+        ('Condomínio', 'condominium__name'),
+    )
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Finance.objects.select_related('creator', 'condominium')
+        query_base = with_person_relations(Finance.objects.select_related('condominium__address'), 'creator')
         return queryset_filter_finance(query_base, user)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SerializerTimingMixin, ConditionalGETMixin, ExportCSVMixin, ProtectedDownloadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = OrderSerializer
     filterset_class = OrderFilter
     search_fields = ('order_code',)
     ordering_fields = ('order_date',)
+    download_field = 'signature_image'
+    download_filename = 'assinatura'
+    export_filename = 'encomendas'
+    export_columns = (
+        ('ID', 'id'),
+        ('Código', 'order_code'),
+        ('Status', 'status'),
+        ('Recebimento', 'order_date'),
+        ('Proprietário', 'owner__name'),
+        ('Cadastrado por', 'registered_by__name'),
+    )
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Order.objects.select_related('owner', 'registered_by')
+        query_base = with_person_relations(Order.objects.select_related('condominium__address'), 'owner', 'registered_by')
         return queryset_filter_order(query_base, user)
 
+    @action(detail=False, methods=['post'], url_path='deliver')
+    def deliver(self, request):
+        """
+        Confirma a entrega de várias encomendas com um único UPDATE.
+
+        A foto da assinatura (opcional) é gravada uma vez no storage e associada a todas as encomendas do lote.
+        """
+        if not request.user.has_perm('core.change_order'):
+            return Response(
+                {"detail": "Você não tem permissão para confirmar entregas."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = OrderDeliverySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        pending = self.get_queryset().filter(
+            id__in=serializer.validated_data['ids'], status=Order.StatusChoices.RECEIVED
+        )
+        changes = {'status': Order.StatusChoices.COMPLETED}
+
+        signature = serializer.validated_data.get('signature_image')
+        if signature:
+            if not pending.exists():
+                return Response({'delivered': 0})
+            field = Order._meta.get_field('signature_image')
+            changes['signature_image'] = field.storage.save(field.generate_filename(None, signature.name), signature)
+
+        delivered_orders = list(pending.values_list('condominium_id', 'id'))
+        delivered = Order.objects.filter(
+            id__in=[order_id for _, order_id in delivered_orders], status=Order.StatusChoices.RECEIVED
+        ).update(**changes)
+        record_changes(Order, delivered_orders)
+        if signature:
+            schedule_renditions(Order, 'signature_image', changes['signature_image'])
+        return Response({'delivered': delivered})
+
 
 # Adicionei um ViewSet para Condominium
-class CondominiumViewSet(viewsets.ModelViewSet):
+class CondominiumViewSet(SerializerTimingMixin, ConditionalGETMixin, CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = CondominiumSerializer
     filterset_class = CondominiumFilter
+    etag_dependent_models = CONDOMINIUM_DEPENDENT_MODELS
     search_fields = ('name', 'cnpj')
     ordering_fields = ('name',)
 
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Condominium.objects.all()
+        query_base = Condominium.objects.select_related('address')
         return queryset_filter_condominium(query_base, user)
 
+    @action(
+        detail=True, methods=['post'], permission_classes=[IsAuthenticated],
+        url_path='import/(?P<resource>apartments|residents|vehicles)'
+    )
+    def import_csv(self, request, pk=None, resource=None):
+        condominium = self.get_object()
+        importer_class = CSV_IMPORTERS[resource]
+
+        # A permissão exigida é a de criação do modelo importado, não a do condomínio
+        opts = importer_class.model._meta
+        if not request.user.has_perm(f'{opts.app_label}.add_{opts.model_name}'):
+            return Response(
+                {"detail": "Você não tem permissão para importar estes registros."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        file = request.FILES.get('file')
+        if not file:
+            return Response({"error": "Envie o arquivo CSV no campo 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        delimiter = ';' if request.data.get('delimiter') == ';' else ','
+        report = importer_class(condominium, request.user).run(file, delimiter=delimiter)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], url_path='generate-apartments')
+    def generate_apartments(self, request, pk=None):
+        condominium = self.get_object()
+        if not request.user.has_perm('core.add_apartment'):
+            return Response(
+                {"detail": "Você não tem permissão para criar apartamentos."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = ApartmentGridSerializer(data=request.data, context={'condominium': condominium})
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        return Response(result, status=status.HTTP_201_CREATED)
 
-class NoticeViewSet(viewsets.ModelViewSet):
+
+class NoticeViewSet(SerializerTimingMixin, ConditionalGETMixin, CachedResponseMixin, ProtectedDownloadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = NoticeSerializer
     filterset_class = NoticeFilter
     search_fields = ('title',)
     ordering_fields = ('created_at',)
+    download_field = 'file_complement'
+    download_filename = 'aviso'
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Notice.objects.select_related('author', 'condominium')
+        query_base = with_person_relations(Notice.objects.select_related('condominium__address'), 'author')
         return queryset_filter_notice(query_base, user)
 
     @action(detail=True, methods=['get'], url_path='summarize')
@@ -160,8 +416,17 @@ class NoticeViewSet(viewsets.ModelViewSet):
         notice = self.get_object()
         text_content = ""
 
+        # Avisos com o mesmo arquivo compartilham o texto extraído e o resumo, guardados pelo hash do conteúdo
+        blob = None
+        if notice.file_complement:
+            blob = StoredBlob.objects.filter(name=notice.file_complement.name).first()
+        if blob and blob.summary:
+            return Response({"summary": blob.summary})
+
         # Prioriza o arquivo complementar, se existir
-        if notice.file_complement and hasattr(notice.file_complement, 'path'):
+        if blob and blob.extracted_text:
+            text_content = blob.extracted_text
+        elif notice.file_complement and hasattr(notice.file_complement, 'path'):
             file_path = notice.file_complement.path
             logger.info(f"Tentando processar o arquivo do caminho: {file_path}")
 
@@ -175,20 +440,12 @@ class NoticeViewSet(viewsets.ModelViewSet):
                 )
 
             logger.info(f"SUCESSO: Arquivo '{file_path}' encontrado. Processando...")
-            file_extension = os.path.splitext(file_path)[1].lower()
-
             try:
-                if file_extension == '.pdf':
-                    with pdfplumber.open(file_path) as pdf:
-                        pages = [page.extract_text() for page in pdf.pages if page.extract_text()]
-                        text_content = "\n".join(pages)
-                elif file_extension == '.docx':
-                    doc = docx.Document(file_path)
-                    paragraphs = [p.text for p in doc.paragraphs if p.text]
-                    text_content = "\n".join(paragraphs)
-                else:
+                text_content = extract_document_text(file_path)
+                if text_content is None:
                     # Se não for PDF ou DOCX, usa o conteúdo do aviso como fallback
                     text_content = notice.content
+                    blob = None
             except FileNotFoundError:
                 logger.error(f"Erro de FileNotFoundError ao tentar abrir '{file_path}'.")
                 return Response(
@@ -213,6 +470,9 @@ class NoticeViewSet(viewsets.ModelViewSet):
         # Usa o serviço de sumarização
         summary = summarize_text(text_content)
 
+        if blob:
+            StoredBlob.objects.filter(pk=blob.pk).update(extracted_text=text_content, summary=summary)
+
         if not summary:
             return Response(
                 {"error": "Não foi possível gerar o resumo. Verifique os logs do servidor para mais detalhes."},
@@ -221,20 +481,29 @@ class NoticeViewSet(viewsets.ModelViewSet):
 
         return Response({"summary": summary})
 
-class OccurrenceViewSet(viewsets.ModelViewSet):
+class OccurrenceViewSet(SerializerTimingMixin, ConditionalGETMixin, ExportCSVMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = OccurrenceSerializer
     filterset_class = OccurrenceFilter
     search_fields = ('description',)
     ordering_fields = ('date_reported',)
+    export_filename = 'ocorrencias'
+    export_columns = (
+        ('ID', 'id'),
+        ('Título', 'title'),
+        ('Status', 'status'),
+        ('Data', 'date_reported'),
+        ('Reportado por', 'reported_by__name'),
+        ('Descrição', 'description'),
+    )
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Occurrence.objects.select_related('reported_by', 'condominium')
+        query_base = with_person_relations(Occurrence.objects.select_related('condominium__address'), 'reported_by')
         return queryset_filter_occurrence(query_base, user)
 
 
-class CommunicationViewSet(viewsets.ModelViewSet):
+class CommunicationViewSet(SerializerTimingMixin, ConditionalGETMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     serializer_class = CommunicationSerializer
     filterset_class = CommunicationFilter
@@ -242,9 +511,291 @@ class CommunicationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        query_base = Communication.objects.select_related('sender', 'condominium').prefetch_related('recipients')
+        query_base = with_person_relations(
+            Communication.objects.select_related('condominium__address').prefetch_related(person_prefetch('recipients')),
+            'sender'
+        )
         return queryset_filter_communication(query_base, user)
 
+# Recursos da sincronização incremental: modelo -> (nome na resposta, ViewSet que define o escopo e o serializer)
+SYNC_RESOURCES = {
+    'core.condominium': ('condominiums', CondominiumViewSet),
+    'core.apartment': ('apartments', ApartmentViewSet),
+    'core.resident': ('residents', ResidentViewSet),
+    'core.visitor': ('visitors', VisitorViewSet),
+    'core.visit': ('visits', VisitViewSet),
+    'core.reservation': ('reservations', ReservationViewSet),
+    'core.finance': ('finances', FinanceViewSet),
+    'core.vehicle': ('vehicles', VehicleViewSet),
+    'core.order': ('orders', OrderViewSet),
+    'core.notice': ('notices', NoticeViewSet),
+    'core.communication': ('communications', CommunicationViewSet),
+    'core.occurrence': ('occurrences', OccurrenceViewSet),
+}
+
+
+class SyncViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        Sincronização incremental para os apps.
+
+        Sem 'since', devolve apenas o cursor atual (use depois da carga completa). Com 'since', devolve
+        os registros criados ou alterados depois do cursor, já serializados e filtrados pelo escopo do
+        usuário, e os ids excluídos ou que saíram do escopo dele. Com 'has_more', repita a chamada com o
+        novo cursor. O cursor nunca passa de uma alteração ainda não confirmada (change_log_horizon).
+        """
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'cursor': change_log_cursor(), 'has_more': False, 'changes': {}, 'deleted': {}})
+        if not since.isdigit():
+            return Response({"error": "O parâmetro 'since' deve ser um cursor numérico."}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = int(since)
+        oldest = ChangeLog.objects.order_by('id').values_list('id', flat=True).first()
+        if oldest and since < oldest - 1:
+            # O histórico depois do cursor já foi apagado (SYNC_RETENTION_DAYS)
+            return Response(
+                {"detail": "Cursor expirado. Faça a sincronização completa novamente."},
+                status=status.HTTP_410_GONE
+            )
+
+        page_size = settings.SYNC_PAGE_SIZE
+        rows = list(
+            ChangeLog.objects.filter(
+                id__gt=since, condominium_id__in=user_tenant_ids(request.user), model__in=SYNC_RESOURCES
+            ).order_by('id').values_list('id', 'model', 'object_id', 'action', 'audience')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        # Só entrega até a primeira alteração ainda não confirmada; o restante fica para a próxima chamada
+        upto = rows[-1][0] if has_more else ChangeLog.objects.aggregate(cursor=Max('id'))['cursor'] or since
+        cursor = change_log_horizon(since, upto)
+        if rows and rows[-1][0] > cursor:
+            rows = [row for row in rows if row[0] <= cursor]
+            has_more = False
+
+        # Várias alterações do mesmo registro viram uma só; vale a última
+        latest = {(model, object_id): (action, audience) for _, model, object_id, action, audience in rows}
+        upserts, deleted = defaultdict(list), defaultdict(list)
+        for (model, object_id), (action, audience) in latest.items():
+            if action != ChangeLog.Action.DELETE:
+                upserts[model].append(object_id)
+            elif audience_includes(request.user, audience):
+                deleted[SYNC_RESOURCES[model][0]].append(object_id)
+
+        changes = {}
+        for model, ids in upserts.items():
+            resource, viewset_class = SYNC_RESOURCES[model]
+            viewset = viewset_class(request=request, format_kwarg=None, action='list', kwargs={})
+            queryset = viewset.get_queryset().filter(id__in=ids)
+            changes[resource] = viewset.get_serializer(queryset, many=True).data
+            # Alterado, mas fora do escopo do usuário (destinatário removido, visita trocada de apartamento)
+            visible = {item['id'] for item in changes[resource]}
+            deleted[resource].extend(object_id for object_id in ids if object_id not in visible)
+            if not deleted[resource]:
+                del deleted[resource]
+
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'changes': changes,
+            'deleted': dict(deleted),
+        })
+
+
+# Recursos da busca textual: modelo -> (nome na resposta, ViewSet que define o escopo e o serializer)
+SEARCH_RESOURCES = {
+    'core.notice': ('notices', NoticeViewSet),
+    'core.occurrence': ('occurrences', OccurrenceViewSet),
+    'core.communication': ('communications', CommunicationViewSet),
+}
+
+
+class SearchViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        Busca textual unificada em avisos, ocorrências e comunicações.
+
+        Parâmetros: 'q' (termos, com "frase exata" e -exclusão), 'types' (ex.: 'notices,occurrences') e
+        'limit'. Cada recurso é filtrado pelo escopo do usuário e pelo índice GIN do tsvector; os
+        resultados voltam juntos, do mais relevante para o menos relevante.
+        """
+        terms = request.query_params.get('q', '').strip()
+        if len(terms) < 2:
+            return Response({"error": "Informe ao menos 2 caracteres em 'q'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get('types')
+        types = set(types.split(',')) if types else None
+        limit = request.query_params.get('limit', '')
+        limit = min(int(limit), settings.SEARCH_RESULTS_LIMIT) if limit.isdigit() and int(limit) > 0 \
+            else settings.SEARCH_RESULTS_LIMIT
+
+        hits = []
+        for model, (resource, viewset_class) in SEARCH_RESOURCES.items():
+            if types and resource not in types:
+                continue
+            viewset = viewset_class(request=request, format_kwarg=None, action='list', kwargs={})
+            # Cada recurso traz no máximo 'limit' registros; a junção ordena só esses
+            for instance in search_queryset(viewset.get_queryset(), terms)[:limit]:
+                hits.append((instance.rank, resource, viewset, instance))
+
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        results = [
+            {'type': resource, 'rank': round(rank, 6), 'data': viewset.get_serializer(instance).data}
+            for rank, resource, viewset, instance in hits[:limit]
+        ]
+        return Response({'count': len(results), 'results': results})
+
+
+# Recursos do autocompletar: modelo -> (nome na resposta, ViewSet que define o escopo, campos extras do resultado)
+AUTOCOMPLETE_RESOURCES = {
+    'users.person': ('people', PersonView, ('user_type', 'apartment')),
+    'core.resident': ('residents', ResidentViewSet, ('apartment',)),
+    'core.visitor': ('visitors', VisitorViewSet, ('cpf',)),
+}
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        Autocompletar de nomes para a portaria: pessoas, dependentes e visitantes.
+
+        Parâmetros: 'q' (parte do nome, com ou sem acentos e erros de digitação), 'types' (ex.:
+        'visitors,residents'), 'condominium' e 'limit'. O resultado fica em cache por alguns segundos,
+        absorvendo as consultas repetidas da digitação; qualquer alteração nos nomes troca a chave.
+        """
+        terms = request.query_params.get('q', '').strip()
+        if len(terms) < 2:
+            return Response({"error": "Informe ao menos 2 caracteres em 'q'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get('types')
+        models = [
+            model for model, (resource, _, _) in AUTOCOMPLETE_RESOURCES.items()
+            if not types or resource in types.split(',')
+        ]
+        condominium = request.query_params.get('condominium', '')
+        limit = request.query_params.get('limit', '')
+        limit = min(int(limit), settings.AUTOCOMPLETE_RESULTS_LIMIT) if limit.isdigit() and int(limit) > 0 \
+            else settings.AUTOCOMPLETE_RESULTS_LIMIT
+
+        # Os contadores de alteração entram na chave: um nome cadastrado aparece na hora, sem esperar o cache expirar
+        versions = get_tenant_versions(models, user_tenant_ids(request.user))
+        token = '|'.join(map(str, (request.user.pk, terms.lower(), models, condominium, limit, versions)))
+        cache_key = f'autocomplete:{hashlib.sha1(token.encode()).hexdigest()}'
+        results = cache.get(cache_key)
+        if results is None:
+            results = self.find(request, terms, models, condominium, limit)
+            cache.set(cache_key, results, settings.AUTOCOMPLETE_CACHE_SECONDS)
+        return Response({'count': len(results), 'results': results})
+
+    def find(self, request, terms, models, condominium, limit):
+        results = []
+        for model in models:
+            resource, viewset_class, extra_fields = AUTOCOMPLETE_RESOURCES[model]
+            viewset = viewset_class(request=request, format_kwarg=None, action='list', kwargs={})
+            queryset = viewset.get_queryset()
+            if condominium.isdigit():
+                queryset = queryset.filter(condominium_id=int(condominium))
+            rows = autocomplete_queryset(queryset, terms).values('id', 'name', 'similarity', *extra_fields)[:limit]
+            results.extend({**row, 'type': resource, 'similarity': round(row['similarity'], 4)} for row in rows)
+
+        results.sort(key=lambda result: result['similarity'], reverse=True)
+        return results[:limit]
+
+def event_subscriber(request):
+    """
+    Autentica a conexão e resolve o escopo do usuário uma única vez.
+
+    Usa as DEFAULT_AUTHENTICATION_CLASSES do REST_FRAMEWORK, na ordem, como as demais rotas: o EventSource do
+    navegador não envia cabeçalhos, então o JWT chega pelo cookie (JWT_AUTH_COOKIE); os apps enviam o
+    'Authorization: Bearer'.
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            authenticated = authentication_class().authenticate(request)
+        except (AuthenticationFailed, PermissionDenied):
+            return None
+        if authenticated is not None:
+            break
+    else:
+        return None
+    user = authenticated[0]
+    return Subscriber(
+        tenant_ids=user_tenant_ids(user),
+        person_id=user.pk,
+        is_staff=user.user_type in (Person.UserType.ADMIN, Person.UserType.EMPLOYEE),
+    )
+
+
+@compression_exempt
+async def event_stream(request):
+    """
+    Eventos em tempo real (Server-Sent Events) do condomínio do usuário.
+
+    Envia 'order.received', 'communication.created' e 'visit.registered' apenas para quem enxerga o
+    registro, com o id para buscar os detalhes no endpoint do recurso. Na reconexão, o navegador envia
+    o cabeçalho 'Last-Event-ID' e os eventos perdidos são reenviados. Sai sem compressão, para que cada
+    evento chegue ao cliente assim que é enviado.
+
+    Cada conexão fica aberta indefinidamente; por isso o endpoint só é atendido em ASGI, onde uma
+    conexão parada é uma corrotina esperando, e não um worker bloqueado.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "Eventos em tempo real exigem o servidor ASGI (condomineo.asgi)."},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+
+    subscriber = await sync_to_async(event_subscriber)(request)
+    if subscriber is None:
+        return JsonResponse({"detail": "Credenciais de autenticação inválidas."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    response = StreamingHttpResponse(
+        stream_events(subscriber, request.headers.get('Last-Event-ID')), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Impede o nginx de acumular a resposta antes de repassar ao cliente
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics_authorized(request):
+    """Acesso ao /metrics: token do Prometheus (METRICS_TOKEN) ou sessão de superusuário."""
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):].encode(), token.encode())
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_superuser)
+
+
+def metrics_view(request):
+    """Métricas de todos os workers no formato de exposição do Prometheus."""
+    if not metrics_authorized(request):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profile_download(request, profile_id, extension):
+    """Arquivos de um perfil gravado pelo RequestProfilingMiddleware; apenas para superusuários."""
+    if profiling_user(request) is None:
+        return HttpResponse(status=403)
+    path = profile_path(profile_id, extension)
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=os.path.basename(path),
+        content_type=PROFILE_FILES[extension]
+    )
+
+
 def home(request):
     from django.shortcuts import render
     return render(request, 'pages/home.html', {})
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.db.models import Q
 from django_filters import rest_framework as filters
+from core.filters import filter_search_key
 from users.models import Person
 
 def queryset_filter_person(query_base, user):
@@ -21,7 +22,7 @@ def queryset_filter_person(query_base, user):
         )
 
 class PersonFilterSet(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(field_name='name_key', method=filter_search_key)
     email = filters.CharFilter(field_name='email', lookup_expr='icontains')
     cpf = filters.CharFilter(field_name='cpf', lookup_expr='icontains')
     user_type = filters.CharFilter(field_name='user_type', lookup_expr='iexact')
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:10
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from utils.utils import search_key
+
+
+def fill_name_key(apps, schema_editor):
+    Person = apps.get_model('users', 'Person')
+    people = list(Person.objects.only('id', 'name'))
+    for person in people:
+        person.name_key = search_key(person.name)
+    Person.objects.bulk_update(people, ['name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        # A extensão pg_trgm é criada na migração do core
+        ('core', '0013_name_trigram_search'),
+        ('users', '0002_alter_person_cpf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.', max_length=255, verbose_name='Chave de Busca do Nome'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_key'], name='person_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Group
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from rest_framework import validators
 from django.core.exceptions import ValidationError
 
+from utils.utils import search_key
+
 # CustomUserManager para gerenciar a criação de usuários e superusuários
 class CustomPersonManager(BaseUserManager):
     def create_user(self, email, name, password=None, **extra_fields):
@@ -44,6 +47,13 @@ class Person(AbstractUser):
 
     username = None
     name = models.CharField(verbose_name='Nome Completo', max_length=255)
+    name_key = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Chave de Busca do Nome',
+        help_text='Nome em minúsculas e sem acentos, indexado por trigramas para o autocompletar.'
+    )
     email = models.EmailField(verbose_name='E-mail', max_length=255, unique=True)
     cpf = models.CharField(
         max_length=11, unique=True,
@@ -106,6 +116,14 @@ class Person(AbstractUser):
         verbose_name = 'Pessoa'
         verbose_name_plural = 'Pessoas'
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['name_key'], opclasses=['gin_trgm_ops'], name='person_name_trgm_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Mantém a chave de busca sempre coerente com o nome
+        self.name_key = search_key(self.name)
+        super().save(*args, **kwargs)
 
 
     def clean(self):
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from core.utils import get_user_condo_apartment, get_apartment_number, get_condominium_to_code
 from rest_framework.exceptions import ValidationError
@@ -179,6 +180,30 @@ class PersonSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+# O que o PersonSerializer lê de cada pessoa: o apartamento (com condomínio e endereço) e os condomínios administrados
+PERSON_SELECT_RELATED = ('apartment__condominium__address',)
+PERSON_PREFETCH_RELATED = ('managed_condominiums',)
+
+
+def with_person_relations(queryset, *paths):
+    """
+    Carrega junto com o queryset as relações que o PersonSerializer lê das pessoas em 'paths'.
+
+    Cada caminho é uma FK até Person ('owner', 'visitor__registered_by'); '' é o próprio Person.
+    Sem isso, cada pessoa serializada em uma listagem faz as próprias consultas (N+1).
+    """
+    for path in paths:
+        prefix = f'{path}__' if path else ''
+        queryset = queryset.select_related(*(prefix + field for field in PERSON_SELECT_RELATED))
+        queryset = queryset.prefetch_related(*(prefix + field for field in PERSON_PREFETCH_RELATED))
+    return queryset
+
+
+def person_prefetch(path):
+    """Prefetch de uma relação many-to-many com Person, já com as relações do PersonSerializer."""
+    return Prefetch(path, queryset=with_person_relations(Person.objects.all(), ''))
+
+
 class CustomUserDetailsSerializer(serializers.ModelSerializer):
     is_new_user = serializers.SerializerMethodField(read_only=True)
 
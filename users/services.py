@@ -1,12 +1,23 @@
+from time import perf_counter
+
 import requests
 from django.conf import settings
 
+from core.metrics import RECAPTCHA, RECAPTCHA_DURATION
+
+
+def record_recaptcha(result, started=None):
+    RECAPTCHA.inc(result=result)
+    if started is not None:
+        RECAPTCHA_DURATION.observe(perf_counter() - started, result=result)
+
 
 def verificar_recaptcha(recaptcha_token):
     """
     Envia o token do reCAPTCHA para o Google para verificação.
     """
     if not recaptcha_token:
+        record_recaptcha('missing')
         return False, "Token não fornecido."
 
     # URL de verificação do Google
@@ -18,6 +29,7 @@ def verificar_recaptcha(recaptcha_token):
         'response': recaptcha_token  # O token do frontend
     }
 
+    started = perf_counter()
     try:
         # Fazendo a requisição POST
         response = requests.post(url, data=data)
@@ -25,12 +37,15 @@ def verificar_recaptcha(recaptcha_token):
 
         # O Google responde com 'success': true ou false
         if result.get('success'):
+            record_recaptcha('success', started)
             return True, "reCAPTCHA verificado com sucesso."
         else:
             # Retorna os códigos de erro se houver
+            record_recaptcha('failure', started)
             error_codes = result.get('error-codes', [])
             return False, f"Falha na verificação: {error_codes}"
 
     except requests.RequestException as e:
         # Lidar com erros de rede
+        record_recaptcha('error', started)
         return False, f"Erro ao contatar o serviço reCAPTCHA: {e}"
\ No newline at end of file
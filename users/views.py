@@ -7,13 +7,15 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, DjangoModelPer
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from core.conditional import ConditionalGETMixin
+from core.instrumentation import SerializerTimingMixin
 from core.models import Apartment, Condominium
 from utils.utils import send_custom_email
 from .authentication import JWTAuthenticationAllowInactive
 from .filters import queryset_filter_person, PersonFilterSet
 from .models import Person
 from .permissions import IsOnboardingUser
-from .serializers import PersonSerializer, CustomUserDetailsSerializer
+from .serializers import PersonSerializer, CustomUserDetailsSerializer, with_person_relations
 
 from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
 from dj_rest_auth.registration.views import SocialLoginView
@@ -31,7 +33,7 @@ class CustomOAuth2Client(OAuth2Client):
 
         super().__init__(*args, **kwargs)
 
-class PersonView(ModelViewSet):
+class PersonView(SerializerTimingMixin, ConditionalGETMixin, ModelViewSet):
     serializer_class = PersonSerializer
     filterset_class = PersonFilterSet
     authentication_classes = [JWTAuthenticationAllowInactive]
@@ -40,7 +42,7 @@ class PersonView(ModelViewSet):
         user = self.request.user
         if not user.is_authenticated:
             return Person.objects.none()
-        query_base = Person.objects.select_related('apartment', 'condominium')
+        query_base = with_person_relations(Person.objects.select_related('condominium'), '')
         return queryset_filter_person(query_base, user)
 
     def get_permissions(self):
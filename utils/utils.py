@@ -1,7 +1,12 @@
+import unicodedata
+from time import perf_counter
+
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from decouple import config
 
+from core.metrics import EMAILS, EMAIL_DURATION
+
 
 def send_custom_email(subject, template_name, context, recipient_list):
     """
@@ -12,6 +17,7 @@ def send_custom_email(subject, template_name, context, recipient_list):
     :param context: Dicionário de contexto para renderizar no template.
     :param recipient_list: Lista de e-mails dos destinatários.
     """
+    started = perf_counter()
     try:
         # Renderiza a mensagem HTML a partir de um template
         html_message = render_to_string(template_name, context)
@@ -28,6 +34,22 @@ def send_custom_email(subject, template_name, context, recipient_list):
             fail_silently=False  # Mantenha False para ver erros durante o desenvolvimento
         )
         print(f"E-mail enviado com sucesso para: {recipient_list}")
+        status = 'sent'
     except Exception as e:
         # Em um ambiente de produção, você pode querer logar este erro
         print(f"Erro ao enviar e-mail: {e}")
+        status = 'failed'
+    EMAILS.inc(template=template_name, status=status)
+    EMAIL_DURATION.observe(perf_counter() - started, status=status)
+
+
+def search_key(value):
+    """
+    Normaliza um texto para busca: minúsculas, sem acentos e com espaços simples.
+
+    'José  da Conceição' e 'jose da conceicao' geram a mesma chave.
+    """
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(without_accents.lower().split())
+
@@ -1,3 +1,5 @@
+import re
+
 from rest_framework import serializers
 
 from users.models import Person
@@ -30,6 +32,52 @@ def validator_telephone(value):
     return value
 
 
+# Placas no padrão antigo (ABC1234) e no padrão Mercosul (ABC1D23)
+PLATE_PATTERN = re.compile(r'^[A-Z]{3}[0-9][A-Z0-9][0-9]{2}$')
+
+
+def validator_plate(value):
+    """
+    Validando a placa do veículo, já sem hífen ou espaços e em maiúsculas.
+    """
+    if not PLATE_PATTERN.match(value):
+        raise serializers.ValidationError("Placa inválida. Use o formato ABC1234 ou ABC1D23.")
+
+    return value
+
+
+# Trocas comuns de leitura (OCR/digitação) conforme a posição espera letra ou número
+DIGIT_TO_LETTER = str.maketrans('01258', 'OIZSB')
+LETTER_TO_DIGIT = str.maketrans('OQDIZSB', '0001258')
+# Conversão Mercosul: a 5ª posição da placa antiga (0-9) vira uma letra (A-J)
+MERCOSUL_TO_OLD = str.maketrans('ABCDEFGHIJ', '0123456789')
+
+
+def normalize_plate(value):
+    """
+    Normalizando a placa para o formato de exibição: maiúsculas, sem hífen, pontos ou espaços.
+    """
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def plate_lookup_key(value):
+    """
+    Gerando a chave de busca da placa.
+
+    Corrige trocas entre letras e números conforme a posição (O/0, I/1, ...) e converte a placa
+    Mercosul para o padrão antigo, então ABC-1234, ABC1C34 e A8C1234 geram a mesma chave.
+    """
+    plate = normalize_plate(value)
+    if len(plate) != 7:
+        return plate
+
+    letters = plate[:3].translate(DIGIT_TO_LETTER)
+    digits = plate[3].translate(LETTER_TO_DIGIT)
+    fifth = plate[4].translate(MERCOSUL_TO_OLD) if plate[4] in 'ABCDEFGHIJ' else plate[4].translate(LETTER_TO_DIGIT)
+    last = plate[5:].translate(LETTER_TO_DIGIT)
+    return letters + digits + fifth + last
+
+
 def validator_email(value):
     """
     Validando o formato do e-mail.